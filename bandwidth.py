@@ -0,0 +1,162 @@
+"""
+Bandwidth Manager
+Token-bucket limits on the combined download speed of all workers and on each
+job, with an optional time-of-day schedule read from config.json
+
+    "bandwidth_limit": "20M",              # all downloads together, bytes/s
+    "per_job_bandwidth_limit": "8M",       # any single download
+    "bandwidth_schedule": [
+        {"start": "22:00", "end": "06:00", "limit": null},   # unlimited at night
+        {"start": "09:00", "end": "18:00", "limit": "20M"}
+    ]
+
+Sizes take yt-dlp style suffixes (K, M, G; powers of 1024). The global bucket
+is shared, so bandwidth a quiet job isn't using is free for the busy ones.
+"""
+
+import re
+import threading
+import time
+from datetime import datetime
+
+BURST_SECONDS = 1.0
+SCHEDULE_CHECK_INTERVAL = 30.0
+
+_SIZE_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMG]?)(?:i?B)?(?:/s)?\s*$', re.IGNORECASE)
+
+def parse_rate(value):
+    """Return bytes/s for 20971520, '20M', '512K' or '20 MB/s'; None means unlimited"""
+    if value in (None, '', 0):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _SIZE_PATTERN.match(str(value))
+    if not match:
+        raise ValueError(f"Invalid bandwidth limit: {value!r}")
+    number, unit = match.groups()
+    return float(number) * 1024 ** ' KMG'.index(unit.upper() or ' ')
+
+def _minutes(hhmm):
+    hours, minutes = hhmm.split(':')
+    return int(hours) * 60 + int(minutes)
+
+def scheduled_limit(schedule, default, now=None):
+    """Return the limit of the first schedule window containing ``now``"""
+    now = now or datetime.now()
+    minute = now.hour * 60 + now.minute
+    for window in schedule or []:
+        start, end = _minutes(window['start']), _minutes(window['end'])
+        # Windows may wrap past midnight, e.g. 22:00-06:00
+        inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+        if inside:
+            return parse_rate(window.get('limit'))
+    return parse_rate(default)
+
+class TokenBucket:
+    """Blocking token bucket; ``rate`` of None lets everything through"""
+
+    def __init__(self, rate=None, burst=BURST_SECONDS):
+        self.burst = burst
+        self.rate = None
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        with self._lock:
+            if rate != self.rate:
+                self.rate = rate
+                self._tokens = min(self._tokens, rate * self.burst) if rate else 0.0
+                self._updated = time.monotonic()
+
+    def consume(self, amount):
+        """Take ``amount`` tokens, sleeping as long as that overdraws the bucket"""
+        with self._lock:
+            if not self.rate:
+                return
+            now = time.monotonic()
+            self._tokens = min(self.rate * self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+class JobThrottle:
+    """Bandwidth accounting for one running download"""
+
+    def __init__(self, manager, job_id):
+        self.manager = manager
+        self.job_id = job_id
+        self.bucket = TokenBucket(manager.per_job_limit)
+
+    def consume(self, amount):
+        """Account for ``amount`` downloaded bytes; blocks while over a limit"""
+        self.manager._refresh()
+        self.bucket.consume(amount)
+        self.manager.bucket.consume(amount)
+
+    def limit_args(self):
+        """--limit-rate for the yt-dlp CLI, which can't be throttled from here.
+
+        The global limit is split evenly between the jobs running when the
+        download starts.
+        """
+        limits = [limit for limit in (self.manager.share(), self.manager.per_job_limit) if limit]
+        return ['--limit-rate', str(int(min(limits)))] if limits else []
+
+    def close(self):
+        self.manager._release(self)
+
+class BandwidthManager:
+    """Global and per-job download speed limits shared by all workers"""
+
+    def __init__(self, limit=None, per_job_limit=None, schedule=None):
+        self.default_limit = limit
+        self.per_job_limit = parse_rate(per_job_limit)
+        self.schedule = schedule or []
+        self.bucket = TokenBucket()
+        self._jobs = set()
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._refresh(force=True)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get('bandwidth_limit'), config.get('per_job_bandwidth_limit'),
+                   config.get('bandwidth_schedule'))
+
+    @property
+    def limit(self):
+        """The global limit in force right now (bytes/s, None for unlimited)"""
+        return self.bucket.rate
+
+    def _refresh(self, force=False):
+        now = time.monotonic()
+        if force or now - self._checked >= SCHEDULE_CHECK_INTERVAL:
+            self._checked = now
+            self.bucket.set_rate(scheduled_limit(self.schedule, self.default_limit))
+
+    def open_job(self, job_id):
+        """Start accounting for a download; call ``close()`` on the result when done"""
+        throttle = JobThrottle(self, job_id)
+        with self._lock:
+            self._jobs.add(throttle)
+        return throttle
+
+    def _release(self, throttle):
+        with self._lock:
+            self._jobs.discard(throttle)
+
+    def share(self):
+        """Even split of the global limit between running jobs"""
+        self._refresh()
+        with self._lock:
+            jobs = max(1, len(self._jobs))
+        return self.limit / jobs if self.limit else None
+
+    def state(self):
+        with self._lock:
+            jobs = len(self._jobs)
+        return {'limit': self.limit, 'per_job_limit': self.per_job_limit, 'active_jobs': jobs}
@@ -0,0 +1,114 @@
+"""
+Bulk URL Import
+Parses, validates and de-duplicates many YouTube URLs at once (text files,
+CSV exports, pasted lists) and enqueues them in a single batch
+
+Command line use (sends the batch to the running download daemon or app):
+    python bulk_import.py urls.csv --quality 1080 --format mp4
+"""
+
+import argparse
+import csv
+import re
+import sys
+from datetime import datetime
+
+from format_selection import AUDIO_FORMATS
+from youtube_urls import canonical_key, is_youtube_url
+from title_resolver import new_item_id
+
+API_URL = "http://localhost:5000/api"
+URL_PATTERN = re.compile(r'https?://[^\s,;"\'<>]+')
+
+def parse_urls(text):
+    """Return every URL found in newline-, comma- or whitespace-separated text"""
+    return URL_PATTERN.findall(text or '')
+
+def read_url_file(path):
+    """Return the URLs in a text or CSV file"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if path.lower().endswith('.csv'):
+            return [url for row in csv.reader(f) for cell in row for url in parse_urls(cell)]
+        return parse_urls(f.read())
+
+def validate_urls(urls, existing_urls=()):
+    """Split ``urls`` into (accepted, rejected, duplicates).
+
+    Duplicates are detected by canonical video ID, both within the batch and against
+    ``existing_urls`` (typically the URLs already in the queue).
+    """
+    seen = {canonical_key(url) for url in existing_urls}
+    accepted, rejected, duplicates = [], [], []
+    for url in urls:
+        url = url.strip()
+        if not is_youtube_url(url):
+            rejected.append(url)
+            continue
+        key = canonical_key(url)
+        if key in seen:
+            duplicates.append(url)
+            continue
+        seen.add(key)
+        accepted.append(url)
+    return accepted, rejected, duplicates
+
+def build_queue_items(urls, quality='best', format_type='mp4', audio_bitrate=None, source='bulk_import'):
+    """Create queued items for ``urls`` with titles still to be resolved"""
+    added_time = datetime.now().strftime("%H:%M:%S")
+    return [{
+        'id': new_item_id(),
+        'url': url,
+        'title': url,
+        'title_status': 'pending',
+        'quality': quality,
+        'format': format_type,
+        'audio_bitrate': audio_bitrate if format_type in AUDIO_FORMATS else None,
+        'status': 'Queued',
+        'added_time': added_time,
+        'source': source
+    } for url in urls]
+
+def main():
+    parser = argparse.ArgumentParser(description="Add many YouTube URLs to the download queue")
+    parser.add_argument('files', nargs='*', help="text or CSV files with URLs (reads stdin if omitted)")
+    parser.add_argument('--quality', default='best')
+    parser.add_argument('--format', default='mp4')
+    parser.add_argument('--audio-bitrate', default='192k')
+    args = parser.parse_args()
+
+    import requests
+
+    urls = []
+    if args.files:
+        for path in args.files:
+            urls.extend(read_url_file(path))
+    else:
+        urls = parse_urls(sys.stdin.read())
+
+    accepted, rejected, duplicates = validate_urls(urls)
+    print(f"Found {len(urls)} URL(s): {len(accepted)} valid, "
+          f"{len(rejected)} invalid, {len(duplicates)} duplicate(s)")
+    if not accepted:
+        return
+
+    try:
+        response = requests.post(f"{API_URL}/add-batch", json={
+            'urls': accepted,
+            'quality': args.quality,
+            'format': args.format,
+            'audio_bitrate': args.audio_bitrate
+        }, timeout=60)
+        data = response.json()
+    except Exception as e:
+        print(f"❌ Could not reach the app at {API_URL}: {e}")
+        print("Start download_daemon.py or youtube_downloader_modern.py first.")
+        sys.exit(1)
+
+    if data.get('status') == 'success':
+        print(f"✅ {data['message']}")
+    else:
+        print(f"❌ {data.get('message')}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
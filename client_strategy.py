@@ -0,0 +1,193 @@
+"""
+Client Fallback Strategies
+Ranks the yt-dlp client / header combinations to try for a download by their
+recent success rate and throughput, persisted across sessions
+
+Each strategy is a set of extra yt-dlp arguments (YouTube player client plus
+matching request headers). Every attempt is recorded per strategy and per
+download context (e.g. 'mp4:1080'), and new jobs try the healthiest, fastest
+strategy first. A strategy that keeps failing is benched for a cool-down
+period instead of being retried on every job.
+"""
+
+import threading
+import time
+
+from json_store import DelayedSave, load_json, save_json
+
+STATS_FILE = "client_stats.json"
+
+# Weight of the newest attempt in the rolling averages
+EWMA_ALPHA = 0.3
+# Assumed success rate for a strategy that has never been tried
+PRIOR_SUCCESS = 0.75
+# Context-specific stats are used once they have this many attempts
+MIN_CONTEXT_ATTEMPTS = 3
+# Consecutive failures after which a strategy is benched, and for how long
+MAX_FAILURES_IN_ROW = 3
+COOLDOWN = 10 * 60
+
+BROWSER_USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                      '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+
+class ClientStrategy:
+    """A named set of extra yt-dlp arguments to download with"""
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = list(args)
+
+    def __repr__(self):
+        return f"ClientStrategy({self.name!r})"
+
+DEFAULT_STRATEGIES = [
+    ClientStrategy('android', [
+        '--extractor-args', 'youtube:player_client=android',
+        '--user-agent', BROWSER_USER_AGENT,
+        '--referer', 'https://www.youtube.com/',
+        '--add-header', 'Accept:text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        '--add-header', 'Accept-Language:en-us,en;q=0.5',
+        '--add-header', 'Accept-Encoding:gzip, deflate',
+        '--add-header', 'Connection:keep-alive'
+    ]),
+    ClientStrategy('web', [
+        '--extractor-args', 'youtube:player_client=web',
+        '--user-agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+        '--referer', 'https://www.youtube.com/'
+    ]),
+    # yt-dlp's own choice of clients
+    ClientStrategy('default', [
+        '--user-agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    ]),
+    ClientStrategy('ios', [
+        '--extractor-args', 'youtube:player_client=ios'
+    ]),
+    ClientStrategy('tv', [
+        '--extractor-args', 'youtube:player_client=tv'
+    ])
+]
+
+def _new_stats():
+    return {'attempts': 0, 'successes': 0, 'failures_in_row': 0, 'last_failure': 0,
+            'success_rate': PRIOR_SUCCESS, 'throughput': None}
+
+class Attempt:
+    """Measures one download attempt; feed it ProgressEvents, then ``finish``"""
+
+    def __init__(self, strategies, strategy, context):
+        self.strategies = strategies
+        self.strategy = strategy
+        self.context = context
+        self.started = time.monotonic()
+        self.bytes = 0
+        self._last = {}
+
+    def progress(self, event):
+        """Count the bytes transferred since the previous event for the same file"""
+        key = event.counter_key
+        previous = self._last.get(key)
+        if previous is not None and event.downloaded_bytes > previous:
+            self.bytes += event.downloaded_bytes - previous
+        self._last[key] = event.downloaded_bytes
+
+    def finish(self, success):
+        """Record the attempt; ``success=None`` (e.g. stopped to retune) keeps only its throughput"""
+        self.strategies.record(self.strategy, self.context, success,
+                               self.bytes, time.monotonic() - self.started)
+
+class ClientStrategies:
+    """Rolling per-strategy statistics, persisted to a JSON file"""
+
+    def __init__(self, strategies=None, path=STATS_FILE):
+        self.strategies = list(strategies or DEFAULT_STRATEGIES)
+        self.path = path
+        self._stats = load_json(path)
+        # Entries changed since the last save
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._saver = DelayedSave(self.save)
+
+    def _entry(self, strategy_name, context=None):
+        key = f"{strategy_name}@{context}" if context else strategy_name
+        return self._stats.setdefault(key, _new_stats())
+
+    def _score(self, strategy, context, now):
+        overall = self._entry(strategy.name)
+        stats = overall
+        if context:
+            specific = self._entry(strategy.name, context)
+            if specific['attempts'] >= MIN_CONTEXT_ATTEMPTS:
+                stats = specific
+        benched = (overall['failures_in_row'] >= MAX_FAILURES_IN_ROW
+                   and now - overall['last_failure'] < COOLDOWN)
+        known = [s['throughput'] for s in self._stats.values() if s['throughput']]
+        # Untried strategies are assumed to be as fast as the average one
+        throughput = stats['throughput'] or (sum(known) / len(known) if known else 1.0)
+        return (not benched, stats['success_rate'] * throughput)
+
+    def ranked(self, context=None):
+        """Return the strategies in the order they should be tried"""
+        now = time.time()
+        with self._lock:
+            scores = {s.name: self._score(s, context, now) for s in self.strategies}
+        # sorted() is stable, so ties keep the configured order
+        return sorted(self.strategies, key=lambda s: scores[s.name], reverse=True)
+
+    def begin(self, strategy, context=None):
+        """Start measuring an attempt with ``strategy``"""
+        return Attempt(self, strategy, context)
+
+    def record(self, strategy, context, success, bytes_downloaded=0, elapsed=0.0):
+        """Fold the outcome of one attempt into the statistics; ``success=None`` has no outcome"""
+        with self._lock:
+            for stats in (self._entry(strategy.name), self._entry(strategy.name, context)):
+                if bytes_downloaded and elapsed > 0:
+                    speed = bytes_downloaded / elapsed
+                    stats['throughput'] = speed if stats['throughput'] is None else \
+                        stats['throughput'] + EWMA_ALPHA * (speed - stats['throughput'])
+                if success is not None:
+                    stats['attempts'] += 1
+                    stats['success_rate'] += EWMA_ALPHA * ((1.0 if success else 0.0) - stats['success_rate'])
+                    if success:
+                        stats['successes'] += 1
+                        stats['failures_in_row'] = 0
+                    else:
+                        stats['failures_in_row'] += 1
+                        stats['last_failure'] = time.time()
+                if not context:
+                    break
+            self._dirty.add(strategy.name)
+            if context:
+                self._dirty.add(f"{strategy.name}@{context}")
+        self._saver.schedule()
+
+    def stats(self):
+        """Return a copy of the statistics, keyed by 'strategy' or 'strategy@context'"""
+        with self._lock:
+            return {key: dict(value) for key, value in self._stats.items()}
+
+    def save(self):
+        """Write the statistics to disk now.
+
+        Only the entries this instance changed replace those in the file, so
+        statistics another process saved meanwhile are kept, and picked up.
+        """
+        stored = load_json(self.path)
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            stored.update({key: dict(self._stats[key]) for key in dirty})
+            self._stats = {key: dict(value) for key, value in stored.items()}
+        if not save_json(self.path, stored, indent=2):
+            with self._lock:
+                self._dirty |= dirty
+
+_strategies = None
+_strategies_lock = threading.Lock()
+
+def get_strategies():
+    """Return the process-wide strategy statistics"""
+    global _strategies
+    with _strategies_lock:
+        if _strategies is None:
+            _strategies = ClientStrategies()
+        return _strategies
@@ -0,0 +1,199 @@
+"""
+Download Daemon Client
+Talks to a running download daemon over HTTP, so a GUI can show and control
+its queue without running any downloads itself
+
+DaemonClient offers the same methods and callbacks as DownloadDaemon, so a
+front end works the same whether it embeds the daemon or attaches to one.
+Its ``queue`` is a local mirror kept current by polling /api/changes, which
+only returns items that changed since the last poll.
+"""
+
+import threading
+
+import requests
+
+from bulk_import import API_URL
+from history_store import HISTORY_PAGE_SIZE
+
+POLL_INTERVAL = 0.5
+REQUEST_TIMEOUT = 10
+
+# What a DaemonClient call raises when the daemon is down (RequestException)
+# or refuses the request (RuntimeError, or ValueError / PermissionError for 400 / 401)
+DAEMON_ERRORS = (requests.RequestException, RuntimeError, ValueError, PermissionError)
+
+def daemon_running(api_url=API_URL, timeout=1.0):
+    """True if a download daemon (headless or inside a GUI) answers at ``api_url``"""
+    try:
+        return bool(requests.get(f"{api_url}/health", timeout=timeout).json().get('daemon'))
+    except (requests.RequestException, ValueError):
+        return False
+
+class DaemonClient:
+    """A download daemon's queue, mirrored and controlled over HTTP"""
+
+    def __init__(self, api_url=API_URL, log=None, on_item=None, on_queue=None, on_status=None,
+                 on_history=None, poll_interval=POLL_INTERVAL, token=None):
+        self.api_url = api_url
+        self.log = log or print
+        self.on_item = on_item
+        self.on_queue = on_queue
+        self.on_status = on_status
+        self.on_history = on_history
+        self.poll_interval = poll_interval
+        self.queue = []
+        self.is_downloading = False
+        self._rate = ""
+        self._session_id = None
+        self._revision = 0
+        self._log_seq = 0
+        self._connected = True
+        self._closed = threading.Event()
+        self._session = requests.Session()
+        if token:
+            # Only checked when the daemon listens beyond localhost
+            self._session.headers['X-API-Token'] = token
+
+    def _request(self, method, path, **kwargs):
+        response = self._session.request(method, f"{self.api_url}{path}", timeout=REQUEST_TIMEOUT, **kwargs)
+        data = response.json()
+        if response.status_code == 400:
+            raise ValueError(data.get('message'))
+        if response.status_code == 401:
+            raise PermissionError(data.get('message'))
+        return response.status_code, data
+
+    def open(self, start=False):
+        """Load the daemon's queue and keep following it"""
+        self._poll()
+        # Only show log lines written from now on
+        self._log_seq = self._request('GET', '/logs', params={'since': 2 ** 62})[1]['seq']
+        if start:
+            self.start()
+        threading.Thread(target=self._follow, daemon=True).start()
+
+    def _follow(self):
+        while not self._closed.wait(self.poll_interval):
+            try:
+                self._poll()
+                self._poll_logs()
+                if not self._connected:
+                    self._connected = True
+                    self.log(f"🔌 Reconnected to the download daemon at {self.api_url}")
+            except (requests.RequestException, ValueError, PermissionError):
+                if self._connected:
+                    self._connected = False
+                    self.log(f"⚠️ Lost connection to the download daemon at {self.api_url}; retrying...")
+
+    def _poll(self):
+        changes = self._request('GET', '/changes', params={'since': self._revision})[1]
+        if changes['session'] != self._session_id:
+            # First poll, or the daemon restarted: reload everything
+            self._session_id, self._revision, self._log_seq = changes['session'], 0, 0
+            changes = self._request('GET', '/changes', params={'since': 0})[1]
+        self._revision = changes['revision']
+        by_id = {item['id']: item for item in self.queue}
+        changed = []
+        for data in changes['items']:
+            item = by_id.get(data['id'])
+            if item is None:
+                by_id[data['id']] = data
+            elif item != data:
+                # Update in place, so views holding the item see the change
+                item.clear()
+                item.update(data)
+                changed.append(item)
+        if 'order' in changes:
+            self.queue[:] = [by_id[item_id] for item_id in changes['order'] if item_id in by_id]
+            if self.on_queue:
+                self.on_queue()
+        if self.on_item:
+            for item in changed:
+                self.on_item(item)
+        status = (changes['downloading'], changes['rate'])
+        if status != (self.is_downloading, self._rate):
+            was_downloading = self.is_downloading
+            self.is_downloading, self._rate = status
+            if self.on_status:
+                self.on_status(self.is_downloading)
+            if was_downloading and not self.is_downloading and self.on_history:
+                self.on_history()
+        elif changed and self.on_history and any(item['status'] in ('Completed', 'Failed') for item in changed):
+            self.on_history()
+
+    def _poll_logs(self):
+        data = self._request('GET', '/logs', params={'since': self._log_seq})[1]
+        self._log_seq = data['seq']
+        for line in data['lines']:
+            self.log(line)
+
+    def shutdown(self, timeout=None):
+        """Stop following the daemon; its downloads carry on"""
+        self._closed.set()
+
+    # The DownloadDaemon interface
+
+    def find_item(self, item_id):
+        return next((item for item in self.queue if item.get('id') == item_id), None)
+
+    def describe_rate(self):
+        return self._rate
+
+    def overall_progress(self):
+        """(active items, average percent, combined speed in bytes/s) of running downloads"""
+        active = [item for item in self.queue if item.get('status') == 'Downloading']
+        overall = sum(i.get('progress', 0) for i in active) / len(active) if active else 0
+        speed = sum((i.get('transfer') or {}).get('speed') or 0 for i in active)
+        return len(active), overall, speed
+
+    def add(self, url, quality=None, format_type=None, audio_bitrate=None, source='gui',
+            scheduling=None, force=False, start=False):
+        """Add a video or playlist to the daemon's queue; same results as DownloadDaemon.add"""
+        status, data = self._request('POST', '/add-to-queue', json={
+            'url': url, 'quality': quality, 'format': format_type, 'audio_bitrate': audio_bitrate,
+            'source': source, 'force': force, 'start': start, **(scheduling or {})})
+        if status == 409 and data.get('archived'):
+            return {'status': 'archived', 'archived': data['archived']}
+        if status == 409 and data.get('queue_item'):
+            return {'status': 'duplicate', 'item': data['queue_item']}
+        if data.get('status') != 'success':
+            raise RuntimeError(data.get('message'))
+        if data.get('expansion_id'):
+            return {'status': 'expanding', 'expansion_id': data['expansion_id']}
+        return {'status': 'queued', 'item': data['queue_item']}
+
+    def enqueue_batch(self, urls, quality=None, format_type=None, audio_bitrate=None, source='bulk_import',
+                      scheduling=None, force=False):
+        """Returns (items, rejected, duplicates, archived) like DownloadDaemon.enqueue_batch"""
+        status, data = self._request('POST', '/add-batch', json={
+            'urls': urls, 'quality': quality, 'format': format_type, 'audio_bitrate': audio_bitrate,
+            'source': source, 'force': force, **(scheduling or {})})
+        if data.get('status') != 'success':
+            raise RuntimeError(data.get('message'))
+        return [{'id': job_id} for job_id in data['job_ids']], data['rejected'], data['duplicates'], data['archived']
+
+    def control(self, item_id, action):
+        return self._request('POST', f'/queue-item/{item_id}/{action}')[0] == 200
+
+    def update_item(self, item_id, **fields):
+        status, data = self._request('PATCH', f'/queue-item/{item_id}', json=fields)
+        return data.get('queue_item') if status == 200 else None
+
+    def move(self, item_id, before=None):
+        return self._request('POST', f'/queue-item/{item_id}/move', json={'before': before})[0] == 200
+
+    def start(self):
+        return self._request('POST', '/start-queue')[1].get('downloading', False)
+
+    def clear(self):
+        return self._request('POST', '/clear-queue')[1].get('cleared', 0)
+
+    def settings(self):
+        return self._request('GET', '/settings')[1]['settings']
+
+    def update_settings(self, **settings):
+        return self._request('POST', '/settings', json=settings)[1]['settings']
+
+    def history_page(self, offset=0, limit=HISTORY_PAGE_SIZE):
+        return self._request('GET', '/history', params={'offset': offset, 'limit': limit})[1]['history']
@@ -0,0 +1,57 @@
+"""
+Disk Space Guard
+Checks each download's expected size against the free space of its target
+folder before it starts, counting the space already promised to downloads
+that are still running
+"""
+
+import shutil
+import threading
+
+# Extra room on top of the estimate (sizes from bitrates are approximate)
+HEADROOM = 1.1
+# The video and audio parts and the merged file sit side by side until the merge finishes
+MERGE_HEADROOM = 2.0
+# Always leave this much free
+MIN_FREE_BYTES = 200 * 1024 * 1024
+
+def free_space(path):
+    """Free bytes on the filesystem holding ``path``, or None if unknown"""
+    try:
+        return shutil.disk_usage(path).free
+    except OSError:
+        return None
+
+class DiskSpaceGuard:
+    """Space reservations for running downloads, shared by all workers"""
+
+    def __init__(self, min_free=MIN_FREE_BYTES):
+        self.min_free = min_free
+        self._reserved = {}
+        self._lock = threading.Lock()
+
+    def required(self, expected_bytes, merged=False, partial_bytes=0):
+        """Bytes to set aside for a download of ``expected_bytes``"""
+        total = expected_bytes * (MERGE_HEADROOM if merged else 1.0) * HEADROOM
+        # Data already on disk from an earlier attempt is kept, not written again
+        return max(0, int(total - partial_bytes))
+
+    def reserve(self, key, path, needed):
+        """Set ``needed`` bytes aside for ``key``; returns (ok, free bytes after other reservations)"""
+        free = free_space(path)
+        with self._lock:
+            if free is None:
+                return True, None
+            available = free - sum(size for k, size in self._reserved.items() if k != key)
+            if needed > available - self.min_free:
+                return False, available
+            self._reserved[key] = needed
+            return True, available
+
+    def release(self, key):
+        with self._lock:
+            self._reserved.pop(key, None)
+
+    def reserved(self):
+        with self._lock:
+            return sum(self._reserved.values())
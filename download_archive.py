@@ -0,0 +1,133 @@
+"""
+Download Archive
+Index of every video already downloaded, so the same video isn't fetched twice
+
+Entries are keyed by (video ID, format, quality): the same video in another
+format or quality is a different download. Audio downloads are keyed by
+format alone, since the video quality setting doesn't apply to them. The
+index is a SQLite table whose primary key is that triple, so a lookup is a
+single index probe however many entries the archive holds, and the GUI and
+the API server see each other's downloads as soon as they are recorded.
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from format_selection import AUDIO_FORMATS
+from youtube_urls import canonical_key
+
+ARCHIVE_DB = "download_archive.db"
+
+# Lookups for a batch are split into IN (...) queries of this many IDs
+LOOKUP_CHUNK = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS archive (
+    video_id TEXT NOT NULL,
+    format TEXT NOT NULL,
+    quality TEXT NOT NULL,
+    title TEXT,
+    url TEXT,
+    completed_at REAL,
+    PRIMARY KEY (video_id, format, quality)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def archive_key(item):
+    """Return the (video_id, format, quality) an item downloads"""
+    video_id = item.get('video_id') or canonical_key(item.get('url', ''))
+    format_type = item.get('format') or 'mp4'
+    quality = '' if format_type in AUDIO_FORMATS else str(item.get('quality') or 'best')
+    return video_id, format_type, quality
+
+def _history_time(entry):
+    try:
+        return datetime.strptime(entry.get('timestamp') or '', "%Y-%m-%d %H:%M:%S").timestamp()
+    except ValueError:
+        return None
+
+def describe(entry):
+    """'downloaded 2024-05-01 18:00' for an archive entry"""
+    if not entry.get('completed_at'):
+        return "downloaded before"
+    return "downloaded " + time.strftime("%Y-%m-%d %H:%M", time.localtime(entry['completed_at']))
+
+class DownloadArchive:
+    """Downloaded videos kept in SQLite (WAL mode), shared between processes"""
+
+    def __init__(self, path=ARCHIVE_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def find(self, item):
+        """Return the archive entry for ``item``'s video, format and quality, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM archive WHERE video_id = ? AND format = ? AND quality = ?",
+                archive_key(item)).fetchone()
+        return dict(row) if row else None
+
+    def split(self, items):
+        """Split ``items`` into (new, archived) with one query per LOOKUP_CHUNK videos"""
+        keys = [archive_key(item) for item in items]
+        video_ids = list({key[0] for key in keys})
+        found = set()
+        with self._lock:
+            for start in range(0, len(video_ids), LOOKUP_CHUNK):
+                chunk = video_ids[start:start + LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT video_id, format, quality FROM archive "
+                    f"WHERE video_id IN ({', '.join('?' * len(chunk))})", chunk).fetchall()
+                found.update(tuple(row) for row in rows)
+        new, archived = [], []
+        for item, key in zip(items, keys):
+            (archived if key in found and not item.get('force') else new).append(item)
+        return new, archived
+
+    def add(self, item):
+        """Record a finished download of ``item``"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO archive (video_id, format, quality, title, url, completed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                archive_key(item) + (item.get('title'), item.get('url'), time.time()))
+
+    def import_history(self, history_store, page_size=1000):
+        """Archive the successful downloads in a HistoryStore, once.
+
+        Returns the number of imported entries.
+        """
+        with self._lock:
+            if self._conn.execute("SELECT value FROM meta WHERE key = 'imported_history'").fetchone():
+                return 0
+        imported, offset = 0, 0
+        while True:
+            entries = history_store.page(offset, page_size, status='Success')
+            if not entries:
+                break
+            offset += len(entries)
+            rows = [archive_key(entry) + (entry.get('title'), entry.get('url'), _history_time(entry)) for entry in entries]
+            with self._lock, self._conn:
+                cursor = self._conn.executemany(
+                    "INSERT OR IGNORE INTO archive (video_id, format, quality, title, url, completed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            imported += max(cursor.rowcount, 0)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('imported_history', ?)",
+                               (history_store.path,))
+        return imported
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,297 @@
+"""
+Download Core
+The download path every front end shares: yt-dlp check, argument building,
+the download runner and history records
+
+All seven GUI variants, simple_downloader.py and the download daemon run
+their downloads through DownloadRunner, which builds the yt-dlp arguments
+with build_download_args, so retries, timeouts, format selection, client
+strategy failover, transfer tuning, request pacing and bandwidth limits are
+the same in every entry point and a change here reaches all of them. Front
+ends without a queue go through run_standalone, which adds the title lookup
+and the download archive check the daemon does for queued items. The
+pieces it combines live in their own modules:
+    ytdlp_engine       running yt-dlp and parsing its progress (ProgressEvent)
+    client_strategy    player clients, ranked by recent success and speed
+    fragment_tuner     fragment concurrency, chunk and buffer sizes
+    rate_controller    pacing requests while YouTube throttles us
+    bandwidth          global and per-job speed limits
+    format_selection   parallel video + audio stream fetches
+    history_store      download history (SQLite)
+    download_archive   videos downloaded before, per format and quality
+    download_daemon    the queue: scheduler, journal, archive and API
+"""
+
+from datetime import datetime
+
+from bandwidth import BandwidthManager
+from client_strategy import get_strategies
+from download_archive import describe as describe_archived
+from format_selection import AUDIO_FORMATS, normalize_quality, run_parallel, video_format, wants_parallel
+from fragment_tuner import get_tuner
+from job_control import JobControl
+from metadata_cache import record_actual_size
+from rate_controller import RateController, is_throttle_signal
+from resume_state import ResumeTracker, pinned_format
+from title_resolver import new_item_id, resolve_item
+from youtube_urls import video_id
+from ytdlp_engine import EngineJob, format_bytes, get_engine
+
+# Retry and timeout settings for every download
+NETWORK_ARGS = [
+    '--continue',                         # Resume partial downloads
+    '--retries', '20',                    # More retries
+    '--fragment-retries', '20',           # More fragment retries
+    '--socket-timeout', '60'              # Longer timeout
+]
+
+# Only with allow_insecure in config.json: skip certificate checks and prefer plain HTTP
+INSECURE_ARGS = ['--no-check-certificate', '--prefer-insecure']
+
+INSTALL_HINT = "python -m pip install yt-dlp"
+
+# 403s one client strategy may run into before the next one takes over
+MAX_FORBIDDEN_ERRORS = 10
+# Progress updates without new bytes before an attempt counts as stalled
+MAX_STALLED_UPDATES = 20
+
+def download_item(url, quality='best', format_type='mp4', audio_bitrate=None):
+    """An item dict for a single download outside the queue; run it with run_standalone"""
+    return {'id': new_item_id(), 'url': url, 'title': None, 'quality': quality,
+            'format': format_type, 'audio_bitrate': audio_bitrate}
+
+def build_download_args(item, download_path, max_video_bitrate=None, allow_insecure=False):
+    """yt-dlp arguments (without the URL) for ``item``'s quality and format.
+
+    A failover or resumed attempt keeps the format an earlier attempt
+    started (``item['resume']``), so its partial file is reused. Callers add
+    per-attempt arguments: transfer tuning, client strategy, pacing.
+    """
+    quality = normalize_quality(item.get('quality'))
+    format_type = item.get('format') or 'mp4'
+    args = []
+
+    # Audio extraction
+    if format_type in AUDIO_FORMATS:
+        args.extend(['-x', '--audio-format', format_type])
+        if item.get('audio_bitrate'):
+            args.extend(['--audio-quality', item['audio_bitrate']])
+        if item.get('resume'):
+            args.extend(['--format', pinned_format(item, 'bestaudio/best')])
+    else:
+        # Best video + best audio stream up to the chosen height
+        spec, sort_args = video_format(quality, format_type, max_video_bitrate)
+        args.extend(['--format', pinned_format(item, spec)] + sort_args)
+
+        if format_type != 'best':
+            args.extend(['--merge-output-format', format_type])
+
+    args.extend(['--output', f'{download_path}/%(title)s.%(ext)s', '--no-playlist'])
+    args.extend(NETWORK_ARGS)
+    if allow_insecure:
+        args.extend(INSECURE_ARGS)
+    return args
+
+class DownloadRunner:
+    """Runs one download with client strategy failover, tuning, pacing and bandwidth limits.
+
+    Strategies are tried best first; too many 403s, a stall or a failed run
+    moves on to the next one, keeping the partial file. Every attempt waits
+    its turn with the rate controller, takes fragment settings from the tuner
+    (switching back if a probe turns out slower) and is held to the bandwidth
+    limits. ``job_control`` stops an item between and during attempts.
+    """
+
+    def __init__(self, engine=None, strategies=None, tuner=None, rate_controller=None, bandwidth=None,
+                 job_control=None, log=print, max_video_bitrate=None, parallel_streams=True,
+                 allow_insecure=False):
+        self.engine = engine or get_engine()
+        self.strategies = strategies or get_strategies()
+        self.tuner = tuner or get_tuner()
+        self.rate_controller = rate_controller or RateController()
+        self.bandwidth = bandwidth or BandwidthManager()
+        self.job_control = job_control or JobControl()
+        self.log = log
+        self.max_video_bitrate = max_video_bitrate
+        self.parallel_streams = parallel_streams
+        self.allow_insecure = allow_insecure
+
+    def download_args(self, item, download_path):
+        """yt-dlp arguments for ``item`` shared by every client strategy"""
+        # Sleep only while the server is throttling us
+        args = build_download_args(item, download_path, self.max_video_bitrate, self.allow_insecure)
+        return args + self.rate_controller.sleep_args()
+
+    def run(self, item, download_path, on_progress=None, on_line=None, journal=None):
+        """Download ``item`` into ``download_path``; returns True on success.
+
+        ``on_progress(event)`` and ``on_line(line)`` see every ProgressEvent
+        and output line (lines are logged already). With a ``journal`` the
+        item's resume state is saved as it downloads.
+        """
+        context = f"{item['format']}:{item['quality']}"
+        strategies = self.strategies.ranked(context)
+        for index, strategy in enumerate(strategies):
+            if self.job_control.requested(item):
+                return False
+            if index:
+                self.log(f"🔄 Switching to the {strategy.name} client "
+                         f"({index + 1}/{len(strategies)}), keeping downloaded data...")
+            if self.attempt(item, strategy, context, download_path, on_progress, on_line, journal):
+                return True
+        return False
+
+    def attempt(self, item, strategy, context, download_path, on_progress=None, on_line=None, journal=None,
+                tuning=None, info=None):
+        """Run one download attempt with ``strategy``; returns True on success.
+
+        ``info`` is the format selection an earlier attempt with the same
+        strategy extracted; each strategy extracts once, since its player
+        client gives its own stream URLs.
+        """
+        # Wait our turn while the server is throttling us; the sleep options depend on it too
+        self.rate_controller.wait()
+        tuning = tuning or self.tuner.choose(context)
+        self.log(f"🎛️ Transfer settings: {tuning.describe()}")
+        cmd = self.download_args(item, download_path) + tuning.args() + strategy.args
+        throttle = self.bandwidth.open_job(item['id'])
+        if not self.engine.in_process:
+            cmd.extend(throttle.limit_args())
+
+        job = EngineJob()
+        self.job_control.attach(item, job)
+        tracker = ResumeTracker(item, journal)
+        attempt = self.strategies.begin(strategy, context)
+        state = {'errors': 0, 'last_progress': 0, 'stalls': 0, 'failover': False, 'retune': False, 'sizes': {}}
+
+        def handle_line(line):
+            self.log(line)
+            if on_line:
+                on_line(line)
+            if is_throttle_signal(line):
+                self.rate_controller.on_throttle()
+
+            # Handle 403 errors
+            if 'HTTP Error 403' in line or 'Forbidden' in line:
+                state['errors'] += 1
+                self.log(f"⚠️ 403 Error detected (attempt {state['errors']}/{MAX_FORBIDDEN_ERRORS})")
+                if state['errors'] >= MAX_FORBIDDEN_ERRORS and not state['failover']:
+                    self.log(f"❌ Too many 403 errors with the {strategy.name} client")
+                    state['failover'] = True
+                    job.cancel()
+
+        def handle_progress(event):
+            if on_progress:
+                on_progress(event)
+            tracker.update(event)
+            attempt.progress(event)
+            state['sizes'][event.counter_key] = event.total_bytes or event.downloaded_bytes
+            if tuning.observe(event) and not state['failover']:
+                state['retune'] = True
+                job.cancel()
+
+            # Check for stalled download
+            if event.downloaded_bytes == state['last_progress']:
+                state['stalls'] += 1
+                if state['stalls'] > MAX_STALLED_UPDATES and not state['failover']:
+                    self.log("⚠️ Download appears stalled, retrying...")
+                    state['failover'] = True
+                    job.cancel()
+            else:
+                state['stalls'] = 0
+                state['last_progress'] = event.downloaded_bytes
+
+        try:
+            if self.parallel_streams:
+                if info is None and wants_parallel(cmd):
+                    info = self.engine.extract_info(item['url'], args=cmd) or {}
+                # Video and audio streams side by side, then a stream-copy merge
+                return_code = run_parallel(self.engine, cmd, item['url'], cwd=download_path, on_line=handle_line,
+                                           on_progress=handle_progress, job=job, throttle=throttle.consume,
+                                           info=info)
+            else:
+                return_code = self.engine.run(cmd, item['url'], cwd=download_path, on_line=handle_line,
+                                              on_progress=handle_progress, job=job, throttle=throttle.consume)
+        finally:
+            throttle.close()
+            self.job_control.detach(item, job)
+        tracker.flush()
+        tuning.finish()
+        if self.job_control.requested(item):
+            # Paused or cancelled; not the strategy's fault
+            attempt.finish(None)
+            return False
+        if state['retune']:
+            # The strategy did nothing wrong; keep the throughput it reached so far
+            attempt.finish(None)
+            self.log(f"🎛️ {tuning.describe()} was slower than the best known settings, switching back...")
+            return self.attempt(item, strategy, context, download_path, on_progress, on_line, journal,
+                                self.tuner.exploit(context), info)
+        success = return_code == 0 and not state['failover']
+        attempt.finish(success)
+        if success:
+            tracker.clear()
+            self.rate_controller.on_success()
+            item['actual_bytes'] = sum(size for size in state['sizes'].values() if size) or None
+        elif not state['failover']:
+            self.log(f"❌ Download failed with the {strategy.name} client")
+        return success
+
+def run_standalone(runner, item, download_path, archive, on_progress=None, on_line=None, confirm=None):
+    """Download a ``download_item`` outside the queue; returns True on success.
+
+    Like a queued item, it gets its title from the metadata cache, is checked
+    against ``archive`` (a DownloadArchive) before anything is downloaded and
+    is recorded there once downloaded. ``confirm(item, entry)`` decides
+    whether an archived video is downloaded again; otherwise it is skipped,
+    returning False with ``item['archived']`` set to its archive entry.
+    """
+    resolve_item(item)
+    archived = None if item.get('force') else archive.find(item)
+    if archived:
+        if confirm and confirm(item, archived):
+            item['force'] = True
+        else:
+            item['archived'] = archived
+            runner.log(f"⏭️ Skipped, already {describe_archived(archived)}: {item['title'] or item['url']}")
+            return False
+    success = runner.run(item, download_path, on_progress=on_progress, on_line=on_line)
+    if success:
+        archive.add(item)
+        record_actual_size(item['url'], item['quality'], item['format'], item.get('actual_bytes'))
+    return success
+
+def check_ytdlp(log, engine=None):
+    """Log the yt-dlp version; raises FileNotFoundError if yt-dlp isn't available"""
+    engine = engine or get_engine()
+    try:
+        version = engine.version()
+    except Exception as e:
+        log(f"❌ yt-dlp check failed: {str(e)}")
+        log(f"💡 Try running: {INSTALL_HINT}")
+        raise FileNotFoundError("yt-dlp not found") from e
+    log(f"✅ yt-dlp version: {version} ({engine.mode} engine)")
+    return version
+
+def ytdlp_available():
+    """True if yt-dlp can be run, for the startup check of each front end"""
+    try:
+        get_engine().version()
+        return True
+    except Exception:
+        return False
+
+def history_entry(url, title, quality, format_type, status, size=None):
+    """A HistoryStore entry; ``size`` is the downloaded byte count, if known"""
+    if not title:
+        vid = video_id(url)
+        title = f"Video {vid}" if vid else "Unknown Title"
+    return {
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'url': url,
+        'title': title,
+        'quality': quality,
+        'format': format_type,
+        'status': status,
+        'size': format_bytes(size) if size else 'Unknown'
+    }
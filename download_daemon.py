@@ -0,0 +1,1033 @@
+"""
+Download Daemon
+Headless owner of the download queue: workers, persistence and the HTTP API
+
+The daemon runs the queue without any window open. Front ends are clients:
+the modern GUI attaches to a running daemon over HTTP (daemon_client.py), or
+embeds one in-process when none is running; the browser extension and
+bulk_import.py use the same API. Closing or restarting a GUI attached to the
+daemon doesn't interrupt transfers.
+
+Run it as a service (e.g. under systemd):
+    python download_daemon.py --port 5000 --download-path /srv/videos
+
+The API only listens on localhost unless --host says otherwise. Bound to any
+other address, clients on other machines must send the token stored as
+``api_token`` in config.json in the X-API-Token header. Browsers may only call
+the API from the browser extension (and, for adding videos, its content script
+on youtube.com), and clients can only choose download folders inside the
+download root (--download-root, by default the download folder the daemon
+started with).
+
+On SIGTERM / Ctrl+C running downloads are stopped with their partial files
+kept, and continue from them the next time the daemon starts.
+"""
+
+import argparse
+import hmac
+import json
+import os
+import re
+import secrets
+import signal
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from pathlib import Path
+
+from flask import Flask, request, jsonify
+from flask_cors import CORS
+
+from bandwidth import BandwidthManager
+from bulk_import import build_queue_items, parse_urls, validate_urls
+from client_strategy import get_strategies
+from disk_space import DiskSpaceGuard
+from download_core import DownloadRunner, history_entry
+from download_archive import DownloadArchive, describe as describe_archived
+from download_scheduler import DownloadScheduler, DEFAULT_MAX_WORKERS, DEFAULT_MAX_PER_HOST
+from format_selection import AUDIO_FORMATS, normalize_quality
+from fragment_tuner import get_tuner
+from history_store import HistoryStore, HISTORY_PAGE_SIZE
+from job_control import JobControl, PAUSED
+from log_pipeline import get_file_logger
+from metadata_cache import clean_title, expected_size, get_video_info, record_actual_size
+from playlist_expander import PlaylistExpander, is_collection_url
+from queue_events import QueueListener
+from queue_journal import QueueJournal
+from queue_policy import DEFAULT_POLICY, POLICY_LABELS, parse_priority, policy_key, scheduling_fields
+from rate_controller import RateController
+from resume_state import describe_resume
+from title_resolver import TitleResolver, resolved_fields
+from ytdlp_engine import format_bytes, get_engine
+from youtube_urls import canonical_key, is_youtube_url
+
+CONFIG_FILE = "config.json"
+LEGACY_HISTORY_FILE = "download_history.json"
+DEFAULT_HOST = "localhost"
+DEFAULT_PORT = 5000
+
+# Log lines kept for clients that poll /api/logs
+LOG_BUFFER_LINES = 1000
+# How long shutdown waits for running downloads to stop
+SHUTDOWN_TIMEOUT = 15.0
+
+DEFAULT_CONFIG = {
+    'auto_download': False,
+    'default_quality': 'best',
+    'default_format': 'mp4',
+    'default_path': str(Path.home() / "Downloads"),
+    'audio_bitrate': '192k',
+    'max_workers': DEFAULT_MAX_WORKERS,
+    'max_per_host': DEFAULT_MAX_PER_HOST,
+    'engine': 'auto',
+    'bandwidth_limit': None,
+    'per_job_bandwidth_limit': None,
+    'bandwidth_schedule': [],
+    'network_profile': None,
+    'max_video_bitrate': None,
+    'parallel_streams': True,
+    'allow_insecure': False,
+    'queue_policy': DEFAULT_POLICY,
+    'download_root': None,
+    'api_token': None
+}
+
+# Items in these states are done with; clearing the queue removes them
+FINISHED_STATUSES = ('Completed', 'Failed', 'Cancelled', 'Skipped')
+
+# Settings clients may change at runtime (POST /api/settings); a new
+# default_path must lie inside the download root
+RUNTIME_SETTINGS = ('auto_download', 'default_path', 'queue_policy')
+
+LOOPBACK_ADDRESSES = ('localhost', '127.0.0.1', '::1', '::ffff:127.0.0.1')
+TOKEN_HEADER = 'X-API-Token'
+# Web origins allowed to call the API: the browser extension's pages, and its
+# content script on YouTube for the endpoints it uses
+EXTENSION_ORIGINS = (r'chrome-extension://[a-p]{32}', r'moz-extension://[0-9a-f-]{36}')
+YOUTUBE_ORIGINS = (r'https://(?:www\.|m\.)?youtube\.com',)
+CONTENT_SCRIPT_ENDPOINTS = ('/api/health', '/api/add-to-queue')
+
+def _copy_item(item):
+    """Copy of a queue item, including its nested dicts and lists (transfer, resume)"""
+    return {key: dict(value) if isinstance(value, dict) else list(value) if isinstance(value, list) else value
+            for key, value in dict(item).items()}
+
+def load_config(path=CONFIG_FILE, defaults=DEFAULT_CONFIG):
+    """Load configuration from file"""
+    try:
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                config = json.load(f)
+                return {**defaults, **config}
+    except:
+        pass
+    return dict(defaults)
+
+def save_config(config, path=CONFIG_FILE):
+    """Save configuration to file"""
+    try:
+        with open(path, 'w') as f:
+            json.dump(config, f, indent=2)
+    except:
+        pass
+
+def _print_log(message):
+    get_file_logger().info(message)
+    print(message, flush=True)
+
+class DownloadDaemon:
+    """The download queue and everything that runs it.
+
+    Front ends embedding the daemon pass callbacks, all of which may be
+    called from worker threads:
+
+        log(message)          a log line
+        on_item(item)         one item changed (status, progress, title)
+        on_queue()            items were added, removed or reordered
+        on_status(running)    the queue started or stopped, or pacing changed
+        on_history()          a download was added to the history
+    """
+
+    def __init__(self, config=None, config_path=CONFIG_FILE, log=None, on_item=None, on_queue=None,
+                 on_status=None, on_history=None):
+        self.config_path = config_path
+        self.config = config if config is not None else load_config(config_path)
+        self.log = log or _print_log
+        self.on_item = on_item
+        self.on_queue = on_queue
+        self.on_status = on_status
+        self.on_history = on_history
+        # Identifies this run, so clients notice a restart and reload the queue
+        self.session_id = uuid.uuid4().hex[:12]
+        self._logs = deque(maxlen=LOG_BUFFER_LINES)
+        self._log_seq = 0
+        self._revision = 0
+        self._order_revision = 0
+        self._item_revisions = {}
+        self._changes_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        # Held while items are added to, removed from or reordered in the queue
+        self._queue_lock = threading.RLock()
+        self.is_downloading = False
+        self.closing = False
+        # Start the queue whenever items are added
+        self.auto_start = bool(self.config.get('auto_download'))
+        self.queue_thread = None
+        self.api_app = None
+        # Required from non-loopback clients once the API listens beyond localhost
+        self.api_token = None
+        # Clients may only pick download folders inside this one
+        self.download_root = self.config.get('download_root') or self.download_path
+
+        self.history_store = HistoryStore(legacy_path=LEGACY_HISTORY_FILE)
+        self.download_archive = DownloadArchive()
+        # The daemon only listens for changes; it doesn't need to wake itself
+        self.journal = QueueJournal(notify=False)
+        self.queue = self.load_queue()
+        self.engine = get_engine(self.config.get('engine', 'auto'))
+        self.title_resolver = TitleResolver(on_resolved=self.on_title_resolved)
+        self.client_strategies = get_strategies()
+        self.rate_controller = RateController()
+        self.rate_controller.on_change = lambda state: self._status_changed()
+        self.fragment_tuner = get_tuner(self.config.get('network_profile'))
+        try:
+            self.bandwidth = BandwidthManager.from_config(self.config)
+        except (ValueError, KeyError, TypeError) as e:
+            self.log_message(f"⚠️ Ignoring invalid bandwidth settings in {self.config_path}: {e}")
+            self.bandwidth = BandwidthManager()
+        self.disk_guard = DiskSpaceGuard()
+        self.job_control = JobControl()
+        self.runner = DownloadRunner(self.engine, self.client_strategies, self.fragment_tuner, self.rate_controller,
+                                     self.bandwidth, self.job_control, log=self.log_message,
+                                     max_video_bitrate=self.config.get('max_video_bitrate'),
+                                     parallel_streams=self.config.get('parallel_streams', True),
+                                     allow_insecure=self.config.get('allow_insecure', False))
+        self.playlist_expander = PlaylistExpander(self.enqueue_expanded, self.engine)
+        self.autostart_expansions = set()
+        try:
+            order = policy_key(self.config.get('queue_policy', DEFAULT_POLICY))
+        except ValueError as e:
+            self.log_message(f"⚠️ {e}; using {DEFAULT_POLICY}")
+            self.config['queue_policy'] = DEFAULT_POLICY
+            order = policy_key(DEFAULT_POLICY)
+        self.scheduler = DownloadScheduler(self.download_single_video,
+                                           max_workers=self.config.get('max_workers', DEFAULT_MAX_WORKERS),
+                                           max_per_host=self.config.get('max_per_host', DEFAULT_MAX_PER_HOST),
+                                           on_start=self.on_download_start,
+                                           on_finish=self.on_download_finish,
+                                           order=order, log=self.log_message)
+
+    @property
+    def download_path(self):
+        return self.config.get('default_path') or DEFAULT_CONFIG['default_path']
+
+    def path_allowed(self, path):
+        """True if ``path`` is the download root or a folder inside it"""
+        root = os.path.realpath(self.download_root)
+        try:
+            return os.path.commonpath([root, os.path.realpath(path)]) == root
+        except ValueError:
+            return False
+
+    def open(self, start=False):
+        """Pick up where the last session stopped; ``start`` runs the queue right away"""
+        archived = self.download_archive.import_history(self.history_store)
+        if archived:
+            self.log_message(f"🗄️ Added {archived} earlier download(s) to the download archive")
+        resumed = self.playlist_expander.resume_pending()
+        if resumed:
+            self.log_message(f"📃 Continuing {len(resumed)} unfinished playlist/channel expansion(s)")
+        self.sync_queue_from_file()
+        if start and any(item.get('status') == 'Queued' for item in self.queue):
+            self.start()
+
+    # Change notifications
+
+    def log_message(self, message):
+        """Log a line and keep it for clients polling /api/logs"""
+        with self._changes_lock:
+            self._log_seq += 1
+            self._logs.append((self._log_seq, message))
+        self.log(message)
+
+    def _touch(self, item=None):
+        """Record a change to ``item``, or to the queue's membership / order when None"""
+        with self._changes_lock:
+            self._revision += 1
+            if item is None:
+                self._order_revision = self._revision
+            else:
+                self._item_revisions[item['id']] = self._revision
+        if item is None:
+            if self.on_queue:
+                self.on_queue()
+        elif self.on_item:
+            self.on_item(item)
+
+    def _status_changed(self):
+        with self._changes_lock:
+            self._revision += 1
+        if self.on_status:
+            self.on_status(self.is_downloading)
+
+    def changes(self, since=0):
+        """Items changed after revision ``since``, plus the queue order if that changed too"""
+        with self._changes_lock:
+            revision = self._revision
+            changed = {item_id for item_id, rev in self._item_revisions.items() if rev > since}
+            reordered = since == 0 or self._order_revision > since
+        with self._queue_lock:
+            items = list(self.queue)
+            changed_items = self.snapshot([item for item in items if reordered or item['id'] in changed])
+        result = {
+            'session': self.session_id,
+            'revision': revision,
+            'items': changed_items,
+            'downloading': self.is_downloading,
+            'rate': self.describe_rate()
+        }
+        if reordered:
+            result['order'] = [item['id'] for item in items]
+        return result
+
+    def snapshot(self, items=None):
+        """Copies of queue items (all by default) that are safe to serialise while workers update them"""
+        with self._queue_lock:
+            items = list(self.queue) if items is None else items
+            return [_copy_item(item) for item in items]
+
+    def logs(self, since=0):
+        """Log lines after sequence number ``since``; returns (last_seq, lines)"""
+        with self._changes_lock:
+            lines = [(seq, line) for seq, line in self._logs if seq > since]
+            return self._log_seq, [line for seq, line in lines]
+
+    def describe_rate(self):
+        return self.rate_controller.describe()
+
+    def overall_progress(self):
+        """(active items, average percent, combined speed in bytes/s) of running downloads"""
+        active = self.scheduler.active_items()
+        overall = sum(i.get('progress', 0) for i in active) / len(active) if active else 0
+        speed = sum((i.get('transfer') or {}).get('speed') or 0 for i in active)
+        return len(active), overall, speed
+
+    # Adding items
+
+    def _kick(self, start=False):
+        """Start newly queued items: wake running workers or start the queue"""
+        with self._start_lock:
+            running = self.is_downloading
+            if running:
+                # process_queue checks for queued items under this lock before it stops
+                self.scheduler.wake()
+        if not running and (start or self.auto_start):
+            self.start()
+
+    def add(self, url, quality=None, format_type=None, audio_bitrate=None, source='gui',
+            scheduling=None, force=False, start=False):
+        """Add a video, or every video of a playlist / channel, to the queue.
+
+        Returns {'status': 'queued', 'item': ...}, {'status': 'expanding',
+        'expansion_id': ...}, {'status': 'duplicate', 'item': ...} for a video
+        already waiting in the queue or, for a video already downloaded in this
+        format and quality, {'status': 'archived', 'archived': entry} unless ``force``.
+        Raises ValueError for anything but a YouTube URL, or an invalid quality.
+        """
+        url = url.strip()
+        if not is_youtube_url(url):
+            raise ValueError("Invalid YouTube URL")
+        quality = normalize_quality(quality or self.config.get('default_quality', 'best'))
+        format_type = format_type or self.config.get('default_format', 'mp4')
+        if format_type in AUDIO_FORMATS:
+            audio_bitrate = audio_bitrate or self.config.get('audio_bitrate', '192k')
+
+        if is_collection_url(url):
+            expansion_id = self.expand_collection(url, quality, format_type, audio_bitrate, source, start)
+            return {'status': 'expanding', 'expansion_id': expansion_id}
+
+        # The title is resolved in the background
+        queue_item = build_queue_items([url], quality, format_type, audio_bitrate, source)[0]
+        queue_item.update(scheduling or {})
+        if force:
+            queue_item['force'] = True
+        else:
+            archived = self.download_archive.find(queue_item)
+            if archived:
+                return {'status': 'archived', 'archived': archived}
+
+        added, duplicates = self._append_unqueued([queue_item])
+        if not added:
+            return {'status': 'duplicate', 'item': duplicates[url]}
+        self._touch()
+        self.title_resolver.submit(queue_item)
+        self.log_message(f"✅ Added to queue: {url}")
+        self._kick(start)
+        return {'status': 'queued', 'item': queue_item}
+
+    def _append_unqueued(self, items):
+        """Append the items whose video isn't waiting in the queue yet; returns (added, duplicates).
+
+        ``duplicates`` maps the URL of each item left out to the queued item it repeats.
+        The check and the append share one lock, so concurrent adds can't both
+        queue the same video, and a sync in between can't drop the new items.
+        """
+        with self._queue_lock:
+            queued = {canonical_key(item.get('url', '')): item for item in self.queue
+                      if item.get('status') not in FINISHED_STATUSES}
+            added, duplicates = [], {}
+            for item in items:
+                key = canonical_key(item['url'])
+                if key in queued:
+                    duplicates[item['url']] = queued[key]
+                else:
+                    added.append(item)
+            if added:
+                self.queue.extend(added)
+                self.journal.append_many(added)
+        return added, duplicates
+
+    def expand_collection(self, url, quality, format_type, audio_bitrate=None, source='playlist', start=False):
+        """Queue a playlist's or channel's videos as they are listed; returns the expansion ID"""
+        expansion_id = self.playlist_expander.expand(url, quality, format_type, audio_bitrate, source)
+        if start or self.auto_start:
+            self.autostart_expansions.add(expansion_id)
+        self.log_message(f"📃 Expanding {url}; videos are queued as they are found")
+        return expansion_id
+
+    def enqueue_expanded(self, items):
+        """Called from an expander thread with the next batch of a playlist's videos"""
+        accepted, rejected, duplicates = validate_urls([item['url'] for item in items])
+        accepted = set(accepted)
+        items, archived = self.download_archive.split([item for item in items if item['url'] in accepted])
+        if archived:
+            self.log_message(f"⏭️ Skipped {len(archived)} already downloaded video(s) from a playlist/channel")
+        items, _ = self._append_unqueued(items)
+        if not items:
+            return 0
+        self._touch()
+        for item in items:
+            if item['title_status'] == 'pending':
+                self.title_resolver.submit(item)
+        self.log_message(f"📃 Queued {len(items)} more video(s) from a playlist/channel")
+        self._kick(items[0].get('expansion_id') in self.autostart_expansions)
+        return len(items)
+
+    def enqueue_batch(self, urls, quality=None, format_type=None, audio_bitrate=None, source='bulk_import',
+                      scheduling=None, force=False):
+        """Validate, de-duplicate and enqueue many URLs with a single queue write.
+
+        Returns (items, rejected, duplicates, archived); ``archived`` are URLs
+        already downloaded in this format and quality, which ``force`` queues anyway.
+        Raises ValueError for an invalid quality.
+        """
+        quality = normalize_quality(quality or self.config.get('default_quality', 'best'))
+        format_type = format_type or self.config.get('default_format', 'mp4')
+        if format_type in AUDIO_FORMATS:
+            audio_bitrate = audio_bitrate or self.config.get('audio_bitrate', '192k')
+        # Playlists and channels are expanded into their videos in the background
+        for url in [url for url in urls if is_collection_url(url)]:
+            self.expand_collection(url, quality, format_type, audio_bitrate, source)
+        urls = [url for url in urls if not is_collection_url(url)]
+        accepted, rejected, duplicates = validate_urls(urls)
+        items = build_queue_items(accepted, quality, format_type, audio_bitrate, source)
+        for item in items:
+            item.update(scheduling or {})
+            if force:
+                item['force'] = True
+        items, archived = self.download_archive.split(items)
+        archived = [item['url'] for item in archived]
+        items, queued = self._append_unqueued(items)
+        duplicates += list(queued)
+
+        if items:
+            self._touch()
+            for item in items:
+                self.title_resolver.submit(item)
+            self._kick()
+
+        self.log_message(f"📥 Imported {len(items)} video(s): {len(rejected)} invalid, "
+                         f"{len(duplicates)} duplicate(s) and {len(archived)} already downloaded skipped")
+        return items, rejected, duplicates, archived
+
+    def on_title_resolved(self, item):
+        """Called from a resolver thread once an item's title is known"""
+        self.journal.update(item['id'], **resolved_fields(item))
+        self._touch(item)
+        if item['title_status'] == 'resolved':
+            self.log_message(f"🔍 Resolved title: {item['title']}")
+
+    # Managing the queue
+
+    def find_item(self, item_id):
+        return next((item for item in self.queue if item.get('id') == item_id), None)
+
+    def start(self):
+        """Start processing the queue; False if it is already running"""
+        with self._start_lock:
+            if self.is_downloading or self.closing:
+                return False
+            # Here rather than in the queue thread, so a shutdown from now on stops it
+            self.scheduler.resume()
+            self.is_downloading = True
+        self.queue_thread = threading.Thread(target=self.process_queue, daemon=True)
+        self.queue_thread.start()
+        return True
+
+    def process_queue(self):
+        """Process download queue"""
+        self._status_changed()
+        while True:
+            self.scheduler.run(self.queue)
+            # Items queued while the last workers finished would otherwise wait for the next start
+            with self._start_lock:
+                if self.closing or not any(item.get('status') == 'Queued' for item in self.queue):
+                    self.is_downloading = False
+                    break
+        self._status_changed()
+        if not self.closing:
+            self.log_message("🎉 All downloads completed!")
+
+    def control(self, item_id, action):
+        """Apply 'pause', 'resume' or 'cancel' to one item; returns False if it doesn't apply"""
+        item = self.find_item(item_id)
+        if item is None or action not in ('pause', 'resume', 'cancel'):
+            return False
+        was_running = item['status'] == 'Downloading'
+        if not getattr(self.job_control, action)(item):
+            return False
+        if was_running:
+            # The worker stops the transfer; on_download_finish records the outcome
+            self.log_message(f"{'⏸️ Pausing' if action == 'pause' else '⏹️ Cancelling'}: {item['title']}")
+            return True
+
+        self.journal.update(item['id'], status=item['status'], resume=item.get('resume'))
+        self._touch(item)
+        icons = {'pause': "⏸️ Paused", 'resume': "▶️ Resumed", 'cancel': "⏹️ Cancelled"}
+        self.log_message(f"{icons[action]}: {item['title']}")
+        if action == 'resume':
+            self._kick(start=True)
+        return True
+
+    def update_item(self, item_id, **fields):
+        """Set an item's ``priority`` / ``deadline``; returns the item, or None for an unknown ID"""
+        item = self.find_item(item_id)
+        if item is None:
+            return None
+        if 'priority' in fields:
+            fields['priority'] = parse_priority(fields['priority'])
+        item.update(fields)
+        self.journal.update(item_id, **fields)
+        self._touch(item)
+        self.scheduler.wake()
+        return item
+
+    def move(self, item_id, before=None):
+        """Move an item in front of ``before`` (to the end for None)"""
+        item = self.find_item(item_id)
+        if item is None or item_id == before:
+            return False
+        with self._queue_lock:
+            self.queue.remove(item)
+            target = self.find_item(before) if before else None
+            self.queue.insert(self.queue.index(target) if target else len(self.queue), item)
+        self.journal.move(item_id, before if target else None)
+        self._touch()
+        return True
+
+    def clear(self):
+        """Remove finished items (see FINISHED_STATUSES) from the queue; returns how many"""
+        with self._queue_lock:
+            finished = [item['id'] for item in self.queue if item.get('status') in FINISHED_STATUSES]
+            if not finished:
+                return 0
+            removed = set(finished)
+            self.queue[:] = [item for item in self.queue if item['id'] not in removed]
+        self.journal.remove_many(finished)
+        with self._changes_lock:
+            for item_id in finished:
+                self._item_revisions.pop(item_id, None)
+        self._touch()
+        self.log_message(f"🗑️ Cleared {len(finished)} finished item(s) from the queue")
+        return len(finished)
+
+    def settings(self):
+        return {**{key: self.config.get(key) for key in RUNTIME_SETTINGS}, 'auto_download': self.auto_start}
+
+    def update_settings(self, **settings):
+        """Change runtime settings (see RUNTIME_SETTINGS) and save them to the config file"""
+        unknown = set(settings) - set(RUNTIME_SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown setting(s): {', '.join(sorted(unknown))}")
+        if 'queue_policy' in settings:
+            self.scheduler.order = policy_key(settings['queue_policy'])
+            self.log_message(f"🔀 Download order: {POLICY_LABELS[settings['queue_policy']]}")
+        if 'auto_download' in settings:
+            self.auto_start = bool(settings['auto_download'])
+        self.config.update(settings)
+        save_config(self.config, self.config_path)
+        self.scheduler.wake()
+        return self.settings()
+
+    def history_page(self, offset=0, limit=HISTORY_PAGE_SIZE):
+        return self.history_store.page(offset, limit)
+
+    # Running downloads
+
+    def set_item_progress(self, item, event):
+        """Record a ProgressEvent for one queue item"""
+        if event.percent is not None:
+            item['progress'] = event.percent
+        item['transfer'] = event.to_dict()
+        self._touch(item)
+
+    def on_download_start(self, item):
+        """Called by the scheduler when a worker picks up an item"""
+        item['progress'] = 0
+        self.journal.update(item['id'], status=item['status'])
+        self._touch(item)
+        position = self.queue.index(item) + 1
+        self.log_message(f"📥 Starting download {position}/{len(self.queue)}: {item['title']}")
+
+    def on_download_finish(self, item, success):
+        """Called by the scheduler when a worker finishes an item"""
+        if item.pop('archived', None):
+            item['status'] = 'Skipped'
+            self.journal.update(item['id'], status=item['status'])
+            self._touch(item)
+            self.log_message(f"⏭️ Skipped, already downloaded: {item['title']}")
+            return
+
+        stopped = self.job_control.finish(item)
+        if stopped and not success:
+            if self.closing and stopped == PAUSED:
+                # Stopped by shutdown; continues from its partial file on the next start
+                item['status'] = 'Queued'
+            else:
+                # Paused or cancelled by the user rather than failed
+                item['status'] = stopped
+                self.log_message(f"{'⏸️' if stopped == PAUSED else '⏹️'} {stopped}: {item['title']}")
+            self.journal.update(item['id'], status=item['status'], resume=item.get('resume'))
+            self._touch(item)
+            return
+
+        if success:
+            item['status'] = 'Completed'
+            item['progress'] = 100
+            self.download_archive.add(item)
+            self.log_message(f"✅ Completed: {item['title']}")
+            if item.get('actual_bytes'):
+                estimate = f" (estimated {format_bytes(item['estimated_bytes'])})" if item.get('estimated_bytes') else ""
+                self.log_message(f"📏 Downloaded {format_bytes(item['actual_bytes'])}{estimate}")
+                record_actual_size(item['url'], item['quality'], item['format'], item['actual_bytes'])
+        else:
+            item['status'] = 'Failed'
+            self.log_message(f"❌ Failed: {item['title']}")
+
+        self.journal.update(item['id'], status=item['status'], actual_bytes=item.get('actual_bytes'))
+        self._touch(item)
+        self.add_to_history(item['url'], item['title'], item['quality'],
+                          item['format'], "Success" if success else "Failed", item.get('actual_bytes'))
+
+    def add_to_history(self, url, title, quality, format_type, status, size=None):
+        """Add download to history; ``size`` is the downloaded byte count, if known"""
+        self.history_store.add(history_entry(url, title, quality, format_type, status, size))
+        if self.on_history:
+            self.on_history()
+
+    def download_single_video(self, item):
+        """Download a single video, failing over between client strategies"""
+        try:
+            # Another process may have fetched it since it was queued
+            if not item.get('force') and self.download_archive.find(item):
+                item['archived'] = True
+                return True
+
+            download_path = self.download_path
+            os.makedirs(download_path, exist_ok=True)
+
+            if not self.reserve_disk_space(item, download_path):
+                return False
+
+            resumed = describe_resume(item)
+            if resumed:
+                self.log_message(f"↩️ Resuming {item['title']} from {resumed}")
+
+            return self.runner.run(item, download_path, on_progress=lambda event: self.set_item_progress(item, event),
+                                   journal=self.journal)
+
+        except Exception as e:
+            self.log_message(f"❌ Error: {str(e)}")
+            return False
+        finally:
+            self.disk_guard.release(item['id'])
+
+    def reserve_disk_space(self, item, download_path):
+        """Check the item's expected size against free disk space; False refuses the job"""
+        if not item.get('estimated_bytes'):
+            # Normally known from title resolution; the format list is cached either way
+            item['estimated_bytes'] = expected_size(get_video_info(item['url']), item['quality'], item['format'],
+                                                    item.get('audio_bitrate'), self.config.get('max_video_bitrate'))
+            self.journal.update(item['id'], estimated_bytes=item['estimated_bytes'])
+        if not item['estimated_bytes']:
+            return True
+
+        partial = (item.get('resume') or {}).get('downloaded_bytes') or 0
+        needed = self.disk_guard.required(item['estimated_bytes'], item['format'] not in AUDIO_FORMATS, partial)
+        ok, available = self.disk_guard.reserve(item['id'], download_path, needed)
+        if not ok:
+            self.log_message(f"💾 Not enough disk space for {item['title']}: needs about {format_bytes(needed)}, "
+                             f"{format_bytes(max(0, available))} free")
+        return ok
+
+    # Persistence
+
+    def load_queue(self):
+        """Load the persisted queue; interrupted downloads go back to Queued"""
+        items = self.journal.load()
+        interrupted = {item['id']: {'status': 'Queued'} for item in items
+                       if item.get('status') == 'Downloading'}
+        for item in items:
+            if item['id'] in interrupted:
+                item['status'] = 'Queued'
+        self.journal.update_many(interrupted)
+        return items
+
+    def sync_queue_from_file(self):
+        """Pick up queue changes other processes append to the journal as they happen"""
+        def sync():
+            try:
+                changes = self.journal.refresh()
+                if not changes:
+                    return
+
+                # The journal keeps item dicts stable, so this only adds/drops entries
+                with self._queue_lock:
+                    self.queue[:] = self.journal.items()
+                new_items = [item for op, item in changes if op == 'add']
+                _, archived = self.download_archive.split(
+                    [item for item in new_items if item.get('status') == 'Queued'])
+                for item in archived:
+                    item['status'] = 'Skipped'
+                    self.log_message(f"⏭️ Skipped, already downloaded: {item['title']}")
+                if archived:
+                    self.journal.update_many({item['id']: {'status': 'Skipped'} for item in archived})
+                for item in new_items:
+                    if item.get('title_status') == 'pending':
+                        self.title_resolver.submit(item)
+
+                self._touch()
+                for op, item in changes:
+                    if op == 'update':
+                        self._touch(item)
+                if new_items:
+                    self.log_message(f"📥 Synced {len(new_items)} item(s) from the queue journal")
+                    self._kick()
+            except Exception as e:
+                self.log_message(f"❌ Queue sync failed: {e}\n{traceback.format_exc().rstrip()}")
+
+        # Writers notify us right after appending, so this thread is idle otherwise
+        self.queue_listener = QueueListener(on_change=sync)
+        if not self.queue_listener.start():
+            self.log_message("⚠️ Queue notifications unavailable (port in use); syncing every 30s")
+
+            def periodic_sync():
+                while True:
+                    time.sleep(self.queue_listener.safety_interval)
+                    sync()
+
+            threading.Thread(target=periodic_sync, daemon=True).start()
+        sync()
+
+    def shutdown(self, timeout=SHUTDOWN_TIMEOUT):
+        """Stop running downloads, keeping their partial files, and save state"""
+        self.closing = True
+        self.scheduler.stop()
+        running = [item for item in self.queue if item.get('status') == 'Downloading']
+        for item in running:
+            self.job_control.pause(item)
+        deadline = time.monotonic() + timeout
+        while self.scheduler.active_items() and time.monotonic() < deadline:
+            time.sleep(0.1)
+        self.playlist_expander.save()
+        if running:
+            self.log_message(f"💤 Stopped {len(running)} running download(s); they continue on the next start")
+
+    # HTTP API
+
+    def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, background=False):
+        """Serve the HTTP API; in a background thread when ``background`` is set"""
+        if host not in LOOPBACK_ADDRESSES:
+            if not self.config.get('api_token'):
+                self.config['api_token'] = secrets.token_urlsafe(24)
+                save_config(self.config, self.config_path)
+            self.api_token = self.config['api_token']
+            self.log_message(f"🔑 Clients on other machines must send the api_token from "
+                             f"{self.config_path} in the {TOKEN_HEADER} header")
+        self.api_app = create_app(self)
+
+        def run_server():
+            try:
+                self.api_app.run(host=host, port=port, debug=False, use_reloader=False, threaded=True)
+            except OSError as e:
+                self.log_message(f"⚠️ API server could not start on port {port}: {e}")
+
+        self.log_message(f"🌐 API server started on http://{host}:{port}")
+        if not background:
+            run_server()
+            return
+        threading.Thread(target=run_server, daemon=True).start()
+
+def origin_allowed(origin, path):
+    """True if a browser page at ``origin`` may call the API endpoint ``path``"""
+    origins = EXTENSION_ORIGINS + (YOUTUBE_ORIGINS if path in CONTENT_SCRIPT_ENDPOINTS else ())
+    return any(re.fullmatch(pattern, origin) for pattern in origins)
+
+def create_app(daemon):
+    """The Flask app exposing ``daemon`` to the browser extension and other clients"""
+    app = Flask(__name__)
+    # CORS for the browser extension only
+    CORS(app, resources={
+        r'/api/(health|add-to-queue)$': {'origins': [f'^{o}$' for o in EXTENSION_ORIGINS + YOUTUBE_ORIGINS]},
+        r'/api/*': {'origins': [f'^{o}$' for o in EXTENSION_ORIGINS]}
+    })
+
+    @app.before_request
+    def check_client():
+        # Browsers send Origin with cross-site requests, including ones CORS can't block
+        origin = request.headers.get('Origin')
+        if origin and not origin_allowed(origin, request.path):
+            return jsonify({'status': 'error', 'message': 'Origin not allowed'}), 403
+        if (daemon.api_token and request.method != 'OPTIONS' and request.path != '/api/health'
+                and request.remote_addr not in LOOPBACK_ADDRESSES
+                and not hmac.compare_digest(request.headers.get(TOKEN_HEADER, ''), daemon.api_token)):
+            return jsonify({'status': 'error', 'message': f'Missing or wrong {TOKEN_HEADER} header'}), 401
+
+    def format_from(data):
+        format_val = data.get('format') or daemon.config.get('default_format', 'mp4')
+        return format_val.split(' ')[0].lower() if ' ' in format_val else format_val
+
+    @app.route('/api/health', methods=['GET'])
+    def health_check():
+        return jsonify({'status': 'ok', 'message': 'API server is running', 'daemon': True})
+
+    @app.route('/api/add-to-queue', methods=['POST'])
+    def add_to_queue_api():
+        try:
+            data = request.json or {}
+            url = data.get('url', '').strip()
+            if not url:
+                return jsonify({'status': 'error', 'message': 'URL is required'}), 400
+            try:
+                result = daemon.add(url, data.get('quality'), format_from(data), data.get('audio_bitrate'),
+                                    data.get('source', 'browser_extension'), scheduling_fields(data),
+                                    force=bool(data.get('force')), start=bool(data.get('start')))
+            except ValueError as e:
+                return jsonify({'status': 'error', 'message': str(e)}), 400
+
+            if result['status'] == 'expanding':
+                return jsonify({
+                    'status': 'success',
+                    'message': 'Playlist is being added to the queue',
+                    'expansion_id': result['expansion_id']
+                })
+            if result['status'] == 'archived':
+                return jsonify({
+                    'status': 'error',
+                    'message': f"Already {describe_archived(result['archived'])}; "
+                               f"send force: true to download it again",
+                    'archived': result['archived']
+                }), 409
+            if result['status'] == 'duplicate':
+                return jsonify({
+                    'status': 'error',
+                    'message': 'Video is already in the queue',
+                    'job_id': result['item']['id'],
+                    'queue_item': daemon.snapshot([result['item']])[0]
+                }), 409
+            return jsonify({
+                'status': 'success',
+                'message': 'Video added to queue',
+                'job_id': result['item']['id'],
+                'queue_item': daemon.snapshot([result['item']])[0]
+            })
+        except Exception as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 500
+
+    @app.route('/api/add-batch', methods=['POST'])
+    def add_batch_api():
+        try:
+            data = request.json or {}
+            urls = list(data.get('urls') or []) + parse_urls(data.get('text', ''))
+            if not urls:
+                return jsonify({'status': 'error', 'message': 'urls or text is required'}), 400
+            try:
+                items, rejected, duplicates, archived = daemon.enqueue_batch(
+                    urls, data.get('quality'), format_from(data), data.get('audio_bitrate'),
+                    data.get('source', 'batch'), scheduling_fields(data), bool(data.get('force')))
+            except ValueError as e:
+                return jsonify({'status': 'error', 'message': str(e)}), 400
+            return jsonify({
+                'status': 'success',
+                'message': f'Added {len(items)} video(s) to queue',
+                'job_ids': [item['id'] for item in items],
+                'rejected': rejected,
+                'duplicates': duplicates,
+                'archived': archived
+            })
+        except Exception as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 500
+
+    @app.route('/api/get-queue', methods=['GET'])
+    def get_queue_api():
+        return jsonify({'status': 'success', 'queue': daemon.snapshot(), 'downloading': daemon.is_downloading})
+
+    @app.route('/api/changes', methods=['GET'])
+    def changes_api():
+        return jsonify({'status': 'success', **daemon.changes(request.args.get('since', 0, type=int))})
+
+    @app.route('/api/logs', methods=['GET'])
+    def logs_api():
+        seq, lines = daemon.logs(request.args.get('since', 0, type=int))
+        return jsonify({'status': 'success', 'seq': seq, 'lines': lines})
+
+    @app.route('/api/queue-item/<job_id>', methods=['GET', 'PATCH'])
+    def queue_item_api(job_id):
+        item = daemon.find_item(job_id)
+        if item is None:
+            return jsonify({'status': 'error', 'message': 'Unknown job ID',
+                            'title_status': daemon.title_resolver.state(job_id)}), 404
+        if request.method == 'PATCH':
+            try:
+                item = daemon.update_item(job_id, **scheduling_fields(request.json or {}))
+            except ValueError as e:
+                return jsonify({'status': 'error', 'message': str(e)}), 400
+        return jsonify({'status': 'success', 'queue_item': daemon.snapshot([item])[0],
+                        'title_status': item.get('title_status', 'resolved')})
+
+    @app.route('/api/queue-item/<job_id>/move', methods=['POST'])
+    def move_queue_item_api(job_id):
+        if not daemon.move(job_id, (request.json or {}).get('before')):
+            return jsonify({'status': 'error', 'message': 'Unknown job ID'}), 404
+        return jsonify({'status': 'success'})
+
+    @app.route('/api/queue-item/<job_id>/<action>', methods=['POST'])
+    def control_queue_item_api(job_id, action):
+        if action not in ('pause', 'resume', 'cancel'):
+            return jsonify({'status': 'error', 'message': f'Unknown action: {action}'}), 404
+        item = daemon.find_item(job_id)
+        if item is None:
+            return jsonify({'status': 'error', 'message': 'Unknown job ID'}), 404
+        if not daemon.control(job_id, action):
+            return jsonify({'status': 'error',
+                            'message': f"Cannot {action} an item that is {item['status']}"}), 409
+        return jsonify({'status': 'success', 'queue_item': daemon.snapshot([item])[0]})
+
+    @app.route('/api/start-queue', methods=['POST'])
+    def start_queue_api():
+        daemon.start()
+        return jsonify({'status': 'success', 'downloading': daemon.is_downloading})
+
+    @app.route('/api/clear-queue', methods=['POST'])
+    def clear_queue_api():
+        cleared = daemon.clear()
+        return jsonify({'status': 'success', 'message': f'Cleared {cleared} finished item(s)', 'cleared': cleared})
+
+    @app.route('/api/settings', methods=['GET', 'POST'])
+    def settings_api():
+        if request.method == 'POST':
+            data = request.json or {}
+            if 'default_path' in data and not daemon.path_allowed(str(data['default_path'])):
+                return jsonify({'status': 'error',
+                                'message': f"Download folder must be inside {daemon.download_root}"}), 400
+            try:
+                return jsonify({'status': 'success', 'settings': daemon.update_settings(**data)})
+            except ValueError as e:
+                return jsonify({'status': 'error', 'message': str(e)}), 400
+        return jsonify({'status': 'success', 'settings': daemon.settings()})
+
+    @app.route('/api/history', methods=['GET'])
+    def history_api():
+        entries = daemon.history_page(request.args.get('offset', 0, type=int),
+                                      request.args.get('limit', HISTORY_PAGE_SIZE, type=int))
+        return jsonify({'status': 'success', 'history': entries})
+
+    @app.route('/api/expansions', methods=['GET'])
+    def expansions_api():
+        return jsonify({'status': 'success', 'expansions': daemon.playlist_expander.state()})
+
+    @app.route('/api/expansions/<expansion_id>/stop', methods=['POST'])
+    def stop_expansion_api(expansion_id):
+        if not daemon.playlist_expander.stop(expansion_id):
+            return jsonify({'status': 'error', 'message': 'No running expansion with that ID'}), 404
+        return jsonify({'status': 'success', 'expansion': daemon.playlist_expander.state(expansion_id)})
+
+    @app.route('/api/rate-state', methods=['GET'])
+    def rate_state_api():
+        return jsonify({'status': 'success', 'rate': daemon.rate_controller.state(),
+                        'bandwidth': daemon.bandwidth.state()})
+
+    @app.route('/api/client-stats', methods=['GET'])
+    def client_stats_api():
+        return jsonify({'status': 'success',
+                        'order': [s.name for s in daemon.client_strategies.ranked()],
+                        'stats': daemon.client_strategies.stats()})
+
+    @app.route('/api/get-video-info', methods=['POST'])
+    def get_video_info_api():
+        try:
+            url = (request.json or {}).get('url', '').strip()
+            if not url:
+                return jsonify({'status': 'error', 'message': 'URL is required'}), 400
+            info = get_video_info(url) or {}
+            return jsonify({
+                'status': 'success',
+                'title': clean_title(info.get('title')),
+                'url': url,
+                'video_id': info.get('id'),
+                'duration': info.get('duration'),
+                'filesize_estimates': info.get('filesize_estimates', {})
+            })
+        except Exception as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 500
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the download queue without a GUI")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="address to serve the API on (default: localhost)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--config', default=CONFIG_FILE)
+    parser.add_argument('--download-path', help="download folder (default: default_path in the config file)")
+    parser.add_argument('--download-root',
+                        help="folder clients may choose download folders in (default: the download folder)")
+    parser.add_argument('--no-start', action='store_true',
+                        help="don't start queued downloads until a client asks (POST /api/start-queue)")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if args.download_path:
+        config['default_path'] = args.download_path
+    if args.download_root:
+        config['download_root'] = args.download_root
+    daemon = DownloadDaemon(config, config_path=args.config)
+    # A service downloads whatever is queued
+    daemon.auto_start = not args.no_start
+
+    def stop(signum, frame):
+        daemon.log_message("🛑 Shutting down...")
+        daemon.shutdown()
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    daemon.log_message(f"🚀 Download daemon started; saving to {daemon.download_path}")
+    daemon.open(start=not args.no_start)
+    daemon.serve(args.host, args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Parallel Download Scheduler
+Runs queued downloads on a bounded worker pool with a per-host cap
+"""
+
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+DEFAULT_MAX_WORKERS = 3
+# youtube.com, www./m. subdomains and youtu.be all count as one host, so for
+# a YouTube-only queue this is the real limit; keep it equal to the pool size
+DEFAULT_MAX_PER_HOST = DEFAULT_MAX_WORKERS
+
+def host_key(url):
+    """Return the host a download counts against for the per-host cap"""
+    host = urlparse(url).netloc.lower().split(':')[0]
+    if host.startswith('www.') or host.startswith('m.'):
+        host = host.split('.', 1)[1]
+    if host == 'youtu.be':
+        host = 'youtube.com'
+    return host
+
+class DownloadScheduler:
+    """Run ``worker(item)`` for every queued item, N at a time.
+
+    The scheduler reads the live queue list, so items appended while it is
+    running are picked up after ``wake()`` is called. Queued items start in
+    queue order, or in ascending ``order(item)`` when a key is given.
+    """
+
+    def __init__(self, worker, max_workers=DEFAULT_MAX_WORKERS, max_per_host=DEFAULT_MAX_PER_HOST,
+                 on_start=None, on_finish=None, order=None, log=None):
+        self.worker = worker
+        self.order = order
+        self.max_workers = max(1, int(max_workers))
+        self.max_per_host = max(1, int(max_per_host))
+        self.on_start = on_start
+        self.on_finish = on_finish
+        self.log = log or print
+        self._cond = threading.Condition()
+        self._active = {}
+        self._host_counts = {}
+        self._stopped = False
+
+    def active_items(self):
+        """Items currently being downloaded"""
+        with self._cond:
+            return list(self._active.values())
+
+    def wake(self):
+        """Re-check the queue for newly added items"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def stop(self):
+        """Stop starting new items; running items finish normally"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def resume(self):
+        """Start queued items again after ``stop()``"""
+        with self._cond:
+            self._stopped = False
+            self._cond.notify_all()
+
+    def _next_item(self, queue):
+        if len(self._active) >= self.max_workers:
+            return None
+        candidates = list(queue)
+        if self.order:
+            # sorted() is stable, so ties keep queue order
+            candidates.sort(key=self.order)
+        for item in candidates:
+            if item.get('status') != 'Queued' or id(item) in self._active:
+                continue
+            if self._host_counts.get(host_key(item.get('url', '')), 0) < self.max_per_host:
+                return item
+        return None
+
+    def run(self, queue):
+        """Process ``queue`` until no queued items remain; blocks the caller.
+
+        Returns at once after ``stop()``, until ``resume()`` is called.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            with self._cond:
+                while True:
+                    item = None if self._stopped else self._next_item(queue)
+                    if item is None:
+                        if not self._active and (self._stopped or not any(
+                                i.get('status') == 'Queued' for i in queue)):
+                            break
+                        self._cond.wait()
+                        continue
+
+                    host = host_key(item.get('url', ''))
+                    item['status'] = 'Downloading'
+                    self._active[id(item)] = item
+                    self._host_counts[host] = self._host_counts.get(host, 0) + 1
+                    pool.submit(self._run_item, item, host)
+
+    def _run_item(self, item, host):
+        success = False
+        try:
+            if self.on_start:
+                self.on_start(item)
+            success = self.worker(item)
+        except Exception as e:
+            success = False
+            self.log(f"❌ Worker error for {item.get('url', '')}: {e}\n{traceback.format_exc().rstrip()}")
+        finally:
+            try:
+                if self.on_finish:
+                    self.on_finish(item, success)
+            finally:
+                with self._cond:
+                    self._active.pop(id(item), None)
+                    self._host_counts[host] -= 1
+                    self._cond.notify_all()
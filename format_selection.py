@@ -0,0 +1,282 @@
+"""
+Format Selection
+Picks separate best-video and best-audio (DASH) streams under a height /
+codec / bitrate policy, and optionally downloads both at once before
+remuxing them with stream copy
+
+``best`` / ``best[height<=Q]`` only considers pre-muxed streams, which YouTube
+stops offering above 720p, so 1080p and 4K need video and audio fetched
+separately and merged.
+"""
+
+import os
+import shutil
+import subprocess
+import threading
+
+from bandwidth import parse_rate
+from ytdlp_engine import ProgressEvent
+
+# Codecs preferred (at equal resolution) for each container, so the merged
+# file plays back widely without a re-encode
+CODEC_PREFERENCES = {
+    'mp4': ('avc1', 'm4a'),
+    'mov': ('avc1', 'm4a'),
+    'webm': ('vp9', 'opus'),
+    'mkv': ('vp9', 'opus')
+}
+
+AUDIO_FORMATS = ('mp3', 'm4a', 'wav', 'opus')
+
+# WAV is uncompressed 16-bit stereo at 44.1 kHz
+WAV_BYTES_PER_SECOND = 44100 * 2 * 2
+
+def normalize_quality(quality):
+    """Return 'best' or a maximum height ('1080') for 'best', '1080', '1080p' or 1080.
+
+    Raises ValueError for anything else.
+    """
+    text = str(quality or 'best').strip().lower()
+    if text == 'best':
+        return text
+    height = text[:-1] if text.endswith('p') else text
+    if not height.isdigit() or not int(height):
+        raise ValueError(f"Invalid quality {quality!r}: use 'best' or a height such as '1080'")
+    return str(int(height))
+
+def video_format(quality='best', container='mp4', max_video_bitrate=None):
+    """Return (format spec, extra args) selecting best video + best audio.
+
+    ``quality`` is a maximum height ('1080') or 'best'; ``max_video_bitrate``
+    an optional cap on the video stream in kbit/s. Pre-muxed streams are
+    only the last resort.
+    """
+    height = '' if quality == 'best' else f'[height<={quality}]'
+    bitrate = f'[tbr<={max_video_bitrate}]' if max_video_bitrate else ''
+    spec = f'bv*{height}{bitrate}+ba/b{height}'
+
+    sort = ['res' if quality == 'best' else f'res:{quality}', 'fps']
+    vcodec, acodec = CODEC_PREFERENCES.get(container, (None, None))
+    if vcodec:
+        sort.extend([f'vcodec:{vcodec}', f'acodec:{acodec}'])
+    return spec, ['--format-sort', ','.join(sort)]
+
+def _stream_size(fmt, duration):
+    if fmt.get('filesize'):
+        return fmt['filesize']
+    if fmt.get('tbr') and duration:
+        return int(fmt['tbr'] * 1000 / 8 * duration)
+    return None
+
+def _has(fmt, codec_field):
+    return fmt.get(codec_field) not in (None, 'none')
+
+# How the --format-sort codec names appear in format lists
+CODEC_PREFIXES = {'avc1': ('avc1', 'h264'), 'vp9': ('vp9', 'vp09'), 'm4a': ('mp4a', 'aac'), 'opus': ('opus',)}
+
+def _codec_rank(fmt, codec_field, preferred):
+    prefixes = CODEC_PREFIXES.get(preferred, ())
+    return 1 if (fmt.get(codec_field) or '').startswith(prefixes) else 0
+
+def estimate_size(info, quality='best', container='mp4', audio_bitrate=None, max_video_bitrate=None):
+    """Expected download size in bytes for a cached format list, or None.
+
+    ``info`` is a metadata cache entry (its ``formats`` and ``duration``).
+    Mirrors ``video_format``: highest resolution under the cap, then the
+    container's preferred codecs, then bitrate; plus the best audio stream.
+    """
+    formats = (info or {}).get('formats') or []
+    duration = (info or {}).get('duration')
+    audio = [f for f in formats if _has(f, 'acodec') and not _has(f, 'vcodec') and _stream_size(f, duration)]
+    vcodec, acodec = CODEC_PREFERENCES.get(container, (None, None))
+
+    if container in AUDIO_FORMATS:
+        # The converted file's size follows from the target bitrate, not the source stream
+        if container == 'wav' and duration:
+            return int(duration * WAV_BYTES_PER_SECOND)
+        if audio_bitrate and duration:
+            try:
+                return int(duration * float(str(audio_bitrate).lower().rstrip('k')) * 1000 / 8)
+            except ValueError:
+                pass
+        return max(_stream_size(f, duration) for f in audio) if audio else None
+
+    try:
+        quality = normalize_quality(quality)
+    except ValueError:
+        return None
+    height = None if quality == 'best' else int(quality)
+    video = [f for f in formats if _has(f, 'vcodec') and _stream_size(f, duration)
+             and (height is None or (f.get('height') or 0) <= height)
+             and (not max_video_bitrate or (f.get('tbr') or 0) <= max_video_bitrate)]
+    separate = [f for f in video if not _has(f, 'acodec')]
+    if separate and audio:
+        best_video = max(separate, key=lambda f: (f.get('height') or 0, _codec_rank(f, 'vcodec', vcodec), f.get('tbr') or 0))
+        best_audio = max(audio, key=lambda f: (_codec_rank(f, 'acodec', acodec), f.get('tbr') or 0))
+        return _stream_size(best_video, duration) + _stream_size(best_audio, duration)
+    muxed = [f for f in video if _has(f, 'acodec')]
+    if muxed:
+        return _stream_size(max(muxed, key=lambda f: (f.get('height') or 0, f.get('tbr') or 0)), duration)
+    return None
+
+def _replace_option(args, option, value):
+    args = list(args)
+    if option in args:
+        index = args.index(option)
+        if value is None:
+            del args[index:index + 2]
+        else:
+            args[index + 1] = value
+    elif value is not None:
+        args.extend([option, value])
+    return args
+
+def _option(args, option):
+    if option in args:
+        return args[args.index(option) + 1]
+    return None
+
+def merge_streams(video_path, audio_path, output_path):
+    """Mux ``video_path`` and ``audio_path`` into ``output_path`` without re-encoding"""
+    cmd = ['ffmpeg', '-y', '-loglevel', 'error', '-i', video_path, '-i', audio_path,
+           '-map', '0:v:0', '-map', '1:a:0', '-c', 'copy']
+    if output_path.endswith(('.mp4', '.mov')):
+        cmd.extend(['-movflags', '+faststart'])
+    result = subprocess.run(cmd + [output_path], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or "ffmpeg failed")
+
+def split_rate_limit(limit, video, audio):
+    """Share a --limit-rate value between the two streams by bitrate, so they finish together"""
+    rate = parse_rate(limit)
+    weights = [video.get('tbr') or 0, audio.get('tbr') or 0]
+    if not all(weights):
+        weights = [1, 1]
+    return [str(max(1, int(rate * weight / sum(weights)))) for weight in weights]
+
+def can_fetch_in_parallel():
+    return shutil.which('ffmpeg') is not None
+
+def wants_parallel(args):
+    """True if ``run_parallel`` would look at the format selection for ``args``"""
+    return '-x' not in args and can_fetch_in_parallel()
+
+class _CombinedProgress:
+    """Adds up the progress of the video and audio streams into one event.
+
+    The event names the file of the stream that reported last, so resume
+    state picks up both partial files; its byte counts cover both streams.
+    """
+
+    def __init__(self, on_progress, format_id):
+        self.on_progress = on_progress
+        self.format_id = format_id
+        self.events = {}
+        self.filenames = {}
+        self._lock = threading.Lock()
+
+    def stream(self, name):
+        def on_stream_progress(event):
+            with self._lock:
+                self.events[name] = event
+                if event.status == 'finished' and event.filename:
+                    self.filenames[name] = event.filename
+                events = list(self.events.values())
+            if self.on_progress:
+                finished = all(e.status == 'finished' for e in events) and len(events) == 2
+                totals = [e.total_bytes for e in events]
+                combined = ProgressEvent(
+                    status='finished' if finished else 'downloading',
+                    downloaded_bytes=sum(e.downloaded_bytes for e in events),
+                    total_bytes=sum(totals) if len(events) == 2 and all(totals) else None,
+                    speed=sum(e.speed or 0 for e in events if e.status == 'downloading') or None,
+                    eta=max((e.eta for e in events if e.eta is not None), default=None),
+                    filename=event.filename,
+                    tmpfilename=event.tmpfilename,
+                    format_id=self.format_id,
+                    selection=self.format_id
+                )
+                combined.counter = self.format_id
+                self.on_progress(combined)
+        return on_stream_progress
+
+def run_parallel(engine, args, url, cwd=None, on_line=None, on_progress=None, job=None, throttle=None,
+                 info=None):
+    """Like ``engine.run``, but fetch the video and audio streams concurrently.
+
+    yt-dlp resolves the format selection in ``args`` first, unless the
+    caller passes that ``info`` (``engine.extract_info(url, args=args)``, or
+    {} if it failed). When it picks separate video and audio streams, each
+    is downloaded from that info by its own engine run and the two are then
+    remuxed with ffmpeg stream copy into the --merge-output-format
+    container. Anything else (a pre-muxed stream, audio extraction, no
+    ffmpeg) goes through a normal ``engine.run``.
+    """
+    args = list(args)
+    if not wants_parallel(args):
+        return engine.run(args, url, cwd, on_line, on_progress, job, throttle)
+
+    if info is None:
+        info = engine.extract_info(url, args=args) or {}
+    requested = info.get('requested_formats') or []
+    if len(requested) != 2:
+        return engine.run(args, url, cwd, on_line, on_progress, job, throttle, info=info or None)
+
+    video, audio = requested
+    if video.get('vcodec') in (None, 'none'):
+        video, audio = audio, video
+    format_id = f"{video['format_id']}+{audio['format_id']}"
+    if on_line:
+        on_line(f"[parallel] Fetching video {video['format_id']} ({video.get('height')}p "
+                f"{video.get('vcodec')}) and audio {audio['format_id']} ({audio.get('acodec')}) concurrently")
+
+    merge_ext = _option(args, '--merge-output-format') or 'mkv'
+    template = _option(args, '--output') or '%(title)s.%(ext)s'
+    stream_args = _replace_option(args, '--merge-output-format', None)
+    stream_args = _replace_option(stream_args, '--output', template.replace('.%(ext)s', '.f%(format_id)s.%(ext)s'))
+
+    # Each stream run would otherwise get the whole --limit-rate
+    limits = {}
+    if _option(stream_args, '--limit-rate'):
+        limits['video'], limits['audio'] = split_rate_limit(_option(stream_args, '--limit-rate'), video, audio)
+
+    combined = _CombinedProgress(on_progress, format_id)
+    codes = {}
+
+    def fetch(name, stream):
+        child = job.child() if job else None
+        fetch_args = _replace_option(stream_args, '--format', stream['format_id'])
+        if name in limits:
+            fetch_args = _replace_option(fetch_args, '--limit-rate', limits[name])
+        codes[name] = engine.run(fetch_args, url, cwd, on_line, combined.stream(name), child, throttle, info=info)
+
+    threads = [threading.Thread(target=fetch, args=('video', video), daemon=True),
+               threading.Thread(target=fetch, args=('audio', audio), daemon=True)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if job and job.cancelled.is_set():
+        return -1
+    if any(code != 0 for code in codes.values()):
+        return 1
+
+    video_path, audio_path = combined.filenames.get('video'), combined.filenames.get('audio')
+    if not video_path or not audio_path:
+        return 1
+    output_path = video_path.replace(f".f{video['format_id']}.", '.', 1).rsplit('.', 1)[0] + f'.{merge_ext}'
+    try:
+        merge_streams(video_path, audio_path, output_path)
+    except (OSError, RuntimeError) as e:
+        if on_line:
+            on_line(f"ERROR: Merging streams failed: {e}")
+        return 1
+    for path in (video_path, audio_path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    if on_line:
+        on_line(f"[parallel] Merged into {output_path} (stream copy)")
+    return 0
@@ -0,0 +1,211 @@
+"""
+Fragment Concurrency Tuner
+Learns the fragment concurrency, HTTP chunk size and buffer size that give
+the best throughput, per network and per kind of download
+
+Each job runs with the best settings known for its network profile and
+download context (e.g. 'mp4:1080'), or occasionally with a neighbouring
+setting to explore. Throughput is measured over the first seconds of the
+download. An exploring job that is clearly slower than the known best is
+reported so the caller can switch back (the download resumes, so nothing is
+lost). Results are kept in ``fragment_tuning.json``.
+"""
+
+import json
+import random
+import socket
+import threading
+import time
+
+from json_store import DelayedSave, load_json, save_json
+
+TUNING_FILE = "fragment_tuning.json"
+
+CONCURRENCY_STEPS = [1, 2, 4, 8, 16]
+CHUNK_SIZE_STEPS = [5 * 1024 * 1024, 10 * 1024 * 1024, 20 * 1024 * 1024, 50 * 1024 * 1024]
+BUFFER_SIZE_STEPS = [16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024]
+
+DEFAULT_SETTINGS = {'concurrent_fragments': 4, 'http_chunk_size': 10 * 1024 * 1024, 'buffer_size': 64 * 1024}
+
+# Seconds of download (after the first progress update) used to measure throughput
+PROBE_SECONDS = 8.0
+EXPLORE_RATE = 0.25
+EWMA_ALPHA = 0.3
+# An exploring job slower than this fraction of the best is switched back
+REVERT_RATIO = 0.6
+
+STEPS = {
+    'concurrent_fragments': CONCURRENCY_STEPS,
+    'http_chunk_size': CHUNK_SIZE_STEPS,
+    'buffer_size': BUFFER_SIZE_STEPS
+}
+
+def network_profile():
+    """Identify the current network by the local address's /24 subnet"""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            # Connecting a UDP socket sends nothing; it just picks the outgoing interface
+            sock.connect(('8.8.8.8', 80))
+            address = sock.getsockname()[0]
+    except OSError:
+        return 'offline'
+    return '.'.join(address.split('.')[:3]) + '.0/24'
+
+def settings_key(settings):
+    return f"{settings['concurrent_fragments']}/{settings['http_chunk_size']}/{settings['buffer_size']}"
+
+def settings_args(settings):
+    """yt-dlp arguments for ``settings``"""
+    return ['--concurrent-fragments', str(settings['concurrent_fragments']),
+            '--http-chunk-size', str(settings['http_chunk_size']),
+            '--buffer-size', str(settings['buffer_size'])]
+
+def _neighbours(settings):
+    result = []
+    for field, steps in STEPS.items():
+        index = steps.index(settings[field]) if settings[field] in steps else 0
+        for step in (index - 1, index + 1):
+            if 0 <= step < len(steps):
+                result.append(dict(settings, **{field: steps[step]}))
+    return result
+
+def _fastest(entry):
+    return max(entry['trials'].values(), key=lambda t: t['speed'])['settings']
+
+class Tuning:
+    """Settings chosen for one job, plus its throughput measurement"""
+
+    def __init__(self, tuner, key, settings, exploring, best_speed):
+        self.tuner = tuner
+        self.key = key
+        self.settings = settings
+        self.exploring = exploring
+        self.best_speed = best_speed
+        self.speed = None
+        self._started = None
+        self._bytes = 0
+        self._last = {}
+        self._recorded = False
+
+    def args(self):
+        return settings_args(self.settings)
+
+    def describe(self):
+        s = self.settings
+        text = (f"{s['concurrent_fragments']} fragment(s), {s['http_chunk_size'] // (1024 * 1024)}MiB chunks, "
+                f"{s['buffer_size'] // 1024}KiB buffer")
+        return text + (" (exploring)" if self.exploring else "")
+
+    def observe(self, event):
+        """Feed a ProgressEvent; returns True once the probe says to switch back"""
+        if self.speed is not None or event.status != 'downloading':
+            return False
+        now = time.monotonic()
+        key = event.counter_key
+        previous = self._last.get(key)
+        self._last[key] = event.downloaded_bytes
+        if self._started is None:
+            self._started = now
+            return False
+        if previous is not None and event.downloaded_bytes > previous:
+            self._bytes += event.downloaded_bytes - previous
+        if now - self._started < PROBE_SECONDS:
+            return False
+        self.speed = self._bytes / (now - self._started)
+        return bool(self.exploring and self.best_speed and self.speed < REVERT_RATIO * self.best_speed)
+
+    def finish(self):
+        """Record the measured throughput, if the probe completed"""
+        if self.speed is not None and not self._recorded:
+            self._recorded = True
+            self.tuner.record(self.key, self.settings, self.speed)
+
+class FragmentTuner:
+    """Per network profile and context, the best known download settings"""
+
+    def __init__(self, path=TUNING_FILE, profile=None):
+        self.path = path
+        self.profile = profile
+        self._data = load_json(path)
+        # Trials measured since the last save, per profile|context key
+        self._dirty = {}
+        self._lock = threading.Lock()
+        self._saver = DelayedSave(self.save)
+
+    def _key(self, context):
+        return f"{self.profile or network_profile()}|{context}"
+
+    def best(self, context):
+        """Return the best known settings for ``context`` and their speed"""
+        with self._lock:
+            entry = self._data.get(self._key(context))
+        if not entry or not entry.get('best'):
+            return dict(DEFAULT_SETTINGS), None
+        return dict(entry['best']), entry['trials'][settings_key(entry['best'])]['speed']
+
+    def choose(self, context):
+        """Pick the settings for a new job"""
+        key = self._key(context)
+        best, best_speed = self.best(context)
+        exploring = best_speed is None or random.random() < EXPLORE_RATE
+        if best_speed is not None and exploring:
+            with self._lock:
+                trials = (self._data.get(key) or {}).get('trials', {})
+            # Prefer neighbours that haven't been measured, or not measured as worse
+            candidates = [n for n in _neighbours(best)
+                          if trials.get(settings_key(n), {}).get('speed', best_speed) >= REVERT_RATIO * best_speed]
+            if candidates:
+                return Tuning(self, key, random.choice(candidates), True, best_speed)
+        return Tuning(self, key, best, best_speed is None, best_speed)
+
+    def exploit(self, context):
+        """Return a Tuning with the best known settings, without exploring"""
+        best, best_speed = self.best(context)
+        return Tuning(self, self._key(context), best, False, best_speed)
+
+    def record(self, key, settings, speed):
+        """Fold one measured throughput into the statistics"""
+        with self._lock:
+            entry = self._data.setdefault(key, {'best': None, 'trials': {}})
+            trial = entry['trials'].setdefault(settings_key(settings), {'settings': settings, 'speed': speed, 'runs': 0})
+            trial['runs'] += 1
+            if trial['runs'] > 1:
+                trial['speed'] += EWMA_ALPHA * (speed - trial['speed'])
+            best = entry['best'] and entry['trials'].get(settings_key(entry['best']))
+            if not best or trial['speed'] > best['speed'] or best is trial:
+                # Re-pick in case the current best just got slower
+                entry['best'] = _fastest(entry)
+            self._dirty.setdefault(key, set()).add(settings_key(settings))
+        self._saver.schedule()
+
+    def save(self):
+        """Write the learned settings to disk now.
+
+        Only the trials this instance measured replace those in the file, so
+        results another process saved meanwhile are kept, and picked up.
+        """
+        stored = load_json(self.path)
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            for key, trial_keys in dirty.items():
+                entry = stored.setdefault(key, {'best': None, 'trials': {}})
+                for trial_key in trial_keys:
+                    entry['trials'][trial_key] = self._data[key]['trials'][trial_key]
+                entry['best'] = _fastest(entry)
+            # A deep copy, so later records don't change what is being written
+            self._data = json.loads(json.dumps(stored))
+        if not save_json(self.path, stored, indent=2):
+            with self._lock:
+                for key, trial_keys in dirty.items():
+                    self._dirty.setdefault(key, set()).update(trial_keys)
+
+_tuner = None
+_tuner_lock = threading.Lock()
+
+def get_tuner(profile=None):
+    """Return the process-wide tuner; ``profile`` only applies on first use"""
+    global _tuner
+    with _tuner_lock:
+        if _tuner is None:
+            _tuner = FragmentTuner(profile=profile)
+        return _tuner
@@ -0,0 +1,138 @@
+"""
+Download History Store
+SQLite-backed download history with indexed, paged queries
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+from youtube_urls import canonical_key
+
+HISTORY_DB = "download_history.db"
+LEGACY_HISTORY_FILE = "download_history.json"
+HISTORY_PAGE_SIZE = 200
+
+COLUMNS = ('timestamp', 'url', 'video_id', 'title', 'quality', 'format', 'status', 'size')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    url TEXT NOT NULL,
+    video_id TEXT,
+    title TEXT,
+    quality TEXT,
+    format TEXT,
+    status TEXT,
+    size TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history (timestamp);
+CREATE INDEX IF NOT EXISTS idx_history_url ON history (url);
+CREATE INDEX IF NOT EXISTS idx_history_video_id ON history (video_id);
+CREATE INDEX IF NOT EXISTS idx_history_status ON history (status);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+class HistoryStore:
+    """Download history kept in SQLite (WAL mode).
+
+    Each completed download is one INSERT, so recording a download no longer
+    re-serializes the whole history. Entries are returned as the same dicts
+    the JSON history used ('timestamp', 'url', 'title', ...).
+    """
+
+    def __init__(self, path=HISTORY_DB, legacy_path=LEGACY_HISTORY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        if legacy_path:
+            self.import_json(legacy_path)
+
+    def _row(self, entry):
+        entry = dict(entry)
+        entry.setdefault('video_id', canonical_key(entry.get('url', '')))
+        entry.setdefault('size', 'Unknown')
+        return tuple(entry.get(column) for column in COLUMNS)
+
+    def import_json(self, path):
+        """Import a JSON history file from older versions, once.
+
+        Returns the number of imported entries. A file that doesn't hold a
+        list is skipped, as are entries that aren't dicts or lack a
+        timestamp or URL.
+        """
+        with self._lock:
+            imported = self._conn.execute(
+                "SELECT value FROM meta WHERE key = 'imported_json'").fetchone()
+            if imported or not os.path.exists(path):
+                return 0
+            try:
+                with open(path, 'r') as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                return 0
+            if not isinstance(entries, list):
+                return 0
+            entries = [entry for entry in entries
+                       if isinstance(entry, dict) and entry.get('timestamp') and entry.get('url')]
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT INTO history ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                    [self._row(entry) for entry in entries])
+                self._conn.execute("INSERT INTO meta (key, value) VALUES ('imported_json', ?)", (path,))
+        return len(entries)
+
+    def add(self, entry):
+        """Record one download; returns the new row ID"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"INSERT INTO history ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                self._row(entry))
+            return cursor.lastrowid
+
+    def _where(self, status=None, search=None, video_id=None):
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if video_id:
+            clauses.append("video_id = ?")
+            params.append(video_id)
+        if search:
+            clauses.append("(title LIKE ? OR url LIKE ?)")
+            params.extend([f"%{search}%", f"%{search}%"])
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def page(self, offset=0, limit=HISTORY_PAGE_SIZE, status=None, search=None, video_id=None):
+        """Return up to ``limit`` entries, newest first, skipping ``offset``"""
+        where, params = self._where(status, search, video_id)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM history{where} ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]).fetchall()
+        return [dict(row) for row in rows]
+
+    def recent(self, limit=20):
+        """Return the ``limit`` newest entries, newest first"""
+        return self.page(0, limit)
+
+    def find(self, timestamp):
+        """Return the newest entry recorded at ``timestamp``, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM history WHERE timestamp = ? ORDER BY id DESC LIMIT 1",
+                (timestamp,)).fetchone()
+        return dict(row) if row else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -14,7 +14,7 @@ echo Installation complete!
 echo.
 echo To run the application, use: python youtube_downloader_modern.py
 echo.
-echo To start the API server for browser extension, use: python api_server.py
+echo To download without a window, use: python download_daemon.py
 echo.
 pause
 
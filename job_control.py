@@ -0,0 +1,137 @@
+"""
+Job Control
+Per-item pause, resume and cancel for queued and running downloads
+
+Pausing a running download stops its transfer but keeps the partial files;
+the item goes to 'Paused', and resuming puts it back in the queue, where
+yt-dlp continues the partial file (--continue). Cancelling stops the
+yt-dlp process tree and deletes the item's partial and intermediate files.
+"""
+
+import glob
+import os
+import re
+import threading
+
+PAUSED = 'Paused'
+CANCELLED = 'Cancelled'
+
+# Suffixes yt-dlp gives files that are only needed until a download completes
+TEMP_SUFFIXES = ('.part', '.ytdl', '.temp')
+# A single stream of a merged download, e.g. 'Title.f137.mp4'
+_STREAM_FILE = re.compile(r'\.f\d+[\w-]*\.\w+$')
+
+def partial_files(item, job=None):
+    """Files an item's download may have left behind: reported by ``job`` or recorded for resuming"""
+    resume = item.get('resume') or {}
+    files = set(resume.get('partial_files') or [])
+    if resume.get('tmpfilename'):
+        files.add(resume['tmpfilename'])
+    if job is not None:
+        files |= job.all_files()
+    return files
+
+def remove_partial_files(files):
+    """Delete ``files`` and yt-dlp's temporary companions of them; returns how many were removed"""
+    candidates = set()
+    for path in files:
+        stem = path[:-len('.part')] if path.endswith('.part') else path
+        if path.endswith(TEMP_SUFFIXES) or _STREAM_FILE.search(stem):
+            # Never a finished download, which may be reported too
+            candidates.add(path)
+        candidates.update(stem + suffix for suffix in TEMP_SUFFIXES)
+        candidates.update(glob.glob(glob.escape(stem) + '.part-Frag*'))
+    removed = 0
+    for path in candidates:
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+class JobControl:
+    """Pause / resume / cancel requests for queue items, keyed by item ID.
+
+    Workers ``attach`` the EngineJob of each attempt and check ``requested``
+    between attempts; the queue's finish handler then asks ``finish`` for the
+    status the item should end up with.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._files = {}
+        self._requests = {}
+        self._lock = threading.Lock()
+
+    def attach(self, item, job):
+        """Register the running attempt ``job`` for ``item``"""
+        with self._lock:
+            self._jobs[item['id']] = job
+            pending = item['id'] in self._requests
+        if pending:
+            job.cancel()
+
+    def detach(self, item, job):
+        with self._lock:
+            if self._jobs.get(item['id']) is job:
+                del self._jobs[item['id']]
+            self._files.setdefault(item['id'], set()).update(job.all_files())
+
+    def requested(self, item):
+        """'pause' or 'cancel' if the user asked to stop ``item``, else None"""
+        with self._lock:
+            return self._requests.get(item['id'])
+
+    def pause(self, item):
+        """Pause a queued or running item; returns False if it can't be paused"""
+        if item['status'] == 'Queued':
+            item['status'] = PAUSED
+            return True
+        if item['status'] == 'Downloading':
+            return self._stop(item, 'pause')
+        return False
+
+    def resume(self, item):
+        """Put a paused (or failed) item back in the queue"""
+        if item['status'] not in (PAUSED, 'Failed'):
+            return False
+        item['status'] = 'Queued'
+        return True
+
+    def cancel(self, item):
+        """Cancel an item; a running one is stopped and cleaned up when its worker finishes"""
+        if item['status'] == 'Downloading':
+            return self._stop(item, 'cancel')
+        if item['status'] in ('Completed', CANCELLED):
+            return False
+        item['status'] = CANCELLED
+        self._clean(item)
+        return True
+
+    def _stop(self, item, request):
+        with self._lock:
+            self._requests[item['id']] = request
+            job = self._jobs.get(item['id'])
+        if job is not None:
+            job.cancel()
+        return True
+
+    def finish(self, item):
+        """Return the status a stopped item ends with (PAUSED / CANCELLED), or None"""
+        with self._lock:
+            request = self._requests.pop(item['id'], None)
+        if request == 'cancel':
+            self._clean(item)
+            return CANCELLED
+        if request == 'pause':
+            return PAUSED
+        with self._lock:
+            self._files.pop(item['id'], None)
+        return None
+
+    def _clean(self, item):
+        with self._lock:
+            files = self._files.pop(item['id'], set())
+        remove_partial_files(files | partial_files(item))
+        item.pop('resume', None)
@@ -0,0 +1,57 @@
+"""
+JSON State Files
+Loading and saving the small JSON files that caches and statistics persist
+to (metadata cache, client stats, fragment tuning, playlist expansions)
+
+Saves are coalesced: ``DelayedSave.schedule()`` writes once, SAVE_DELAY
+seconds after the first change. Files are replaced by atomic rename, so a
+reader never sees half a file. The GUIs and the daemon may share a file, so
+each store merges its changes into what is on disk instead of overwriting it.
+"""
+
+import json
+import os
+import threading
+
+SAVE_DELAY = 2.0
+
+def load_json(path):
+    """Return the dict stored in ``path``; {} if it is missing or unreadable"""
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+def save_json(path, data, **dump_args):
+    """Replace ``path`` with ``data`` atomically; returns False if it couldn't be written"""
+    try:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, **dump_args)
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        return False
+
+class DelayedSave:
+    """Calls ``save()`` once, ``delay`` seconds after the first ``schedule()``"""
+
+    def __init__(self, save, delay=SAVE_DELAY):
+        self.save = save
+        self.delay = delay
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def schedule(self):
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self._run)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _run(self):
+        with self._lock:
+            self._timer = None
+        self.save()
@@ -0,0 +1,102 @@
+"""
+Log Pipeline
+Buffered, rate-limited logging to a Tk text widget, with the full log streamed
+to rotating files on disk
+
+Worker threads only append to a bounded ring buffer. The Tk main loop drains
+it in batches at a fixed rate, and the widget keeps just the last lines, so
+verbose yt-dlp output can't stall the UI or grow memory without bound.
+"""
+
+import logging
+import logging.handlers
+import queue
+from collections import deque
+
+LOG_FILE = "downloader.log"
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+MAX_WIDGET_LINES = 1000
+DRAIN_INTERVAL_MS = 50
+
+_file_logger = None
+
+def get_file_logger(path=LOG_FILE):
+    """Return the process-wide logger that writes to rotating log files.
+
+    Records are handed to a background thread, so callers never wait on disk.
+    """
+    global _file_logger
+    if _file_logger is None:
+        records = queue.SimpleQueue()
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logging.handlers.QueueListener(records, handler).start()
+
+        logger = logging.getLogger("youtube_downloader")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(logging.handlers.QueueHandler(records))
+        _file_logger = logger
+    return _file_logger
+
+class LogPipeline:
+    """Collect log lines from any thread and show them in a Tk text widget.
+
+    ``write`` may be called before the widget exists; lines are shown once
+    ``attach`` is called. Set ``read_only`` for widgets kept in the disabled
+    state between writes.
+    """
+
+    def __init__(self, root, max_lines=MAX_WIDGET_LINES, interval_ms=DRAIN_INTERVAL_MS,
+                 log_path=LOG_FILE):
+        self.root = root
+        self.max_lines = max_lines
+        self.interval_ms = interval_ms
+        self.widget = None
+        self.read_only = False
+        # Appends and pops on a deque are atomic; older lines fall off the end
+        self._buffer = deque(maxlen=max_lines)
+        self._logger = get_file_logger(log_path) if log_path else None
+
+    def write(self, message):
+        """Queue ``message`` for display and the log file"""
+        self._buffer.append(message)
+        if self._logger:
+            self._logger.info(message)
+
+    def attach(self, widget, read_only=False):
+        """Start showing buffered lines in ``widget``"""
+        self.widget = widget
+        self.read_only = read_only
+        self.root.after(self.interval_ms, self._drain)
+
+    def _drain(self):
+        lines = []
+        try:
+            while True:
+                lines.append(self._buffer.popleft())
+        except IndexError:
+            pass
+
+        if lines:
+            try:
+                self._show(lines)
+            except Exception:
+                # The widget is gone (window closing)
+                return
+        self.root.after(self.interval_ms, self._drain)
+
+    def _show(self, lines):
+        widget = self.widget
+        if self.read_only:
+            widget.configure(state='normal')
+        widget.insert('end', '\n'.join(lines) + '\n')
+        excess = int(widget.index('end-1c').split('.')[0]) - 1 - self.max_lines
+        if excess > 0:
+            widget.delete('1.0', f'{excess + 1}.0')
+        widget.see('end')
+        if self.read_only:
+            widget.configure(state='disabled')
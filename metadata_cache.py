@@ -0,0 +1,182 @@
+"""
+Video Metadata Cache
+Persistent, size-bounded cache of yt-dlp metadata keyed by video ID, shared by
+the GUIs and the API server so repeat lookups skip the network round-trip
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from json_store import DelayedSave, load_json, save_json
+from ytdlp_engine import get_engine
+from format_selection import estimate_size
+from youtube_urls import canonical_key
+
+CACHE_FILE = "metadata_cache.json"
+DEFAULT_MAX_ENTRIES = 2000
+DEFAULT_TTL = 7 * 24 * 3600
+
+QUALITY_HEIGHTS = ['2160', '1440', '1080', '720', '480', '360']
+
+def clean_title(title):
+    """Strip characters the queue and history views can't display"""
+    title = re.sub(r'[^\w\s\-\.]', '', title or '')[:50]
+    return title if title else "Unknown Title"
+
+def _format_size(fmt):
+    return fmt.get('filesize') or fmt.get('filesize_approx')
+
+def summarize_info(info):
+    """Reduce a yt-dlp info dict to the fields worth caching"""
+    formats = []
+    for fmt in info.get('formats') or []:
+        formats.append({
+            'format_id': fmt.get('format_id'),
+            'ext': fmt.get('ext'),
+            'height': fmt.get('height'),
+            'vcodec': fmt.get('vcodec'),
+            'acodec': fmt.get('acodec'),
+            'tbr': fmt.get('tbr'),
+            'filesize': _format_size(fmt)
+        })
+
+    summary = {
+        'id': info.get('id'),
+        'title': info.get('title'),
+        'duration': info.get('duration'),
+        'formats': formats
+    }
+
+    # Size of an MP4 download at each quality (best video + best audio stream)
+    estimates = {}
+    for quality in ['best'] + QUALITY_HEIGHTS:
+        size = estimate_size(summary, quality, 'mp4')
+        if size:
+            estimates[quality] = size
+    summary['filesize_estimates'] = estimates
+    return summary
+
+class MetadataCache:
+    """LRU cache with TTL, persisted to a JSON file.
+
+    Writes are coalesced, done by atomic rename and merged with the entries
+    other processes saved; their writes are also picked up when the file's
+    modification time changes.
+    """
+
+    def __init__(self, path=CACHE_FILE, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._mtime = None
+        self._saver = DelayedSave(self.save)
+        self._load()
+
+    def _load(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        stored = load_json(self.path)
+        with self._lock:
+            self._mtime = mtime
+            self._merge(stored)
+
+    def _merge(self, stored):
+        # The newer copy of an entry wins; entries only the file has count as least recently used
+        for key in reversed(list(stored)):
+            entry = stored[key]
+            current = self._entries.get(key)
+            if current is None:
+                self._entries[key] = entry
+                self._entries.move_to_end(key, last=False)
+            elif current.get('cached_at', 0) < entry.get('cached_at', 0):
+                self._entries[key] = entry
+        self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, video_id):
+        """Return the cached entry for ``video_id``, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is None:
+                self._load()
+                entry = self._entries.get(video_id)
+            if entry is None:
+                return None
+            if time.time() - entry.get('cached_at', 0) > self.ttl:
+                del self._entries[video_id]
+                return None
+            self._entries.move_to_end(video_id)
+            return entry
+
+    def put(self, video_id, metadata):
+        """Store ``metadata`` for ``video_id`` and schedule a write to disk"""
+        with self._lock:
+            entry = dict(metadata, cached_at=time.time())
+            self._entries[video_id] = entry
+            self._entries.move_to_end(video_id)
+            self._evict()
+        self._saver.schedule()
+        return entry
+
+    def save(self):
+        """Write the cache to disk now, merged with what other processes saved"""
+        with self._lock:
+            self._merge(load_json(self.path))
+            if save_json(self.path, dict(self._entries), separators=(',', ':')):
+                try:
+                    self._mtime = os.path.getmtime(self.path)
+                except OSError:
+                    pass
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Return the process-wide metadata cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MetadataCache()
+        return _cache
+
+def get_video_info(url):
+    """Return cached metadata for ``url``, fetching it with yt-dlp on a miss"""
+    cache = get_cache()
+    video_id = canonical_key(url)
+    entry = cache.get(video_id)
+    if entry is not None:
+        return entry
+    info = get_engine().extract_info(url)
+    if not info:
+        return None
+    return cache.put(video_id, summarize_info(info))
+
+def expected_size(info, quality='best', container='mp4', audio_bitrate=None, max_video_bitrate=None):
+    """Bytes a download should take: the size measured last time, else an estimate"""
+    if not info:
+        return None
+    actual = (info.get('actual_sizes') or {}).get(f"{container}:{quality}")
+    return actual or estimate_size(info, quality, container, audio_bitrate, max_video_bitrate)
+
+def record_actual_size(url, quality, container, size):
+    """Remember the bytes a finished download took, for later estimates"""
+    cache = get_cache()
+    video_id = canonical_key(url)
+    entry = cache.get(video_id)
+    if entry is None or not size:
+        return
+    sizes = dict(entry.get('actual_sizes') or {})
+    sizes[f"{container}:{quality}"] = size
+    cache.put(video_id, dict(entry, actual_sizes=sizes))
@@ -0,0 +1,182 @@
+"""
+Playlist Expander
+Turns playlist and channel URLs into queue items while the listing is still
+being fetched, so the first videos can download within seconds
+
+Entries come from yt-dlp's flat, lazy extraction one page at a time and are
+handed to the queue in small batches. After each batch the position reached
+is checkpointed to ``playlist_expansions.json``, so expanding a channel with
+thousands of uploads carries on where it stopped after a restart.
+"""
+
+import threading
+import time
+import uuid
+
+from bulk_import import build_queue_items
+from json_store import DelayedSave, load_json, save_json
+from metadata_cache import clean_title
+from ytdlp_engine import EngineJob, get_engine
+from youtube_urls import CHANNEL, PLAYLIST, parse_url
+
+EXPANSIONS_FILE = "playlist_expansions.json"
+
+# Entries handed to the queue at once, and the longest an entry waits for its batch
+BATCH_SIZE = 25
+BATCH_INTERVAL = 2.0
+
+_UNAVAILABLE_TITLES = ('[Private video]', '[Deleted video]')
+
+def collection_url(url):
+    """Return the listing URL to expand for a playlist or channel URL, or None for anything else.
+
+    Watch URLs that merely carry a ``list=`` parameter are single videos.
+    Channel URLs without a tab expand the channel's uploads ('/videos').
+    """
+    parsed = parse_url(url)
+    if parsed is None or parsed.kind not in (PLAYLIST, CHANNEL):
+        return None
+    if parsed.kind == CHANNEL and not parsed.tab:
+        parsed.tab = '/videos'
+    return parsed.canonical_url()
+
+def is_collection_url(url):
+    return collection_url(url) is not None
+
+class PlaylistExpander:
+    """Expand playlist / channel URLs into the queue in the background.
+
+    ``on_items(items)`` receives each batch of new queue items (titles come
+    from the listing) and returns how many it actually enqueued.
+    """
+
+    def __init__(self, on_items, engine=None, path=EXPANSIONS_FILE,
+                 batch_size=BATCH_SIZE, batch_interval=BATCH_INTERVAL):
+        self.on_items = on_items
+        self.engine = engine or get_engine()
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self._expansions = load_json(path)
+        self._owned = set()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._saver = DelayedSave(self.save)
+
+    def expand(self, url, quality='best', format_type='mp4', audio_bitrate=None, source='playlist'):
+        """Start expanding ``url``; returns the expansion ID"""
+        listing = collection_url(url)
+        if listing is None:
+            raise ValueError(f"Not a playlist or channel URL: {url}")
+        expansion = {
+            'id': uuid.uuid4().hex[:12],
+            'url': listing,
+            'quality': quality,
+            'format': format_type,
+            'audio_bitrate': audio_bitrate,
+            'source': source,
+            'next_index': 1,
+            'found': 0,
+            'added': 0,
+            'status': 'running',
+            'started': time.time()
+        }
+        with self._lock:
+            self._expansions[expansion['id']] = expansion
+            self._saver.schedule()
+        self._start(expansion['id'])
+        return expansion['id']
+
+    def resume_pending(self):
+        """Restart expansions a previous session didn't finish; returns their IDs"""
+        with self._lock:
+            pending = [e['id'] for e in self._expansions.values() if e['status'] == 'running']
+        for expansion_id in pending:
+            self._start(expansion_id)
+        return pending
+
+    def stop(self, expansion_id):
+        """Stop an expansion; entries already queued stay queued"""
+        with self._lock:
+            expansion = self._expansions.get(expansion_id)
+            job = self._jobs.get(expansion_id)
+            if expansion is None or expansion['status'] != 'running':
+                return False
+            expansion['status'] = 'stopped'
+            self._saver.schedule()
+        if job is not None:
+            job.cancel()
+        return True
+
+    def state(self, expansion_id=None):
+        """Return one expansion's progress, or all of them"""
+        with self._lock:
+            if expansion_id is not None:
+                expansion = self._expansions.get(expansion_id)
+                return dict(expansion) if expansion else None
+            return [dict(e) for e in self._expansions.values()]
+
+    def _start(self, expansion_id):
+        job = EngineJob()
+        with self._lock:
+            self._jobs[expansion_id] = job
+            self._owned.add(expansion_id)
+        threading.Thread(target=self._run, args=(expansion_id, job), daemon=True).start()
+
+    def _run(self, expansion_id, job):
+        with self._lock:
+            expansion = dict(self._expansions[expansion_id])
+        batch, last_index = [], expansion['next_index'] - 1
+        flushed_at = None
+        status = 'done'
+        try:
+            for index, entry in self.engine.iter_entries(expansion['url'], expansion['next_index'], job):
+                last_index = index
+                if entry.get('id') and entry.get('title') not in _UNAVAILABLE_TITLES:
+                    batch.append(entry)
+                # The first entry goes out at once so downloads can start right away
+                if batch and (flushed_at is None or len(batch) >= self.batch_size
+                              or time.monotonic() - flushed_at >= self.batch_interval):
+                    self._flush(expansion_id, batch, last_index)
+                    batch, flushed_at = [], time.monotonic()
+        except Exception:
+            status = 'failed'
+        if job.cancelled.is_set():
+            return
+        self._flush(expansion_id, batch, last_index, status)
+
+    def _flush(self, expansion_id, entries, last_index, status=None):
+        with self._lock:
+            expansion = self._expansions[expansion_id]
+        items = build_queue_items([f"https://www.youtube.com/watch?v={e['id']}" for e in entries],
+                                  expansion['quality'], expansion['format'],
+                                  expansion['audio_bitrate'], expansion['source'])
+        for item, entry in zip(items, entries):
+            item['expansion_id'] = expansion_id
+            item['video_id'] = entry['id']
+            item['duration'] = entry.get('duration')
+            if entry.get('title'):
+                item['title'] = clean_title(entry['title'])
+                item['title_status'] = 'resolved'
+        added = self.on_items(items) if items else 0
+        with self._lock:
+            # Only checkpoint past entries the queue has taken
+            expansion['next_index'] = last_index + 1
+            expansion['found'] += len(entries)
+            expansion['added'] += added or 0
+            if status:
+                expansion['status'] = status
+                self._jobs.pop(expansion_id, None)
+            self._saver.schedule()
+
+    def save(self):
+        """Write the expansion checkpoints to disk now.
+
+        Only expansions this instance ran are written; entries other
+        processes keep in the same file are left as they are.
+        """
+        with self._lock:
+            owned = {key: dict(self._expansions[key]) for key in self._owned}
+        data = load_json(self.path)
+        data.update(owned)
+        save_json(self.path, data, indent=2)
@@ -0,0 +1,91 @@
+"""
+Queue Change Notifications
+Wakes the GUI as soon as another process (e.g. api_server.py) writes to the
+queue journal, instead of polling the journal on a timer
+
+Notifications are single UDP datagrams on the loopback interface and carry no
+data: the journal stays the source of truth, so a lost or merged datagram can
+only delay a refresh, never lose an item.
+"""
+
+import socket
+import threading
+
+EVENT_HOST = "127.0.0.1"
+EVENT_PORT = 5055
+
+# Refresh anyway this often, in case a notification was dropped
+SAFETY_INTERVAL = 30.0
+
+def notify(port=EVENT_PORT):
+    """Tell a listening process that the queue journal has changed"""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.sendto(b'q', (EVENT_HOST, port))
+    except OSError:
+        pass
+
+class QueueListener:
+    """Call ``on_change()`` from a background thread whenever ``notify`` is sent.
+
+    The thread sleeps in ``recv`` while nothing happens. Bursts of
+    notifications are drained and handled with a single call.
+    """
+
+    def __init__(self, on_change, port=EVENT_PORT, safety_interval=SAFETY_INTERVAL):
+        self.on_change = on_change
+        self.port = port
+        self.safety_interval = safety_interval
+        self._sock = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start listening; returns False if the port is already taken (port 0 picks a free one)"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.bind((EVENT_HOST, self.port))
+        except OSError:
+            sock.close()
+            return False
+        sock.settimeout(self.safety_interval)
+        self.port = sock.getsockname()[1]
+        self._sock = sock
+        self._thread = threading.Thread(target=self._run, daemon=True, name='queue-listener')
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stopped.set()
+        if self._sock is not None:
+            # Closing the socket doesn't interrupt a blocked recv; a datagram does
+            notify(self.port)
+            self._sock.close()
+
+    def _drain(self):
+        self._sock.setblocking(False)
+        try:
+            while True:
+                self._sock.recv(16)
+        except OSError:
+            pass
+        finally:
+            self._sock.settimeout(self.safety_interval)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self._sock.recv(16)
+                self._drain()
+            except socket.timeout:
+                pass
+            except OSError:
+                if self._stopped.is_set():
+                    return
+                continue
+            if self._stopped.is_set():
+                return
+            try:
+                self.on_change()
+            except Exception:
+                pass
@@ -0,0 +1,298 @@
+"""
+Download Queue Journal
+Append-only, crash-safe persistence for the download queue, shared by the GUI
+and the API server
+
+Every change is one JSON line appended to the journal, so enqueueing costs the
+same no matter how long the queue is. The journal is periodically compacted
+into a snapshot written to a temporary file and atomically renamed over it.
+"""
+
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from queue_events import notify as notify_change
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+JOURNAL_FILE = "download_queue.journal"
+LEGACY_QUEUE_FILE = "download_queue.json"
+COMPACT_THRESHOLD = 500
+
+# Fields that only make sense while the owning process is running
+TRANSIENT_FIELDS = ('progress', 'transfer')
+
+class QueueJournal:
+    """Queue state replayed from an append-only journal file.
+
+    Items are plain dicts keyed by their ``id``. The dict objects are kept
+    stable across refreshes and compactions, so callers can hold on to them
+    (e.g. in a GUI's queue list) and see updates written by other processes.
+    """
+
+    def __init__(self, path=JOURNAL_FILE, legacy_path=LEGACY_QUEUE_FILE,
+                 compact_threshold=COMPACT_THRESHOLD, durable=True, notify=True):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.compact_threshold = compact_threshold
+        self.durable = durable
+        self.notify = notify
+        self.writer_id = uuid.uuid4().hex[:8]
+        self._items = OrderedDict()
+        self._offset = 0
+        self._generation = None
+        self._records_since_compact = 0
+        self._lock = threading.RLock()
+        self._migrate_legacy(legacy_path)
+        self.refresh()
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared with other processes using the same journal"""
+        with open(self.lock_path, 'a+') as f:
+            if os.name == 'nt':
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            else:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if os.name == 'nt':
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _migrate_legacy(self, legacy_path):
+        """Import a whole-file JSON queue from older versions, once"""
+        if not legacy_path or os.path.exists(self.path) or not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path, 'r') as f:
+                items = json.load(f)
+        except (OSError, ValueError):
+            return
+        for item in items:
+            item.setdefault('id', uuid.uuid4().hex[:12])
+            self._items[item['id']] = item
+        with self._file_lock():
+            self._write_snapshot()
+        os.replace(legacy_path, f"{legacy_path}.migrated")
+
+    # -- reading ---------------------------------------------------------
+
+    def items(self):
+        """Return the current queue items, in queue order"""
+        with self._lock:
+            return list(self._items.values())
+
+    def load(self):
+        """Pick up changes from other processes and return the queue items"""
+        self.refresh()
+        return self.items()
+
+    def get(self, item_id):
+        """Return the item with ``item_id``, or None"""
+        self.refresh()
+        with self._lock:
+            return self._items.get(item_id)
+
+    def refresh(self, include_own=False):
+        """Apply records appended since the last refresh.
+
+        Returns a list of ``(op, item)`` changes. Records this instance wrote
+        itself are already applied and are skipped unless ``include_own``.
+        """
+        with self._lock:
+            try:
+                with open(self.path, 'rb') as f:
+                    header = f.readline()
+                    generation = self._parse(header).get('generation') if header.endswith(b'\n') else None
+                    if generation != self._generation:
+                        # Compacted (or recreated) by someone: replay from the start
+                        return self._replay(f, generation)
+                    f.seek(self._offset)
+                    data = f.read()
+            except FileNotFoundError:
+                return []
+
+            end = data.rfind(b'\n') + 1
+            self._offset += end
+            changes = []
+            for line in data[:end].splitlines():
+                record = self._parse(line)
+                if record and (include_own or record.get('w') != self.writer_id):
+                    changes.extend(self._apply(record))
+                self._records_since_compact += 1
+            return changes
+
+    def _replay(self, f, generation):
+        f.seek(0)
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        previous = self._items
+        self._items = OrderedDict()
+        self._generation = generation
+        self._offset = end
+        self._records_since_compact = 0
+        changes = []
+        for line in data[:end].splitlines():
+            record = self._parse(line)
+            if record.get('op') == 'add' and record['item'].get('id') in previous:
+                # Keep the dict objects callers already hold
+                existing = previous.pop(record['item']['id'])
+                existing.update(record['item'])
+                record['item'] = existing
+            changes.extend(self._apply(record))
+            self._records_since_compact += 1
+        changes.extend(('remove', item) for item in previous.values())
+        return changes
+
+    @staticmethod
+    def _parse(line):
+        try:
+            return json.loads(line)
+        except ValueError:
+            # A torn final write from a crash; the rest of the journal is intact
+            return {}
+
+    def _apply(self, record):
+        op = record.get('op')
+        if op == 'add':
+            item = record['item']
+            existing = self._items.get(item['id'])
+            if existing is not None and existing is not item:
+                existing.update(item)
+                return [('update', existing)]
+            self._items[item['id']] = item
+            return [('add', item)]
+        if op == 'update':
+            item = self._items.get(record['id'])
+            if item is not None:
+                item.update(record['fields'])
+                return [('update', item)]
+        elif op == 'remove':
+            item = self._items.pop(record['id'], None)
+            if item is not None:
+                return [('remove', item)]
+        elif op == 'clear':
+            removed = [('remove', item) for item in self._items.values()]
+            self._items.clear()
+            return removed
+        elif op == 'move':
+            item = self._items.pop(record['id'], None)
+            if item is not None:
+                order = list(self._items.items())
+                keys = [key for key, _ in order]
+                index = keys.index(record['before']) if record.get('before') in keys else len(order)
+                order.insert(index, (item['id'], item))
+                self._items = OrderedDict(order)
+                return [('move', item)]
+        return []
+
+    # -- writing ---------------------------------------------------------
+
+    def _append(self, records):
+        with self._lock:
+            with self._file_lock():
+                if not os.path.exists(self.path):
+                    self._write_snapshot()
+                data = ''.join(self._serialize(r) for r in records)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(data)
+                    f.flush()
+                    if self.durable:
+                        os.fsync(f.fileno())
+            for record in records:
+                self._apply(record)
+            if self.notify:
+                notify_change()
+            self._records_since_compact += len(records)
+            if self._records_since_compact > max(self.compact_threshold, 2 * len(self._items)):
+                try:
+                    self.compact()
+                except OSError:
+                    # e.g. another process has the file open on Windows; retry next time
+                    pass
+
+    def _serialize(self, record):
+        record = dict(record, w=self.writer_id)
+        if 'item' in record:
+            # Snapshot the dict; worker threads may be adding keys to it
+            record['item'] = dict(record['item'])
+        return json.dumps(record, separators=(',', ':')) + '\n'
+
+    def append(self, item):
+        """Add one item to the queue; returns its ID"""
+        return self.append_many([item])[0]
+
+    def append_many(self, items):
+        """Add several items with a single journal write; returns their IDs"""
+        for item in items:
+            item.setdefault('id', uuid.uuid4().hex[:12])
+        self._append([{'op': 'add', 'item': item} for item in items])
+        return [item['id'] for item in items]
+
+    def update(self, item_id, **fields):
+        """Record new values for some fields of one item"""
+        self._append([{'op': 'update', 'id': item_id, 'fields': fields}])
+
+    def update_many(self, updates):
+        """Record field updates for several items: ``{item_id: {field: value}}``"""
+        if updates:
+            self._append([{'op': 'update', 'id': item_id, 'fields': fields}
+                          for item_id, fields in updates.items()])
+
+    def remove(self, item_id):
+        """Remove one item from the queue"""
+        self._append([{'op': 'remove', 'id': item_id}])
+
+    def remove_many(self, item_ids):
+        """Remove several items with a single journal write"""
+        if item_ids:
+            self._append([{'op': 'remove', 'id': item_id} for item_id in item_ids])
+
+    def move(self, item_id, before=None):
+        """Move one item in front of the item with ID ``before`` (to the end if None)"""
+        self._append([{'op': 'move', 'id': item_id, 'before': before}])
+
+    def clear(self):
+        """Remove every item from the queue"""
+        self._append([{'op': 'clear'}])
+
+    def compact(self):
+        """Rewrite the journal as a snapshot of the current queue"""
+        with self._lock:
+            with self._file_lock():
+                # Fold in anything other processes appended first
+                self.refresh()
+                self._write_snapshot()
+
+    def _write_snapshot(self):
+        """Write all items to a temporary file and atomically swap it in.
+
+        Callers must hold the file lock.
+        """
+        generation = uuid.uuid4().hex
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'op': 'snapshot', 'generation': generation}) + '\n')
+            for item in self._items.values():
+                stored = dict(item)
+                for field in TRANSIENT_FIELDS:
+                    stored.pop(field, None)
+                f.write(self._serialize({'op': 'add', 'item': stored}))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._generation = generation
+        self._offset = os.path.getsize(self.path)
+        self._records_since_compact = 0
@@ -0,0 +1,73 @@
+"""
+Queue Ordering Policies
+Decide which queued item a free download worker picks up next
+
+    fifo       queue order (as added, or as rearranged by dragging rows)
+    shortest   smallest expected download first, so short clips don't wait
+               behind a long 4K video; unknown sizes go last
+    priority   highest ``priority`` first (items default to 0)
+    deadline   earliest ``deadline`` first, then shortest; items without a
+               deadline go after those with one
+
+Each policy is a sort key over queue items. Sorting is stable, so ties keep
+the queue order.
+"""
+
+from datetime import datetime
+
+DEFAULT_POLICY = 'fifo'
+
+POLICY_LABELS = {
+    'fifo': "First in, first out",
+    'shortest': "Shortest first",
+    'priority': "Priority",
+    'deadline': "Deadline"
+}
+
+_LAST = float('inf')
+
+def _expected_size(item):
+    return item.get('estimated_bytes') or _LAST
+
+POLICIES = {
+    'fifo': lambda item: 0,
+    'shortest': _expected_size,
+    'priority': lambda item: -(item.get('priority') or 0),
+    'deadline': lambda item: (item.get('deadline') or _LAST, _expected_size(item))
+}
+
+def policy_key(name):
+    """Return the sort key for policy ``name``"""
+    try:
+        return POLICIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown queue policy: {name!r} (choose from {', '.join(POLICIES)})")
+
+def parse_priority(value):
+    """Return an int priority for 3, '3' or None (0)"""
+    if value in (None, ''):
+        return 0
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid priority: {value!r}")
+
+def parse_deadline(value):
+    """Return a Unix timestamp for an epoch number or ISO 8601 string; None for no deadline"""
+    if value in (None, ''):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid deadline: {value!r} (use ISO 8601, e.g. 2024-05-01T18:00)")
+
+def scheduling_fields(data):
+    """Validated ``priority`` / ``deadline`` fields from an API request body"""
+    fields = {}
+    if 'priority' in data:
+        fields['priority'] = parse_priority(data['priority'])
+    if 'deadline' in data:
+        fields['deadline'] = parse_deadline(data['deadline'])
+    return fields
@@ -0,0 +1,95 @@
+"""
+Queue View
+Keeps a queue Treeview in step with the download queue by updating only the
+rows that changed, batching refreshes on a short timer
+"""
+
+import threading
+
+REFRESH_INTERVAL_MS = 100
+
+STATUS_ICONS = {'Queued': "⏳", 'Downloading': "🔄", 'Completed': "✅", 'Paused': "⏸️", 'Cancelled': "⏹️",
+               'Skipped': "⏭️"}
+
+def queue_row(item):
+    """Return the Treeview values for one queue item"""
+    status_icon = STATUS_ICONS.get(item['status'], "❌")
+    title = item['title'][:40] + "..." if len(item['title']) > 40 else item['title']
+    if item.get('priority'):
+        title = f"[P{item['priority']}] {title}"
+    return (
+        f"{status_icon} {item['status']}",
+        title,
+        item['quality'],
+        item['format'],
+        f"{item.get('progress', 0):.1f}%"
+    )
+
+class QueueView:
+    """Rows of ``tree`` keyed by queue item ID.
+
+    ``refresh(item)`` marks one row as changed; ``refresh()`` also checks for
+    added, removed or reordered items. Either may be called from any thread;
+    all marks made within ``interval_ms`` are applied in one pass on the Tk
+    thread, touching only the affected rows.
+    """
+
+    def __init__(self, root, tree, get_items, row=queue_row, interval_ms=REFRESH_INTERVAL_MS):
+        self.root = root
+        self.tree = tree
+        self.get_items = get_items
+        self.row = row
+        self.interval_ms = interval_ms
+        self._dirty = {}
+        self._reconcile_pending = False
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    def refresh(self, item=None):
+        """Schedule a redraw of ``item``, or of the queue's membership and order"""
+        with self._lock:
+            if item is None:
+                self._reconcile_pending = True
+            else:
+                self._dirty[item['id']] = item
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.root.after(self.interval_ms, self._flush)
+
+    def _flush(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            reconcile, self._reconcile_pending = self._reconcile_pending, False
+            self._scheduled = False
+
+        if reconcile:
+            inserted = self._reconcile()
+            for item_id in inserted:
+                dirty.pop(item_id, None)
+        for item_id, item in dirty.items():
+            if self.tree.exists(item_id):
+                self.tree.item(item_id, values=self.row(item))
+
+    def _reconcile(self):
+        """Insert, delete and move rows to match the queue; returns inserted IDs"""
+        items = list(self.get_items())
+        wanted = [item['id'] for item in items]
+        wanted_ids = set(wanted)
+        present = self.tree.get_children()
+        present_ids = set(present)
+
+        stale = [item_id for item_id in present if item_id not in wanted_ids]
+        if stale:
+            self.tree.delete(*stale)
+
+        inserted = []
+        for index, item in enumerate(items):
+            if item['id'] not in present_ids:
+                self.tree.insert('', index, iid=item['id'], values=self.row(item))
+                inserted.append(item['id'])
+
+        if self.tree.get_children() != tuple(wanted):
+            for index, item_id in enumerate(wanted):
+                self.tree.move(item_id, '', index)
+        return inserted
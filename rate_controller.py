@@ -0,0 +1,109 @@
+"""
+Adaptive Rate Controller
+Paces requests to YouTube across all download workers, backing off only when
+the server pushes back (HTTP 403 / 429) and speeding up again as requests
+succeed (additive-increase / multiplicative-decrease on the request rate)
+
+The controller tracks a delay in seconds. It starts at zero, so unthrottled
+sessions pay no sleep at all. Each throttling signal doubles the delay, and
+each successful download shaves a fixed step off it. The delay is applied
+between job starts shared by every worker, and as yt-dlp's own sleep options
+within a job.
+"""
+
+import threading
+import time
+
+MIN_BACKOFF = 1.0
+MAX_DELAY = 30.0
+BACKOFF_FACTOR = 2.0
+RECOVERY_STEP = 0.5
+
+# Throttle signals closer together than this count as one (a single burst of
+# 403s from one request shouldn't back off several times over)
+SIGNAL_WINDOW = 2.0
+
+THROTTLE_MARKERS = ('HTTP Error 403', 'HTTP Error 429', 'Too Many Requests', 'Forbidden')
+
+def is_throttle_signal(line):
+    """True if a yt-dlp output line shows the server throttling us"""
+    return any(marker in line for marker in THROTTLE_MARKERS)
+
+class RateController:
+    """AIMD request pacing shared by all workers"""
+
+    def __init__(self, max_delay=MAX_DELAY, min_backoff=MIN_BACKOFF,
+                 backoff_factor=BACKOFF_FACTOR, recovery_step=RECOVERY_STEP):
+        self.max_delay = max_delay
+        self.min_backoff = min_backoff
+        self.backoff_factor = backoff_factor
+        self.recovery_step = recovery_step
+        self.delay = 0.0
+        self.throttle_events = 0
+        self.successes = 0
+        self.last_throttle = None
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+        self.on_change = None
+
+    def wait(self):
+        """Block until the caller may start its next request batch (a job)"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+    def on_throttle(self):
+        """Back off after a 403/429 from the server"""
+        with self._lock:
+            now = time.monotonic()
+            if self.last_throttle is not None and now - self.last_throttle < SIGNAL_WINDOW:
+                return
+            self.last_throttle = now
+            self.throttle_events += 1
+            self.delay = min(self.max_delay, max(self.min_backoff, self.delay * self.backoff_factor))
+            self._next_start = max(self._next_start, now + self.delay)
+        self._changed()
+
+    def on_success(self):
+        """Ease off the delay after a download went through"""
+        with self._lock:
+            self.successes += 1
+            if self.delay == 0:
+                return
+            self.delay = max(0.0, self.delay - self.recovery_step)
+        self._changed()
+
+    def sleep_args(self):
+        """yt-dlp sleep options for the current delay (none while unthrottled)"""
+        delay = self.delay
+        if delay <= 0:
+            return []
+        return ['--sleep-requests', f"{delay:.1f}",
+                '--sleep-interval', f"{delay:.1f}",
+                '--max-sleep-interval', f"{min(self.max_delay, delay * 2):.1f}"]
+
+    def state(self):
+        """Return the controller state for display or the API"""
+        with self._lock:
+            return {
+                'delay': round(self.delay, 2),
+                'throttled': self.delay > 0,
+                'throttle_events': self.throttle_events,
+                'successes': self.successes
+            }
+
+    def describe(self):
+        state = self.state()
+        if not state['throttled']:
+            return "🚦 Request pacing: full speed"
+        return f"🚦 Request pacing: {state['delay']:.1f}s between requests (backing off)"
+
+    def _changed(self):
+        if self.on_change:
+            try:
+                self.on_change(self.state())
+            except Exception:
+                pass
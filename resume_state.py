@@ -0,0 +1,89 @@
+"""
+Download Resume State
+Tracks how far each queue item got so that fallbacks, crashes and restarts
+continue the partial download instead of starting over
+
+yt-dlp already resumes from its own .part / .ytdl files as long as the same
+format is downloaded to the same file name again. This module records the
+format it picked, the partial file and the byte / fragment offsets on the
+queue item (and in the queue journal), and pins that format on later attempts.
+"""
+
+import os
+import time
+
+from ytdlp_engine import format_bytes
+
+RESUME_SAVE_INTERVAL = 5.0
+
+def pinned_format(item, selector):
+    """Return a --format value preferring the format a previous attempt started"""
+    resume = item.get('resume') or {}
+    if resume.get('format_id'):
+        # Fall back to the normal selection if the format is no longer offered
+        return f"{resume['format_id']}/{selector}" if selector else resume['format_id']
+    return selector
+
+def describe_resume(item):
+    """Return e.g. '48.0MiB, fragment 120/400' for an item with resume state, or None"""
+    resume = item.get('resume') or {}
+    partial = resume.get('tmpfilename')
+    if not partial or not os.path.exists(partial):
+        return None
+    text = format_bytes(resume.get('downloaded_bytes'))
+    if resume.get('fragment_index') and resume.get('fragment_count'):
+        text += f", fragment {resume['fragment_index']}/{resume['fragment_count']}"
+    return text
+
+class ResumeTracker:
+    """Keep ``item['resume']`` up to date from ProgressEvents during one attempt.
+
+    The state is written to ``journal`` at most every ``interval`` seconds
+    while downloading, and once more by ``flush`` when the attempt ends.
+    """
+
+    def __init__(self, item, journal=None, interval=RESUME_SAVE_INTERVAL):
+        self.item = item
+        self.journal = journal
+        self.interval = interval
+        self._saved_at = None
+        self._dirty = False
+
+    def update(self, event):
+        """Record ``event``; called from the engine's on_progress"""
+        if event.status != 'downloading':
+            return
+        resume = dict(self.item.get('resume') or {})
+        resume.update({
+            'downloaded_bytes': event.downloaded_bytes,
+            'total_bytes': event.total_bytes,
+            'fragment_index': event.fragment_index,
+            'fragment_count': event.fragment_count
+        })
+        # Pin the whole selection ('137+140'), never just the stream in progress
+        if event.selection:
+            resume['format_id'] = event.selection
+        if event.tmpfilename:
+            resume['tmpfilename'] = event.tmpfilename
+            # Merged downloads have one partial file per stream
+            files = resume.get('partial_files') or []
+            if event.tmpfilename not in files:
+                resume['partial_files'] = files + [event.tmpfilename]
+        self.item['resume'] = resume
+        self._dirty = True
+        # Save the first update straight away, then at most every interval
+        if self._saved_at is None or time.monotonic() - self._saved_at >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """Write the latest state to the journal now"""
+        if self._dirty and self.journal is not None:
+            self.journal.update(self.item['id'], resume=self.item.get('resume'))
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def clear(self):
+        """Forget the resume state once the item has downloaded completely"""
+        if self.item.pop('resume', None) is not None and self.journal is not None:
+            self.journal.update(self.item['id'], resume=None)
+        self._dirty = False
@@ -6,6 +6,9 @@ Use this if you prefer command-line interface
 import subprocess
 import sys
 import os
+from download_archive import DownloadArchive, describe as describe_archived
+from download_core import DownloadRunner, download_item, run_standalone, ytdlp_available
+from youtube_urls import is_youtube_url
 
 def install_yt_dlp():
     """Install yt-dlp if not already installed"""
@@ -17,33 +20,41 @@ def install_yt_dlp():
         print("❌ Failed to install yt-dlp")
         return False
 
+def confirm_download_again(item, archived):
+    """Ask whether to download a video the download archive already has"""
+    print(f"⏭️ {item['title'] or item['url']} was already {describe_archived(archived)} in this quality.")
+    return input("Download it again? (y/N): ").strip().lower() == 'y'
+
 def download_video(url, quality="best", output_dir="Downloads"):
     """Download YouTube video with specified quality"""
     try:
         # Create output directory
         os.makedirs(output_dir, exist_ok=True)
         
-        # Build command
-        cmd = [
-            'yt-dlp',
-            '-f', f'best[height<={quality}]' if quality != 'best' else 'best',
-            '-o', f'{output_dir}/%(title)s.%(ext)s',
-            url
-        ]
-        
         print(f"Downloading: {url}")
         print(f"Quality: {quality}")
         print(f"Output: {output_dir}")
         print("-" * 50)
         
-        # Run download
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        # Run download (the same runner as every front end), keeping the last lines for the failure message
+        output = []
+        runner = DownloadRunner(log=output.append)
+        item = download_item(url, quality)
+        archive = DownloadArchive()
+        try:
+            success = run_standalone(runner, item, output_dir, archive, confirm=confirm_download_again)
+        finally:
+            archive.close()
         
-        if result.returncode == 0:
+        if success:
             print("✅ Download completed successfully!")
             return True
+        elif item.get('archived'):
+            print("⏭️ Skipped, already downloaded")
+            return False
         else:
-            print(f"❌ Download failed: {result.stderr}")
+            tail = '\n'.join(output[-5:])
+            print(f"❌ Download failed: {tail}")
             return False
             
     except FileNotFoundError:
@@ -58,10 +69,9 @@ def main():
     print("=" * 50)
     
     # Check if yt-dlp is installed
-    try:
-        subprocess.run(['yt-dlp', '--version'], capture_output=True, check=True)
+    if ytdlp_available():
         print("✅ yt-dlp is already installed")
-    except (subprocess.CalledProcessError, FileNotFoundError):
+    else:
         print("Installing yt-dlp...")
         if not install_yt_dlp():
             return
@@ -72,7 +82,7 @@ def main():
     if url.lower() == 'quit':
         return
     
-    if not url.startswith(('https://www.youtube.com/', 'https://youtu.be/', 'https://youtube.com/')):
+    if not is_youtube_url(url):
         print("❌ Please enter a valid YouTube URL")
         return
     
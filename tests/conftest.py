@@ -0,0 +1,198 @@
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+
+import ytdlp_engine
+from ytdlp_engine import PER_RUN_OPTIONS, PROGRESS_PREFIX
+
+class FakeCLI:
+    """Stands in for the yt-dlp CLI: records each command and prints ``lines``"""
+
+    def __init__(self):
+        self.lines = []
+        self.commands = []
+
+    def __call__(self, cmd, **kwargs):
+        self.commands.append(cmd)
+        return FakeProcess(self.lines)
+
+class FakeProcess:
+    pid = 0
+
+    def __init__(self, lines):
+        self.stdout = iter(line + '\n' for line in lines)
+
+    def poll(self):
+        return 0
+
+    def wait(self):
+        return 0
+
+class FakeClock:
+    """Stands in for a module's ``time``: time() and monotonic() read ``now``, sleep() moves it on"""
+
+    def __init__(self, now=100.0):
+        self.now = now
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+class FakeRoot:
+    """Stands in for Tk's root; run() calls what after() scheduled"""
+
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, callback):
+        self.pending.append(callback)
+
+    def run(self):
+        pending, self.pending = self.pending, []
+        for callback in pending:
+            callback()
+
+@pytest.fixture
+def clock():
+    """A FakeClock; a test module overrides this fixture to install it as its module's ``time``"""
+    return FakeClock()
+
+@pytest.fixture
+def fake_cli(monkeypatch):
+    cli = FakeCLI()
+    monkeypatch.setattr(ytdlp_engine.subprocess, 'Popen', cli)
+    return cli
+
+def progress_line(format_id, downloaded, total, name):
+    """A progress line as PROGRESS_ARGS makes the CLI print it"""
+    progress = {'status': 'downloading', 'downloaded_bytes': downloaded, 'total_bytes': total,
+                'tmpfilename': f'{name}.part', 'filename': name}
+    return f"{PROGRESS_PREFIX}{json.dumps(progress)}\t{format_id}"
+
+# The format list every FakeYoutubeDL extraction offers
+FORMATS = [
+    {'format_id': '313', 'height': 2160, 'vcodec': 'vp9', 'acodec': 'none', 'ext': 'webm'},
+    {'format_id': '137', 'height': 1080, 'vcodec': 'avc1', 'acodec': 'none', 'ext': 'mp4'},
+    {'format_id': '136', 'height': 720, 'vcodec': 'avc1', 'acodec': 'none', 'ext': 'mp4'},
+    {'format_id': '140', 'height': None, 'vcodec': 'none', 'acodec': 'mp4a', 'ext': 'm4a'},
+]
+DEFAULT_FORMAT = 'bv*+ba/b'
+
+class FakeSelector:
+    """A compiled --format: alternatives of '+'-joined format IDs, or bv*[height<=N]+ba"""
+
+    def __init__(self, spec):
+        self.spec = spec
+
+    def __call__(self, formats):
+        ids = [f['format_id'] for f in formats]
+        for alternative in self.spec.split('/'):
+            if alternative.startswith('bv'):
+                cap = re.search(r'height<=(\d+)', alternative.split('+')[0])
+                videos = [f for f in formats if f.get('height')
+                          and (cap is None or f['height'] <= int(cap.group(1)))]
+                audio = [f for f in formats if not f.get('height')]
+                if videos and audio:
+                    return [max(videos, key=lambda f: f['height'])['format_id'], audio[0]['format_id']]
+            elif all(format_id in ids for format_id in alternative.split('+')):
+                return alternative.split('+')
+        raise ValueError(f"Requested format is not available: {self.spec}")
+
+class FakeYoutubeDL:
+    """Stands in for yt_dlp.YoutubeDL.
+
+    Like the real class it compiles ``params['format']`` into
+    ``format_selector`` once, in __init__. Downloads select from the info's
+    formats (FORMATS) with it and report one file per selected format.
+    """
+
+    def __init__(self, params):
+        self.params = dict(params)
+        self.closed = False
+        self.downloads = []
+        selection = self.params.get('format')
+        self.format_selector = None if selection is None else self.build_format_selector(selection)
+        FakeYtDlp.instances.append(self)
+
+    def build_format_selector(self, spec):
+        if spec.count('[') != spec.count(']'):
+            raise SyntaxError(f"Invalid format specification {spec}")
+        return FakeSelector(spec)
+
+    def _select(self, formats):
+        return (self.format_selector or FakeSelector(DEFAULT_FORMAT))(formats)
+
+    def extract_info(self, url, download=False, process=True):
+        info = {'id': url[-11:], 'title': 'Song', 'formats': FORMATS}
+        selected = [f for f_id in self._select(FORMATS) for f in FORMATS if f['format_id'] == f_id]
+        info['format_id'] = '+'.join(f['format_id'] for f in selected)
+        if len(selected) == 2:
+            info['requested_formats'] = selected
+        return info
+
+    def sanitize_info(self, info):
+        return info
+
+    def download(self, urls):
+        return self._download(urls[0], FORMATS)
+
+    def download_with_info_file(self, path):
+        with open(path) as f:
+            info = json.load(f)
+        return self._download(info['id'], info['formats'])
+
+    def _download(self, url, formats):
+        selected = self._select(formats)
+        self.downloads.append((url, selected, dict(self.params)))
+        self.params['logger'].info(f"[info] {url}: Downloading 1 format(s): {'+'.join(selected)}")
+        for format_id in selected:
+            for hook in self.params['progress_hooks']:
+                hook({'status': 'downloading', 'downloaded_bytes': 10, 'total_bytes': 100,
+                      'tmpfilename': f'v.f{format_id}.mp4.part', 'info_dict': {'format_id': format_id}})
+                hook({'status': 'finished', 'downloaded_bytes': 100, 'total_bytes': 100,
+                      'filename': f'v.f{format_id}.mp4', 'info_dict': {'format_id': format_id}})
+        return 0
+
+    def close(self):
+        self.closed = True
+
+class FakeCancelled(Exception):
+    pass
+
+class FakeDownloadError(Exception):
+    pass
+
+class FakeYtDlp:
+    """Stands in for the yt_dlp module; parse_options maps PER_RUN_OPTIONS to their params"""
+
+    YoutubeDL = FakeYoutubeDL
+    instances = []
+
+    @staticmethod
+    def parse_options(args):
+        opts = {}
+        args = iter(args)
+        for arg in args:
+            if arg in PER_RUN_OPTIONS:
+                opts[PER_RUN_OPTIONS[arg]] = next(args)
+            else:
+                opts[arg.lstrip('-').replace('-', '_')] = True
+        return SimpleNamespace(ydl_opts=opts)
+
+@pytest.fixture
+def fake_ytdlp(monkeypatch):
+    """Installs FakeYtDlp as the engine's yt_dlp module; its ``instances`` lists every YoutubeDL made"""
+    monkeypatch.setattr(ytdlp_engine, 'yt_dlp', FakeYtDlp)
+    monkeypatch.setattr(ytdlp_engine, 'DownloadCancelled', FakeCancelled)
+    monkeypatch.setattr(ytdlp_engine, 'DownloadError', FakeDownloadError)
+    monkeypatch.setattr(FakeYtDlp, 'instances', [])
+    return FakeYtDlp
@@ -0,0 +1,89 @@
+from datetime import datetime
+
+import pytest
+
+import bandwidth
+from bandwidth import BandwidthManager, TokenBucket, parse_rate, scheduled_limit
+
+@pytest.fixture
+def clock(clock, monkeypatch):
+    monkeypatch.setattr(bandwidth, 'time', clock)
+    return clock
+
+@pytest.mark.parametrize('value, expected', [
+    (None, None), ('', None), (0, None),
+    (2048, 2048.0),
+    ('512K', 512 * 1024.0),
+    ('20M', 20 * 1024 ** 2),
+    ('1.5G', 1.5 * 1024 ** 3),
+    ('20 MB/s', 20 * 1024 ** 2),
+    ('8MiB', 8 * 1024 ** 2),
+    ('100', 100.0),
+])
+def test_parse_rate(value, expected):
+    assert parse_rate(value) == expected
+
+@pytest.mark.parametrize('value', ['fast', '20X', '-5M'])
+def test_parse_rate_rejects_garbage(value):
+    with pytest.raises(ValueError):
+        parse_rate(value)
+
+SCHEDULE = [
+    {'start': '22:00', 'end': '06:00', 'limit': None},
+    {'start': '09:00', 'end': '18:00', 'limit': '20M'}
+]
+
+@pytest.mark.parametrize('hhmm, expected', [
+    ('23:30', None),            # inside the window that wraps past midnight
+    ('03:00', None),
+    ('06:00', 5 * 1024 ** 2),   # end is exclusive
+    ('12:00', 20 * 1024 ** 2),
+    ('18:30', 5 * 1024 ** 2),   # outside every window: the default
+])
+def test_scheduled_limit(hhmm, expected):
+    now = datetime.strptime(f'2024-05-01 {hhmm}', '%Y-%m-%d %H:%M')
+    assert scheduled_limit(SCHEDULE, '5M', now) == expected
+
+def test_token_bucket_without_rate_never_blocks(clock):
+    bucket = TokenBucket(None)
+    bucket.consume(10 ** 12)
+    assert clock.slept == []
+
+def test_token_bucket_sleeps_for_the_overdraft(clock):
+    bucket = TokenBucket(1000)
+    bucket.consume(500)
+    assert clock.slept == [0.5]
+    clock.slept.clear()
+
+    # Tokens refill at the rate, up to one burst
+    clock.now += 10
+    bucket.consume(1000)
+    assert clock.slept == []
+    bucket.consume(250)
+    assert clock.slept == [0.25]
+
+def test_lowering_the_rate_caps_saved_tokens(clock):
+    bucket = TokenBucket(10000)
+    clock.now += 5
+    bucket.consume(0)
+    bucket.set_rate(100)
+    bucket.consume(200)
+    assert clock.slept == [pytest.approx(1.0)]
+
+def test_global_limit_is_shared_between_jobs(clock):
+    manager = BandwidthManager('8M', per_job_limit='3M')
+    first = manager.open_job('a')
+    assert first.limit_args() == ['--limit-rate', str(3 * 1024 ** 2)]
+    second = manager.open_job('b')
+    third = manager.open_job('c')
+    assert manager.share() == 8 * 1024 ** 2 / 3
+    assert second.limit_args() == ['--limit-rate', str(int(8 * 1024 ** 2 / 3))]
+    for job in (first, second, third):
+        job.close()
+    assert manager.state()['active_jobs'] == 0
+
+def test_unlimited_manager_adds_no_arguments(clock):
+    job = BandwidthManager().open_job('a')
+    assert job.limit_args() == []
+    job.consume(10 ** 9)
+    assert clock.slept == []
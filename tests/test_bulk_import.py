@@ -0,0 +1,30 @@
+from bulk_import import build_queue_items, parse_urls, read_url_file, validate_urls
+
+VIDEO_ID = 'dQw4w9WgXcQ'
+
+def test_parse_urls_from_mixed_separators():
+    text = f'https://youtu.be/{VIDEO_ID}, https://www.youtube.com/watch?v=aaaaaaaaaaa\n"https://example.com/x";junk'
+    assert parse_urls(text) == [f'https://youtu.be/{VIDEO_ID}', 'https://www.youtube.com/watch?v=aaaaaaaaaaa',
+                                'https://example.com/x']
+    assert parse_urls(None) == []
+
+def test_read_csv_file(tmp_path):
+    path = tmp_path / 'urls.csv'
+    path.write_text(f'title,url\nSong,https://youtu.be/{VIDEO_ID}\n', encoding='utf-8-sig')
+    assert read_url_file(str(path)) == [f'https://youtu.be/{VIDEO_ID}']
+
+def test_validate_urls_rejects_and_deduplicates():
+    accepted, rejected, duplicates = validate_urls(
+        [f'https://youtu.be/{VIDEO_ID}', f'https://www.youtube.com/watch?v={VIDEO_ID}&t=1',
+         'https://example.com/x', ' https://youtu.be/aaaaaaaaaaa ', 'https://youtu.be/bbbbbbbbbbb'],
+        existing_urls=['https://www.youtube.com/watch?v=bbbbbbbbbbb'])
+    assert accepted == [f'https://youtu.be/{VIDEO_ID}', 'https://youtu.be/aaaaaaaaaaa']
+    assert rejected == ['https://example.com/x']
+    assert duplicates == [f'https://www.youtube.com/watch?v={VIDEO_ID}&t=1', 'https://youtu.be/bbbbbbbbbbb']
+
+def test_build_queue_items():
+    video, = build_queue_items(['a'], '1080', 'mp4', '192k')
+    audio, = build_queue_items(['c'], 'best', 'mp3', '192k')
+    assert (video['status'], video['title_status'], video['title']) == ('Queued', 'pending', 'a')
+    assert video['audio_bitrate'] is None and audio['audio_bitrate'] == '192k'
+    assert video['id'] != audio['id']
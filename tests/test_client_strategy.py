@@ -0,0 +1,42 @@
+from client_strategy import MAX_FAILURES_IN_ROW, ClientStrategies, ClientStrategy
+
+STRATEGIES = [ClientStrategy('android', ['--a']), ClientStrategy('web', ['--w']), ClientStrategy('ios', ['--i'])]
+
+def make_strategies(tmp_path):
+    return ClientStrategies(STRATEGIES, str(tmp_path / 'client_stats.json'))
+
+def names(strategies):
+    return [s.name for s in strategies]
+
+def test_untried_strategies_keep_the_configured_order(tmp_path):
+    assert names(make_strategies(tmp_path).ranked('mp4:1080')) == ['android', 'web', 'ios']
+
+def test_faster_strategy_ranks_first(tmp_path):
+    stats = make_strategies(tmp_path)
+    stats.record(STRATEGIES[0], 'mp4:1080', True, 1000, 1.0)
+    stats.record(STRATEGIES[1], 'mp4:1080', True, 5000, 1.0)
+    assert names(stats.ranked('mp4:1080'))[0] == 'web'
+
+def test_failing_strategy_is_benched(tmp_path):
+    stats = make_strategies(tmp_path)
+    for _ in range(MAX_FAILURES_IN_ROW):
+        stats.record(STRATEGIES[0], None, False)
+    assert names(stats.ranked())[-1] == 'android'
+
+def test_throughput_only_record_keeps_the_outcome(tmp_path):
+    stats = make_strategies(tmp_path)
+    stats.record(STRATEGIES[0], 'mp4:1080', None, 1000, 1.0)
+    entry = stats.stats()['android']
+    assert (entry['attempts'], entry['throughput']) == (0, 1000.0)
+
+def test_save_keeps_entries_another_process_saved(tmp_path):
+    gui, daemon = make_strategies(tmp_path), make_strategies(tmp_path)
+    gui.record(STRATEGIES[0], 'mp4:1080', True, 1000, 1.0)
+    daemon.record(STRATEGIES[1], 'mp4:1080', False)
+    daemon.save()
+    gui.save()
+
+    assert gui.stats()['web']['attempts'] == 1
+    saved = make_strategies(tmp_path).stats()
+    assert saved['android']['successes'] == 1 and saved['android@mp4:1080']['attempts'] == 1
+    assert saved['web']['failures_in_row'] == 1
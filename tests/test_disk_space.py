@@ -0,0 +1,66 @@
+from collections import namedtuple
+
+import pytest
+
+import disk_space
+from disk_space import DiskSpaceGuard, free_space
+
+MB = 1024 * 1024
+Usage = namedtuple('Usage', 'total used free')
+
+@pytest.fixture
+def disk(monkeypatch):
+    """Free bytes the stubbed shutil.disk_usage reports; None makes it fail"""
+    disk = {'free': 1000 * MB}
+
+    def disk_usage(path):
+        if disk['free'] is None:
+            raise OSError('no such device')
+        return Usage(2000 * MB, 2000 * MB - disk['free'], disk['free'])
+    monkeypatch.setattr(disk_space.shutil, 'disk_usage', disk_usage)
+    return disk
+
+@pytest.fixture
+def guard():
+    return DiskSpaceGuard(min_free=100 * MB)
+
+def test_required_adds_headroom():
+    guard = DiskSpaceGuard()
+    assert guard.required(100 * MB) == int(100 * MB * 1.1)
+    assert guard.required(100 * MB, merged=True) == int(100 * MB * 2.0 * 1.1)
+
+def test_required_counts_partial_data_already_on_disk():
+    guard = DiskSpaceGuard()
+    assert guard.required(100 * MB, partial_bytes=60 * MB) == int(110 * MB - 60 * MB)
+    assert guard.required(100 * MB, partial_bytes=500 * MB) == 0
+
+def test_reservations_reduce_the_space_for_others(disk, guard):
+    assert guard.reserve('a', '.', 500 * MB) == (True, 1000 * MB)
+    assert guard.reserve('b', '.', 300 * MB) == (True, 500 * MB)
+    assert guard.reserved() == 800 * MB
+    # 200 MiB left after both reservations, less the 100 MiB kept free
+    assert guard.reserve('c', '.', 150 * MB) == (False, 200 * MB)
+    assert guard.reserved() == 800 * MB
+
+def test_release_frees_the_reservation(disk, guard):
+    guard.reserve('a', '.', 800 * MB)
+    assert not guard.reserve('b', '.', 500 * MB)[0]
+    guard.release('a')
+    guard.release('a')
+    assert guard.reserve('b', '.', 500 * MB) == (True, 1000 * MB)
+
+def test_reserving_again_replaces_the_earlier_reservation(disk, guard):
+    guard.reserve('a', '.', 800 * MB)
+    assert guard.reserve('a', '.', 850 * MB) == (True, 1000 * MB)
+    assert guard.reserved() == 850 * MB
+
+def test_minimum_free_space_is_kept(disk, guard):
+    assert guard.reserve('a', '.', 900 * MB)[0]
+    guard.release('a')
+    assert guard.reserve('a', '.', 900 * MB + 1) == (False, 1000 * MB)
+
+def test_unknown_free_space_allows_the_download(disk, guard):
+    disk['free'] = None
+    assert free_space('.') is None
+    assert guard.reserve('a', '.', 10 ** 15) == (True, None)
+    assert guard.reserved() == 0
@@ -0,0 +1,73 @@
+import pytest
+
+from download_archive import DownloadArchive, archive_key
+
+VIDEO_ID = 'dQw4w9WgXcQ'
+WATCH_URL = f'https://www.youtube.com/watch?v={VIDEO_ID}'
+SHORT_URL = f'https://youtu.be/{VIDEO_ID}?t=42'
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = DownloadArchive(str(tmp_path / 'archive.db'))
+    yield archive
+    archive.close()
+
+def test_key_is_the_same_for_every_url_shape():
+    assert archive_key({'url': WATCH_URL}) == archive_key({'url': SHORT_URL}) == (VIDEO_ID, 'mp4', 'best')
+
+def test_key_prefers_resolved_video_id():
+    assert archive_key({'url': 'https://example.com/x', 'video_id': VIDEO_ID})[0] == VIDEO_ID
+
+def test_key_includes_video_format_and_quality():
+    assert archive_key({'url': WATCH_URL, 'format': 'webm', 'quality': '1080'}) == (VIDEO_ID, 'webm', '1080')
+    assert archive_key({'url': WATCH_URL, 'quality': '720'}) != archive_key({'url': WATCH_URL, 'quality': '1080'})
+
+def test_audio_key_ignores_quality():
+    assert archive_key({'url': WATCH_URL, 'format': 'mp3', 'quality': '1080'}) == (VIDEO_ID, 'mp3', '')
+    assert archive_key({'url': WATCH_URL, 'format': 'mp3'}) == archive_key({'url': SHORT_URL, 'format': 'mp3', 'quality': '480'})
+
+def test_add_and_find(archive):
+    item = {'url': WATCH_URL, 'title': 'Song', 'quality': '1080'}
+    assert archive.find(item) is None
+    archive.add(item)
+
+    entry = archive.find({'url': SHORT_URL, 'quality': '1080'})
+    assert entry['title'] == 'Song' and entry['completed_at']
+    assert archive.find({'url': WATCH_URL, 'quality': '720'}) is None
+
+def test_split_separates_archived_items(archive):
+    archive.add({'url': WATCH_URL})
+    fresh = {'url': 'https://youtu.be/aaaaaaaaaaa'}
+    duplicate = {'url': SHORT_URL}
+    forced = {'url': WATCH_URL, 'force': True}
+    other_quality = {'url': WATCH_URL, 'quality': '720'}
+
+    new, archived = archive.split([fresh, duplicate, forced, other_quality])
+    assert new == [fresh, forced, other_quality]
+    assert archived == [duplicate]
+
+def test_entries_are_shared_between_connections(archive):
+    archive.add({'url': WATCH_URL})
+    other = DownloadArchive(archive.path)
+    try:
+        assert other.find({'url': SHORT_URL})
+    finally:
+        other.close()
+
+class FakeHistory:
+    path = 'history.db'
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    def page(self, offset, limit, status=None):
+        return [e for e in self.entries if e['status'] == status][offset:offset + limit]
+
+def test_import_history_runs_once(archive):
+    history = FakeHistory([
+        {'url': WATCH_URL, 'status': 'Success', 'quality': '1080', 'timestamp': '2024-05-01 18:00:00'},
+        {'url': 'https://youtu.be/aaaaaaaaaaa', 'status': 'Failed'},
+    ])
+    assert archive.import_history(history, page_size=1) == 1
+    assert archive.find({'url': SHORT_URL, 'quality': '1080'})
+    assert archive.import_history(history) == 0
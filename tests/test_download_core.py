@@ -0,0 +1,182 @@
+import pytest
+
+import download_core
+import format_selection
+import rate_controller
+from client_strategy import ClientStrategies
+from download_archive import DownloadArchive
+from download_core import (MAX_FORBIDDEN_ERRORS, MAX_STALLED_UPDATES, DownloadRunner, download_item, history_entry,
+                           run_standalone)
+from rate_controller import RateController
+from ytdlp_engine import ProgressEvent
+
+URL = 'https://youtu.be/dQw4w9WgXcQ'
+
+class FakeRunner:
+    """Stands in for DownloadRunner: records the items it runs and logs"""
+
+    def __init__(self, success=True):
+        self.success = success
+        self.items = []
+        self.logs = []
+
+    def log(self, message):
+        self.logs.append(message)
+
+    def run(self, item, download_path, on_progress=None, on_line=None, journal=None):
+        self.items.append(item)
+        item['actual_bytes'] = 1000
+        return self.success
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    def resolve(item):
+        item['title'] = 'Song'
+        return True
+    monkeypatch.setattr(download_core, 'resolve_item', resolve)
+    monkeypatch.setattr(download_core, 'record_actual_size', lambda *args: None)
+    archive = DownloadArchive(str(tmp_path / 'archive.db'))
+    yield archive
+    archive.close()
+
+def test_standalone_item_has_its_own_id():
+    assert download_item(URL)['id'] != download_item(URL)['id']
+
+def test_standalone_download_is_archived_with_its_title(archive):
+    item = download_item(URL, '1080')
+    assert run_standalone(FakeRunner(), item, 'out', archive)
+    assert archive.find(item)['title'] == 'Song'
+    entry = history_entry(item['url'], item['title'], item['quality'], item['format'], 'Success', item['actual_bytes'])
+    assert entry['title'] == 'Song'
+
+def test_failed_download_is_not_archived(archive):
+    item = download_item(URL)
+    assert not run_standalone(FakeRunner(success=False), item, 'out', archive)
+    assert archive.find(item) is None and 'archived' not in item
+
+def test_archived_video_is_skipped_before_downloading(archive):
+    archive.add(download_item(URL))
+    runner = FakeRunner()
+    item = download_item(URL)
+    assert not run_standalone(runner, item, 'out', archive, confirm=lambda item, entry: False)
+    assert item['archived']['title'] is None
+    assert runner.items == [] and runner.logs[0].startswith('⏭️ Skipped, already downloaded')
+
+def test_confirmed_archived_video_is_downloaded_again(archive):
+    archive.add(download_item(URL))
+    runner = FakeRunner()
+    item = download_item(URL)
+    assert run_standalone(runner, item, 'out', archive, confirm=lambda item, entry: True)
+    assert runner.items == [item] and item['force']
+
+FORBIDDEN = 'ERROR: unable to download video data: HTTP Error 403: Forbidden'
+
+def downloading(downloaded_bytes, **kwargs):
+    kwargs.setdefault('tmpfilename', 'v.f137.mp4.part')
+    return ProgressEvent(status='downloading', downloaded_bytes=downloaded_bytes, total_bytes=1000, **kwargs)
+
+class ScriptedEngine:
+    """Stands in for YtDlpEngine: each run plays the next script of output lines and ProgressEvents.
+
+    A run returns 0, or 1 once the runner cancelled it.
+    """
+
+    in_process = True
+
+    def __init__(self, *scripts):
+        self.scripts = list(scripts)
+        self.runs = []
+        self.extractions = 0
+
+    def extract_info(self, url, args=()):
+        self.extractions += 1
+        return {'format_id': '22'}
+
+    def run(self, args, url, cwd=None, on_line=None, on_progress=None, job=None, throttle=None, info=None):
+        self.runs.append((args, info))
+        for step in self.scripts.pop(0):
+            if job.cancelled.is_set():
+                return 1
+            if isinstance(step, str):
+                on_line(step)
+            else:
+                on_progress(step)
+        return 1 if job.cancelled.is_set() else 0
+
+class FakeTuning:
+    def __init__(self, name, switch_back=False):
+        self.name = name
+        self.switch_back = switch_back
+
+    def args(self):
+        return ['--tuning', self.name]
+
+    def describe(self):
+        return self.name
+
+    def observe(self, event):
+        return self.switch_back
+
+    def finish(self):
+        pass
+
+class FakeTuner:
+    """Explores a setting that turns out slow when ``slow``, so the runner switches back"""
+
+    def __init__(self, slow=False):
+        self.slow = slow
+
+    def choose(self, context):
+        return FakeTuning('exploring', switch_back=self.slow)
+
+    def exploit(self, context):
+        return FakeTuning('best')
+
+@pytest.fixture
+def clock(clock, monkeypatch):
+    monkeypatch.setattr(rate_controller, 'time', clock)
+    return clock
+
+@pytest.fixture
+def runner_for(tmp_path, clock):
+    def runner_for(engine, tuner=None, parallel_streams=False):
+        return DownloadRunner(engine, ClientStrategies(path=str(tmp_path / 'stats.json')), tuner or FakeTuner(),
+                              RateController(), log=lambda message: None, parallel_streams=parallel_streams)
+    return runner_for
+
+def client(args):
+    return next((arg for arg in args if arg.startswith('youtube:player_client=')), 'default')
+
+def test_success_records_size_and_clears_resume_state(runner_for):
+    item = download_item(URL)
+    engine = ScriptedEngine([downloading(500, selection='22'), downloading(1000, selection='22')])
+    assert runner_for(engine).run(item, 'out')
+    assert item['actual_bytes'] == 1000 and 'resume' not in item
+
+def test_403s_fail_over_to_the_next_client_and_keep_the_format(runner_for):
+    item = download_item(URL)
+    engine = ScriptedEngine([downloading(300, selection='137+140')] + [FORBIDDEN] * MAX_FORBIDDEN_ERRORS,
+                            [downloading(1000)])
+    assert runner_for(engine).run(item, 'out')
+    (first, _), (second, _) = engine.runs
+    assert client(first) != client(second)
+    assert second[second.index('--format') + 1].startswith('137+140/')
+
+def test_stalled_attempt_fails_over(runner_for):
+    engine = ScriptedEngine([downloading(100)] * (MAX_STALLED_UPDATES + 2), [downloading(1000)])
+    assert runner_for(engine).run(download_item(URL), 'out')
+    assert len(engine.runs) == 2
+
+def test_every_client_failing_fails_the_download(runner_for):
+    engine = ScriptedEngine(*[[FORBIDDEN] * MAX_FORBIDDEN_ERRORS] * 5)
+    assert not runner_for(engine).run(download_item(URL), 'out')
+    assert len({client(args) for args, _ in engine.runs}) == 5
+
+def test_slow_exploration_retunes_with_the_same_client_and_info(runner_for, monkeypatch):
+    monkeypatch.setattr(format_selection, 'can_fetch_in_parallel', lambda: True)
+    engine = ScriptedEngine([downloading(100)], [downloading(1000)])
+    assert runner_for(engine, FakeTuner(slow=True), parallel_streams=True).run(download_item(URL), 'out')
+    (first, first_info), (second, second_info) = engine.runs
+    assert first[first.index('--tuning') + 1] == 'exploring' and second[second.index('--tuning') + 1] == 'best'
+    assert client(first) == client(second)
+    assert engine.extractions == 1 and first_info is second_info
@@ -0,0 +1,120 @@
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('flask_cors')
+
+import download_daemon
+import title_resolver
+from bulk_import import build_queue_items
+from download_daemon import DEFAULT_CONFIG, DownloadDaemon
+from queue_journal import QueueJournal
+
+URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+OTHER_URL = 'https://www.youtube.com/watch?v=aaaaaaaaaaa'
+
+def video_info(url):
+    return {'id': url[-11:], 'title': f'Song: {url[-11:]}', 'duration': 60, 'formats': []}
+
+class Inline:
+    """Stands in for the title resolver's thread pool, resolving on the calling thread"""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+class FakeListener:
+    """Stands in for QueueListener, so tests call sync() themselves"""
+
+    safety_interval = 30
+
+    def __init__(self, on_change):
+        self.sync = on_change
+
+    def start(self):
+        return True
+
+@pytest.fixture
+def make_daemon(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(title_resolver, 'get_video_info', video_info)
+    monkeypatch.setattr(title_resolver, 'ThreadPoolExecutor', Inline)
+    monkeypatch.setattr(download_daemon, 'QueueListener', FakeListener)
+
+    def make_daemon():
+        return DownloadDaemon(dict(DEFAULT_CONFIG, default_path=str(tmp_path)), str(tmp_path / 'config.json'),
+                              log=lambda message: None)
+    return make_daemon
+
+@pytest.fixture
+def daemon(make_daemon):
+    return make_daemon()
+
+def logged(daemon):
+    return daemon.logs()[1]
+
+def test_added_item_is_resolved_and_survives_a_restart(daemon, make_daemon):
+    item = daemon.add(URL, '1080')['item']
+    assert (item['title'], item['status'], item['quality']) == ('Song dQw4w9WgXcQ', 'Queued', '1080')
+
+    restarted = make_daemon()
+    assert [(i['id'], i['title']) for i in restarted.queue] == [(item['id'], 'Song dQw4w9WgXcQ')]
+
+def test_default_order_is_the_queue_order(daemon):
+    first, second = (daemon.add(url)['item'] for url in (URL, OTHER_URL))
+    first['estimated_bytes'], second['estimated_bytes'] = 1000, 10
+    assert sorted(daemon.queue, key=daemon.scheduler.order) == [first, second]
+    daemon.move(second['id'], first['id'])
+    assert daemon.queue == [second, first]
+
+def test_finished_download_is_archived_with_its_title(daemon):
+    item = daemon.add(URL)['item']
+    item['status'] = 'Downloading'
+    daemon.on_download_finish(item, True)
+    assert item['status'] == 'Completed'
+    assert daemon.history_store.recent(1)[0]['title'] == 'Song dQw4w9WgXcQ'
+
+    result = daemon.add(URL)
+    assert result['status'] == 'archived' and result['archived']['title'] == 'Song dQw4w9WgXcQ'
+    assert daemon.add(URL, force=True)['status'] == 'queued'
+
+def test_video_waiting_in_the_queue_is_not_added_twice(daemon):
+    item = daemon.add('https://youtu.be/dQw4w9WgXcQ')['item']
+    result = daemon.add(URL + '&t=10')
+    assert result == {'status': 'duplicate', 'item': item}
+    assert daemon.queue == [item]
+
+    item['status'] = 'Completed'
+    assert daemon.add(URL, force=True)['status'] == 'queued'
+
+def test_batch_sorts_out_invalid_duplicate_and_archived_urls(daemon):
+    daemon.add(URL)
+    daemon.download_archive.add({'url': OTHER_URL})
+    new_url = 'https://youtu.be/bbbbbbbbbbb'
+    items, rejected, duplicates, archived = daemon.enqueue_batch([URL, OTHER_URL, new_url, 'not a url'])
+    assert [item['url'] for item in items] == [new_url]
+    assert (rejected, duplicates, archived) == (['not a url'], [URL], [OTHER_URL])
+    assert items[0]['title'] == 'Song bbbbbbbbbbb'
+    assert daemon.title_resolver.state(items[0]['id']) == 'resolved'
+
+def test_sync_picks_up_items_another_process_queued(daemon):
+    daemon.sync_queue_from_file()
+    daemon.download_archive.add({'url': OTHER_URL})
+    other = QueueJournal(notify=False)
+    new, archived = build_queue_items([URL, OTHER_URL])
+    other.append_many([new, archived])
+
+    daemon.queue_listener.sync()
+    assert [(item['id'], item['status']) for item in daemon.queue] == [(new['id'], 'Queued'),
+                                                                       (archived['id'], 'Skipped')]
+    assert "📥 Synced 2 item(s) from the queue journal" in logged(daemon)
+
+def test_sync_failure_is_logged(daemon, monkeypatch):
+    daemon.sync_queue_from_file()
+
+    def refresh():
+        raise OSError("journal unreadable")
+    monkeypatch.setattr(daemon.journal, 'refresh', refresh)
+    daemon.queue_listener.sync()
+    assert logged(daemon)[-1].startswith("❌ Queue sync failed: journal unreadable\nTraceback")
@@ -0,0 +1,131 @@
+import threading
+import time
+
+import pytest
+
+from download_scheduler import DownloadScheduler, host_key
+
+@pytest.mark.parametrize('url, expected', [
+    ('https://www.youtube.com/watch?v=x', 'youtube.com'),
+    ('https://m.youtube.com/watch?v=x', 'youtube.com'),
+    ('https://youtu.be/x', 'youtube.com'),
+    ('https://WWW.Vimeo.com:443/1', 'vimeo.com'),
+    ('not a url', ''),
+])
+def test_host_key(url, expected):
+    assert host_key(url) == expected
+
+def queued(*urls):
+    return [{'url': url, 'status': 'Queued'} for url in urls]
+
+class Worker:
+    """Records peak concurrency overall and per host"""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.running = []
+        self.peak = 0
+        self.peak_per_host = {}
+        self.started = []
+
+    def __call__(self, item):
+        host = host_key(item['url'])
+        with self.lock:
+            self.started.append(item['url'])
+            self.running.append(host)
+            self.peak = max(self.peak, len(self.running))
+            self.peak_per_host[host] = max(self.peak_per_host.get(host, 0), self.running.count(host))
+        time.sleep(self.delay)
+        with self.lock:
+            self.running.remove(host)
+        item['status'] = 'Completed'
+        return True
+
+def test_runs_every_item_within_the_worker_cap():
+    worker = Worker()
+    queue = queued(*(f'https://example{i}.com/v' for i in range(8)))
+    DownloadScheduler(worker, max_workers=3, max_per_host=3).run(queue)
+    assert all(item['status'] == 'Completed' for item in queue)
+    assert worker.peak == 3
+
+def test_per_host_cap():
+    worker = Worker()
+    queue = queued(*(['https://youtu.be/a', 'https://www.youtube.com/watch?v=b'] * 3), 'https://vimeo.com/1')
+    DownloadScheduler(worker, max_workers=4, max_per_host=2).run(queue)
+    assert worker.peak_per_host == {'youtube.com': 2, 'vimeo.com': 1}
+    assert all(item['status'] == 'Completed' for item in queue)
+
+def test_order_key_picks_the_next_item():
+    worker = Worker(delay=0)
+    queue = [dict(item, size=size) for item, size in zip(queued('https://a.com/1', 'https://b.com/2', 'https://c.com/3'),
+                                                           [30, 10, 20])]
+    DownloadScheduler(worker, max_workers=1, order=lambda item: item['size']).run(queue)
+    assert worker.started == ['https://b.com/2', 'https://c.com/3', 'https://a.com/1']
+
+def test_only_queued_items_run():
+    worker = Worker(delay=0)
+    queue = queued('https://a.com/1', 'https://b.com/2')
+    queue[0]['status'] = 'Paused'
+    DownloadScheduler(worker).run(queue)
+    assert worker.started == ['https://b.com/2']
+
+def test_worker_errors_are_logged_and_reported_as_failures():
+    logged, finished = [], []
+
+    def worker(item):
+        item['status'] = 'Failed'
+        raise RuntimeError('boom')
+
+    scheduler = DownloadScheduler(worker, log=logged.append,
+                                  on_finish=lambda item, success: finished.append(success))
+    scheduler.run(queued('https://a.com/1'))
+    assert finished == [False]
+    assert logged[0].startswith('❌ Worker error for https://a.com/1: boom\nTraceback')
+    assert 'RuntimeError: boom' in logged[0]
+
+def test_items_added_while_running_are_picked_up_after_wake():
+    queue = queued('https://a.com/1')
+    scheduler = None
+
+    def worker(item):
+        if item['url'] == 'https://a.com/1':
+            queue.append({'url': 'https://b.com/2', 'status': 'Queued'})
+            scheduler.wake()
+        item['status'] = 'Completed'
+        return True
+
+    scheduler = DownloadScheduler(worker, max_workers=1)
+    scheduler.run(queue)
+    assert [item['status'] for item in queue] == ['Completed', 'Completed']
+
+def test_stop_lets_running_items_finish():
+    release = threading.Event()
+    queue = queued('https://a.com/1', 'https://b.com/2')
+
+    def worker(item):
+        release.wait(5)
+        item['status'] = 'Completed'
+        return True
+
+    scheduler = DownloadScheduler(worker, max_workers=1)
+    thread = threading.Thread(target=scheduler.run, args=(queue,))
+    thread.start()
+    while not scheduler.active_items():
+        time.sleep(0.001)
+    scheduler.stop()
+    release.set()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert [item['status'] for item in queue] == ['Completed', 'Queued']
+
+def test_stop_before_run_starts_nothing_until_resumed():
+    worker = Worker()
+    queue = queued('https://a.com/1')
+    scheduler = DownloadScheduler(worker)
+    scheduler.stop()
+    scheduler.run(queue)
+    assert worker.started == [] and queue[0]['status'] == 'Queued'
+    scheduler.resume()
+    scheduler.run(queue)
+    assert queue[0]['status'] == 'Completed'
@@ -0,0 +1,134 @@
+import pytest
+
+import format_selection
+from conftest import FakeYtDlp
+from format_selection import (_CombinedProgress, estimate_size, normalize_quality, run_parallel, split_rate_limit,
+                              video_format)
+from ytdlp_engine import ProgressEvent, YtDlpEngine
+
+def fmt(format_id, height=None, vcodec='none', acodec='none', tbr=None, filesize=None):
+    return {'format_id': format_id, 'height': height, 'vcodec': vcodec, 'acodec': acodec,
+            'tbr': tbr, 'filesize': filesize}
+
+INFO = {'duration': 100, 'formats': [
+    fmt('18', 360, 'avc1', 'mp4a', tbr=500, filesize=6000),
+    fmt('137', 1080, 'avc1.640028', filesize=50000),
+    fmt('248', 1080, 'vp9', filesize=40000),
+    fmt('136', 720, 'avc1.4d401f', filesize=20000),
+    fmt('140', acodec='mp4a.40.2', filesize=1500),
+    fmt('251', acodec='opus', filesize=1200),
+]}
+
+@pytest.mark.parametrize('quality, expected', [
+    ('best', 'best'), (None, 'best'), (' BEST ', 'best'),
+    ('1080', '1080'), ('1080p', '1080'), (720, '720'), ('0720', '720'),
+])
+def test_normalize_quality(quality, expected):
+    assert normalize_quality(quality) == expected
+
+@pytest.mark.parametrize('quality', ['abc', '0', 'p', '-1', '1080i'])
+def test_normalize_quality_rejects_garbage(quality):
+    with pytest.raises(ValueError):
+        normalize_quality(quality)
+
+def test_video_format_caps_height_and_bitrate():
+    spec, args = video_format('1080', 'mp4', max_video_bitrate=4000)
+    assert spec == 'bv*[height<=1080][tbr<=4000]+ba/b[height<=1080]'
+    assert args == ['--format-sort', 'res:1080,fps,vcodec:avc1,acodec:m4a']
+    assert video_format()[0] == 'bv*+ba/b'
+
+def test_estimate_size_prefers_container_codecs():
+    assert estimate_size(INFO, '1080', 'mp4') == 50000 + 1500
+    assert estimate_size(INFO, '1080', 'webm') == 40000 + 1200
+    assert estimate_size(INFO, '720p', 'mp4') == 20000 + 1500
+
+def test_estimate_size_falls_back_to_muxed_and_bitrate():
+    info = {'duration': 100, 'formats': [fmt('18', 360, 'avc1', 'mp4a', tbr=800)]}
+    assert estimate_size(info, 'best') == 800 * 1000 // 8 * 100
+
+def test_estimate_size_for_audio_and_unknowns():
+    assert estimate_size(INFO, container='wav') == 100 * 44100 * 4
+    assert estimate_size(INFO, container='mp3', audio_bitrate='128k') == 100 * 128000 // 8
+    assert estimate_size(INFO, container='m4a') == 1500
+    assert estimate_size(INFO, 'abc') is None
+    assert estimate_size(None) is None
+
+def test_split_rate_limit_by_bitrate():
+    assert split_rate_limit('1M', {'tbr': 3000}, {'tbr': 1000}) == [str(1024 * 1024 * 3 // 4), str(1024 * 1024 // 4)]
+    assert split_rate_limit('1000', {}, {'tbr': 128}) == ['500', '500']
+
+def test_combined_progress_adds_up_both_streams():
+    events = []
+    combined = _CombinedProgress(events.append, '137+140')
+    video, audio = combined.stream('video'), combined.stream('audio')
+
+    video(ProgressEvent(status='downloading', downloaded_bytes=100, total_bytes=1000, speed=10, filename='v.f137.mp4'))
+    assert events[-1].total_bytes is None
+    audio(ProgressEvent(status='downloading', downloaded_bytes=50, total_bytes=200, speed=5, filename='v.f140.m4a'))
+    assert (events[-1].downloaded_bytes, events[-1].total_bytes, events[-1].speed) == (150, 1200, 15)
+    assert events[-1].counter_key == '137+140'
+
+    video(ProgressEvent(status='finished', downloaded_bytes=1000, total_bytes=1000, filename='v.f137.mp4'))
+    audio(ProgressEvent(status='finished', downloaded_bytes=200, total_bytes=200, filename='v.f140.m4a'))
+    assert events[-1].status == 'finished' and events[-1].downloaded_bytes == 1200
+    assert combined.filenames == {'video': 'v.f137.mp4', 'audio': 'v.f140.m4a'}
+
+class FakeEngine:
+    """Records extractions and runs; each run 'downloads' the format it was given"""
+
+    def __init__(self, info):
+        self.info = info
+        self.extractions = 0
+        self.runs = []
+
+    def extract_info(self, url, args=()):
+        self.extractions += 1
+        return self.info
+
+    def run(self, args, url, cwd=None, on_line=None, on_progress=None, job=None, throttle=None, info=None):
+        format_id = args[args.index('--format') + 1]
+        self.runs.append((format_id, info))
+        if on_progress:
+            on_progress(ProgressEvent(status='finished', downloaded_bytes=1, filename=f'v.f{format_id}.mp4'))
+        return 0
+
+MERGED_INFO = {'requested_formats': [fmt('137', 1080, 'avc1'), fmt('140', acodec='mp4a')]}
+ARGS = ['--format', 'bv*+ba/b', '--merge-output-format', 'mp4', '--output', '%(title)s.%(ext)s']
+
+@pytest.fixture
+def no_merge(monkeypatch):
+    merged = []
+    monkeypatch.setattr(format_selection, 'can_fetch_in_parallel', lambda: True)
+    monkeypatch.setattr(format_selection, 'merge_streams', lambda *paths: merged.append(paths))
+    return merged
+
+def test_run_parallel_downloads_both_streams_from_one_extraction(no_merge):
+    engine = FakeEngine(MERGED_INFO)
+    assert run_parallel(engine, ARGS, 'https://youtu.be/x') == 0
+    assert engine.extractions == 1
+    assert sorted(engine.runs, key=lambda run: run[0]) == [('137', MERGED_INFO), ('140', MERGED_INFO)]
+    assert no_merge == [('v.f137.mp4', 'v.f140.mp4', 'v.mp4')]
+
+def test_run_parallel_reuses_the_callers_info(no_merge):
+    engine = FakeEngine(MERGED_INFO)
+    run_parallel(engine, ARGS, 'https://youtu.be/x', info=MERGED_INFO)
+    assert engine.extractions == 0
+
+def test_run_parallel_falls_back_to_one_run(no_merge):
+    muxed = {'requested_formats': None, 'format_id': '22'}
+    engine = FakeEngine(muxed)
+    run_parallel(engine, ARGS, 'https://youtu.be/x')
+    assert engine.runs == [('bv*+ba/b', muxed)]
+    run_parallel(engine, ARGS, 'https://youtu.be/x', info={})
+    assert engine.runs[-1] == ('bv*+ba/b', None)
+    assert engine.extractions == 1 and no_merge == []
+
+def test_in_process_streams_each_download_only_their_own_format(no_merge, fake_ytdlp):
+    args = ['--format', video_format('1080')[0]] + ARGS[2:]
+    events = []
+    assert run_parallel(YtDlpEngine('inprocess'), args, 'https://youtu.be/dQw4w9WgXcQ', on_progress=events.append) == 0
+    downloads = [selected for ydl in FakeYtDlp.instances for _, selected, _ in ydl.downloads]
+    # The 1080p cap holds for the extraction, and each stream run fetches just its own stream
+    assert sorted(downloads) == [['137'], ['140']]
+    assert no_merge == [('v.f137.mp4', 'v.f140.mp4', 'v.mp4')]
+    assert events[-1].status == 'finished' and events[-1].selection == '137+140'
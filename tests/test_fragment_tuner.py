@@ -0,0 +1,116 @@
+import json
+
+import pytest
+
+import fragment_tuner
+from fragment_tuner import DEFAULT_SETTINGS, PROBE_SECONDS, FragmentTuner, Tuning, _neighbours, settings_args
+from ytdlp_engine import ProgressEvent
+
+CONTEXT = 'mp4:1080'
+
+@pytest.fixture
+def tuner(tmp_path):
+    return FragmentTuner(str(tmp_path / 'tuning.json'), profile='test')
+
+@pytest.fixture
+def clock(clock, monkeypatch):
+    monkeypatch.setattr(fragment_tuner, 'time', clock)
+    return clock
+
+def downloading(downloaded_bytes, **kwargs):
+    return ProgressEvent(status='downloading', downloaded_bytes=downloaded_bytes, **kwargs)
+
+def test_defaults_until_something_is_measured(tuner):
+    assert tuner.best(CONTEXT) == (DEFAULT_SETTINGS, None)
+    tuning = tuner.choose(CONTEXT)
+    assert tuning.settings == DEFAULT_SETTINGS and tuning.exploring
+
+def test_settings_args():
+    assert settings_args(DEFAULT_SETTINGS) == ['--concurrent-fragments', '4', '--http-chunk-size', '10485760',
+                                               '--buffer-size', '65536']
+
+def test_neighbours_step_one_field_at_a_time():
+    neighbours = _neighbours(DEFAULT_SETTINGS)
+    assert len(neighbours) == 6
+    assert dict(DEFAULT_SETTINGS, concurrent_fragments=8) in neighbours
+    assert all(sum(n[f] != DEFAULT_SETTINGS[f] for f in n) == 1 for n in neighbours)
+
+def test_record_keeps_the_fastest_settings(tuner):
+    key = tuner._key(CONTEXT)
+    fast = dict(DEFAULT_SETTINGS, concurrent_fragments=8)
+    tuner.record(key, DEFAULT_SETTINGS, 1000)
+    tuner.record(key, fast, 2000)
+    assert tuner.best(CONTEXT) == (fast, 2000)
+    assert tuner.exploit(CONTEXT).settings == fast
+    assert not tuner.exploit(CONTEXT).exploring
+
+def test_best_is_repicked_when_it_slows_down(tuner):
+    key = tuner._key(CONTEXT)
+    fast = dict(DEFAULT_SETTINGS, concurrent_fragments=8)
+    tuner.record(key, DEFAULT_SETTINGS, 1500)
+    tuner.record(key, fast, 2000)
+    tuner.record(key, fast, 0)
+    assert tuner.best(CONTEXT)[0] == DEFAULT_SETTINGS
+
+def test_profiles_and_contexts_are_separate(tuner):
+    tuner.record(tuner._key(CONTEXT), DEFAULT_SETTINGS, 1000)
+    assert tuner.best('mp3:best')[1] is None
+    assert FragmentTuner(tuner.path, profile='other').best(CONTEXT)[1] is None
+
+def test_saved_results_are_reloaded(tuner):
+    tuner.record(tuner._key(CONTEXT), DEFAULT_SETTINGS, 1000)
+    tuner.save()
+    with open(tuner.path) as f:
+        assert 'test|mp4:1080' in json.load(f)
+    assert FragmentTuner(tuner.path, profile='test').best(CONTEXT) == (DEFAULT_SETTINGS, 1000)
+
+def test_observe_measures_throughput_over_the_probe(tuner, clock):
+    tuning = tuner.exploit(CONTEXT)
+    assert not tuning.observe(downloading(1000))
+    clock.now += PROBE_SECONDS / 2
+    assert not tuning.observe(downloading(5000))
+    assert tuning.speed is None
+    clock.now += PROBE_SECONDS / 2
+    assert not tuning.observe(downloading(9000))
+    assert tuning.speed == 8000 / PROBE_SECONDS
+
+    tuning.finish()
+    tuning.finish()
+    assert tuner.best(CONTEXT) == (DEFAULT_SETTINGS, 1000)
+    assert tuner._data['test|mp4:1080']['trials']['4/10485760/65536']['runs'] == 1
+
+def test_observe_counts_each_file_separately(tuner, clock):
+    tuning = tuner.exploit(CONTEXT)
+    tuning.observe(downloading(0, filename='video'))
+    tuning.observe(downloading(0, filename='audio'))
+    clock.now += PROBE_SECONDS
+    tuning.observe(downloading(600, filename='audio'))
+    tuning.observe(downloading(400, filename='video'))
+    assert tuning.speed == 600 / PROBE_SECONDS
+
+def test_slow_exploration_asks_to_switch_back(tuner, clock):
+    tuning = Tuning(tuner, tuner._key(CONTEXT), DEFAULT_SETTINGS, exploring=True, best_speed=1000)
+    tuning.observe(downloading(0))
+    clock.now += PROBE_SECONDS
+    assert tuning.observe(downloading(100 * PROBE_SECONDS))
+
+def test_unfinished_probe_records_nothing(tuner, clock):
+    tuning = tuner.exploit(CONTEXT)
+    tuning.observe(downloading(0))
+    tuning.finish()
+    assert tuner.best(CONTEXT)[1] is None
+
+def test_save_keeps_trials_another_process_saved(tuner):
+    other = FragmentTuner(tuner.path, profile='test')
+    fast = dict(DEFAULT_SETTINGS, concurrent_fragments=8)
+    tuner.record(tuner._key(CONTEXT), DEFAULT_SETTINGS, 1000)
+    other.record(other._key(CONTEXT), fast, 3000)
+    other.record(other._key('mp3:best'), DEFAULT_SETTINGS, 500)
+    other.save()
+    tuner.save()
+
+    assert tuner.best(CONTEXT) == (fast, 3000)
+    reloaded = FragmentTuner(tuner.path, profile='test')
+    assert reloaded.best(CONTEXT) == (fast, 3000)
+    assert reloaded.best('mp3:best')[1] == 500
+    assert len(reloaded._data['test|mp4:1080']['trials']) == 2
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from history_store import HistoryStore
+
+VIDEO_ID = 'dQw4w9WgXcQ'
+
+def entry(n, status='Completed', url=None):
+    return {'timestamp': f'2024-05-01 12:00:{n:02d}', 'url': url or f'https://youtu.be/{n:011d}',
+            'title': f'Video {n}', 'quality': 'best', 'format': 'mp4', 'status': status}
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'), legacy_path=None)
+    yield store
+    store.close()
+
+def titles(entries):
+    return [e['title'] for e in entries]
+
+def test_pages_are_newest_first(store):
+    for n in range(5):
+        store.add(entry(n))
+    assert titles(store.page(0, 2)) == ['Video 4', 'Video 3']
+    assert titles(store.page(2, 2)) == ['Video 2', 'Video 1']
+    assert titles(store.page(4, 2)) == ['Video 0']
+
+def test_same_timestamp_orders_by_insertion(store):
+    store.add(entry(1))
+    store.add(dict(entry(1), title='Later'))
+    assert titles(store.page()) == ['Later', 'Video 1']
+
+def test_status_and_video_id_filters(store):
+    store.add(entry(1))
+    store.add(entry(2, status='Failed'))
+    store.add(entry(3, url=f'https://www.youtube.com/watch?v={VIDEO_ID}'))
+    store.add(entry(4, status='Failed', url=f'https://youtu.be/{VIDEO_ID}?t=42'))
+    assert titles(store.page(status='Failed')) == ['Video 4', 'Video 2']
+    assert titles(store.page(video_id=VIDEO_ID)) == ['Video 4', 'Video 3']
+    assert titles(store.page(status='Completed', video_id=VIDEO_ID)) == ['Video 3']
+
+def test_recent_and_find(store):
+    for n in range(3):
+        store.add(entry(n))
+    assert titles(store.recent(2)) == ['Video 2', 'Video 1']
+    assert store.find('2024-05-01 12:00:01')['title'] == 'Video 1'
+    assert store.find('2023-01-01 00:00:00') is None
+
+def test_json_history_is_imported_once(tmp_path):
+    legacy = tmp_path / 'history.json'
+    legacy.write_text(json.dumps([entry(1), entry(2)]))
+    db = str(tmp_path / 'history.db')
+
+    store = HistoryStore(db, legacy_path=str(legacy))
+    assert titles(store.page()) == ['Video 2', 'Video 1']
+    assert store.page()[0]['video_id'] == '00000000002'
+    assert store.import_json(str(legacy)) == 0
+    store.close()
+
+    reopened = HistoryStore(db, legacy_path=str(legacy))
+    assert len(reopened.page()) == 2
+    reopened.close()
+
+@pytest.mark.parametrize('content', [{'timestamp': 'x'}, 'not a list', None])
+def test_json_history_that_is_not_a_list_is_skipped(tmp_path, store, content):
+    legacy = tmp_path / 'history.json'
+    legacy.write_text(json.dumps(content))
+    assert store.import_json(str(legacy)) == 0
+    assert store.page() == []
+
+def test_malformed_json_entries_are_ignored(tmp_path, store):
+    legacy = tmp_path / 'history.json'
+    legacy.write_text(json.dumps([entry(1), 'stray', 42, None, {'title': 'no url'}]))
+    assert store.import_json(str(legacy)) == 1
+    assert titles(store.page()) == ['Video 1']
@@ -0,0 +1,78 @@
+import os
+
+from job_control import CANCELLED, PAUSED, JobControl, remove_partial_files
+from ytdlp_engine import EngineJob
+
+def touch(tmp_path, *names):
+    paths = [str(tmp_path / name) for name in names]
+    for path in paths:
+        open(path, 'w').close()
+    return paths
+
+def running(item_id='a', **fields):
+    return dict(id=item_id, status='Downloading', **fields)
+
+def test_queued_item_pauses_and_resumes():
+    control = JobControl()
+    item = {'id': 'a', 'status': 'Queued'}
+    assert control.pause(item) and item['status'] == PAUSED
+    assert control.resume(item) and item['status'] == 'Queued'
+    assert not control.resume(item)
+
+def test_pausing_a_running_item_stops_it_and_keeps_its_files(tmp_path):
+    control = JobControl()
+    part, = touch(tmp_path, 'Song.f137.mp4.part')
+    item = running(resume={'tmpfilename': part})
+    job = EngineJob()
+    control.attach(item, job)
+    assert control.pause(item)
+    assert job.cancelled.is_set() and control.requested(item) == 'pause'
+
+    control.detach(item, job)
+    assert control.finish(item) == PAUSED
+    assert os.path.exists(part) and item['resume']
+
+def test_stop_requested_before_the_attempt_starts_cancels_it():
+    control = JobControl()
+    item = running()
+    control.cancel(item)
+    job = EngineJob()
+    control.attach(item, job)
+    assert job.cancelled.is_set()
+
+def test_cancelling_a_running_item_removes_its_partial_files(tmp_path):
+    control = JobControl()
+    video, audio, fragment, done = touch(tmp_path, 'Song.f137.mp4.part', 'Song.f140.m4a',
+                                         'Song.f137.mp4.part-Frag3', 'Other.mp4')
+    item = running(resume={'tmpfilename': video})
+    job = EngineJob()
+    job.files.update([audio, done])
+    control.attach(item, job)
+    control.cancel(item)
+    control.detach(item, job)
+
+    assert control.finish(item) == CANCELLED
+    assert [os.path.exists(path) for path in (video, audio, fragment, done)] == [False, False, False, True]
+    assert 'resume' not in item
+
+def test_finish_without_a_request_is_a_normal_end():
+    control = JobControl()
+    item = running()
+    job = EngineJob()
+    control.attach(item, job)
+    control.detach(item, job)
+    assert control.finish(item) is None
+
+def test_cancel_queued_item_and_refuse_finished_ones(tmp_path):
+    control = JobControl()
+    part, = touch(tmp_path, 'Song.mp4.part')
+    item = {'id': 'a', 'status': 'Queued', 'resume': {'partial_files': [part]}}
+    assert control.cancel(item) and item['status'] == CANCELLED
+    assert not os.path.exists(part)
+    assert not control.cancel(item)
+    assert not control.cancel({'id': 'b', 'status': 'Completed'})
+
+def test_remove_partial_files_keeps_finished_downloads(tmp_path):
+    part, ytdl, done = touch(tmp_path, 'Song.mp4.part', 'Song.mp4.ytdl', 'Song.mp4')
+    assert remove_partial_files([part, done]) == 2
+    assert not os.path.exists(ytdl) and os.path.exists(done)
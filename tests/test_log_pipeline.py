@@ -0,0 +1,99 @@
+import pytest
+
+from conftest import FakeRoot
+from log_pipeline import LogPipeline
+
+class FakeText:
+    """The parts of a Tk Text widget LogPipeline uses, on whole lines"""
+
+    def __init__(self):
+        self.text = ''
+        self.inserts = 0
+        self.states = []
+
+    @property
+    def lines(self):
+        return self.text.split('\n')[:-1]
+
+    def insert(self, index, text):
+        assert index == 'end'
+        self.inserts += 1
+        self.text += text
+
+    def index(self, index):
+        assert index == 'end-1c'
+        return f"{self.text.count(chr(10)) + 1}.0"
+
+    def delete(self, start, end):
+        assert start == '1.0'
+        self.text = '\n'.join(self.text.split('\n')[int(end.split('.')[0]) - 1:])
+
+    def see(self, index):
+        pass
+
+    def configure(self, state):
+        self.states.append(state)
+
+@pytest.fixture
+def make_pipeline():
+    def make_pipeline(max_lines=5, read_only=False):
+        pipeline = LogPipeline(FakeRoot(), max_lines=max_lines, log_path=None)
+        pipeline.widget_text = FakeText()
+        pipeline.attach(pipeline.widget_text, read_only)
+        return pipeline
+    return make_pipeline
+
+def test_queued_lines_are_shown_in_one_insert(make_pipeline):
+    pipeline = make_pipeline()
+    for n in range(3):
+        pipeline.write(f"line {n}")
+    widget = pipeline.widget_text
+    assert widget.lines == []
+
+    pipeline.root.run()
+    assert widget.lines == ['line 0', 'line 1', 'line 2']
+    assert widget.inserts == 1
+    # The drain keeps itself scheduled
+    assert len(pipeline.root.pending) == 1
+
+def test_lines_written_before_attach_are_shown():
+    pipeline = LogPipeline(FakeRoot(), log_path=None)
+    pipeline.write("early")
+    widget = FakeText()
+    pipeline.attach(widget)
+    pipeline.root.run()
+    assert widget.lines == ['early']
+
+def test_widget_is_trimmed_to_the_cap(make_pipeline):
+    pipeline = make_pipeline(max_lines=5)
+    widget = pipeline.widget_text
+    for n in range(4):
+        pipeline.write(f"line {n}")
+    pipeline.root.run()
+    for n in range(4, 7):
+        pipeline.write(f"line {n}")
+    pipeline.root.run()
+    assert widget.lines == [f"line {n}" for n in range(2, 7)]
+
+def test_buffer_drops_the_oldest_lines_at_the_cap(make_pipeline):
+    pipeline = make_pipeline(max_lines=5)
+    for n in range(12):
+        pipeline.write(f"line {n}")
+    pipeline.root.run()
+    assert pipeline.widget_text.lines == [f"line {n}" for n in range(7, 12)]
+
+def test_read_only_widget_is_enabled_only_while_writing(make_pipeline):
+    pipeline = make_pipeline(read_only=True)
+    pipeline.write("line")
+    pipeline.root.run()
+    assert pipeline.widget_text.states == ['normal', 'disabled']
+
+def test_drain_stops_when_the_widget_is_gone(make_pipeline):
+    pipeline = make_pipeline()
+
+    def insert(index, text):
+        raise RuntimeError('invalid command name')
+    pipeline.widget_text.insert = insert
+    pipeline.write("line")
+    pipeline.root.run()
+    assert pipeline.root.pending == []
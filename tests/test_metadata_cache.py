@@ -0,0 +1,78 @@
+import metadata_cache
+from metadata_cache import MetadataCache, clean_title, expected_size, summarize_info
+
+VIDEO = {'format_id': '137', 'height': 1080, 'vcodec': 'avc1.640028', 'acodec': 'none', 'filesize': 1000}
+AUDIO = {'format_id': '140', 'vcodec': 'none', 'acodec': 'mp4a.40.2', 'filesize': 100}
+
+def make_cache(tmp_path, **kwargs):
+    return MetadataCache(str(tmp_path / 'cache.json'), **kwargs)
+
+def test_put_and_get(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.get('abc') is None
+    entry = cache.put('abc', {'title': 'Song'})
+    assert entry['cached_at']
+    assert cache.get('abc')['title'] == 'Song'
+
+def test_expired_entries_are_dropped(tmp_path, monkeypatch, clock):
+    monkeypatch.setattr(metadata_cache, 'time', clock)
+    cache = make_cache(tmp_path, ttl=60)
+    cache.put('abc', {'title': 'Song'})
+    clock.now += 59
+    assert cache.get('abc')
+    clock.now += 2
+    assert cache.get('abc') is None
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2)
+    cache.put('a', {})
+    cache.put('b', {})
+    cache.get('a')
+    cache.put('c', {})
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+
+def test_saved_entries_are_loaded_by_another_instance(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put('abc', {'title': 'Song'})
+    cache.save()
+    assert make_cache(tmp_path).get('abc')['title'] == 'Song'
+
+def test_get_picks_up_another_writer(tmp_path):
+    reader = make_cache(tmp_path)
+    writer = make_cache(tmp_path)
+    writer.put('abc', {'title': 'Song'})
+    writer.save()
+    assert reader.get('abc')['title'] == 'Song'
+
+def test_summarize_info_keeps_formats_and_estimates():
+    info = {'id': 'abc', 'title': 'Song', 'duration': 60, 'webpage_url': 'x',
+            'formats': [dict(VIDEO, url='https://...'), dict(AUDIO, filesize=None, filesize_approx=100)]}
+    summary = summarize_info(info)
+    assert set(summary) == {'id', 'title', 'duration', 'formats', 'filesize_estimates'}
+    assert 'url' not in summary['formats'][0]
+    assert summary['formats'][1]['filesize'] == 100
+    assert summary['filesize_estimates']['best'] == summary['filesize_estimates']['1080'] == 1100
+    assert '720' not in summary['filesize_estimates']
+
+def test_expected_size_prefers_measured_size():
+    info = {'duration': 60, 'formats': [VIDEO, AUDIO]}
+    assert expected_size(info, '1080') == 1100
+    assert expected_size(dict(info, actual_sizes={'mp4:1080': 1234}), '1080') == 1234
+    assert expected_size(None) is None
+
+def test_clean_title():
+    assert clean_title('Song: Live/Remix!') == 'Song LiveRemix'
+    assert clean_title('') == 'Unknown Title'
+    assert len(clean_title('x' * 80)) == 50
+
+def test_save_keeps_entries_another_process_saved(tmp_path):
+    gui, daemon = make_cache(tmp_path), make_cache(tmp_path)
+    gui.put('a', {'title': 'From the GUI'})
+    daemon.put('b', {'title': 'From the daemon'})
+    daemon.put('a', {'title': 'Newer'})
+    daemon.save()
+    gui.save()
+    reloaded = make_cache(tmp_path)
+    assert reloaded.get('a')['title'] == 'Newer'
+    assert reloaded.get('b')['title'] == 'From the daemon'
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from json_store import save_json
+from playlist_expander import PlaylistExpander, collection_url
+
+PLAYLIST_URL = 'https://www.youtube.com/playlist?list=PL0123456789abcdef'
+
+def entry(index, title=None):
+    return {'id': f'video{index:05d}', 'title': title or f'Video {index}', 'duration': 60}
+
+class FakeEngine:
+    """Lists ``entries`` from the requested start index; raises ``error`` after ``fail_after`` of them"""
+
+    def __init__(self, entries, fail_after=None):
+        self.entries = entries
+        self.fail_after = fail_after
+        self.starts = []
+
+    def iter_entries(self, url, start=1, job=None):
+        self.starts.append(start)
+        for count, index in enumerate(range(start, len(self.entries) + 1)):
+            if count == self.fail_after:
+                raise RuntimeError("listing failed")
+            yield index, self.entries[index - 1]
+
+class Queue:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, items):
+        self.batches.append(items)
+        return len(items)
+
+def expander_for(tmp_path, engine, queue):
+    return PlaylistExpander(queue, engine, path=str(tmp_path / 'expansions.json'), batch_size=3, batch_interval=60)
+
+def finished(expander, expansion_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while expander.state(expansion_id)['status'] == 'running' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return expander.state(expansion_id)
+
+@pytest.mark.parametrize('url, expected', [
+    (PLAYLIST_URL, PLAYLIST_URL),
+    ('https://www.youtube.com/@name', 'https://www.youtube.com/@name/videos'),
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PL0123456789abcdef', None),
+])
+def test_collection_url(url, expected):
+    assert collection_url(url) == expected
+
+def test_first_entry_goes_out_alone_then_full_batches(tmp_path):
+    entries = [entry(1), entry(2, '[Private video]'), entry(3), entry(4), entry(5), entry(6)]
+    queue = Queue()
+    expander = expander_for(tmp_path, FakeEngine(entries), queue)
+    state = finished(expander, expander.expand(PLAYLIST_URL, '720'))
+
+    assert [len(batch) for batch in queue.batches] == [1, 3, 1]
+    first = queue.batches[0][0]
+    assert first['url'] == 'https://www.youtube.com/watch?v=video00001'
+    assert (first['title'], first['title_status'], first['quality']) == ('Video 1', 'resolved', '720')
+    assert (state['status'], state['found'], state['added'], state['next_index']) == ('done', 5, 5, 7)
+
+def test_failed_listing_keeps_what_was_queued(tmp_path):
+    queue = Queue()
+    expander = expander_for(tmp_path, FakeEngine([entry(i) for i in range(1, 6)], fail_after=2), queue)
+    state = finished(expander, expander.expand(PLAYLIST_URL))
+    assert state['status'] == 'failed'
+    assert sum(len(batch) for batch in queue.batches) == 2 and state['next_index'] == 3
+
+def test_unfinished_expansion_resumes_from_its_checkpoint(tmp_path):
+    # As a session that stopped after the first two entries leaves it
+    save_json(str(tmp_path / 'expansions.json'), {'abc': {
+        'id': 'abc', 'url': PLAYLIST_URL, 'quality': 'best', 'format': 'mp4', 'audio_bitrate': None,
+        'source': 'playlist', 'next_index': 3, 'found': 2, 'added': 2, 'status': 'running', 'started': 0}})
+    engine, queue = FakeEngine([entry(i) for i in range(1, 6)]), Queue()
+    expander = expander_for(tmp_path, engine, queue)
+    assert expander.resume_pending() == ['abc']
+    state = finished(expander, 'abc')
+    assert engine.starts == [3]
+    assert [item['video_id'] for batch in queue.batches for item in batch] == ['video00003', 'video00004', 'video00005']
+    assert (state['status'], state['found']) == ('done', 5)
@@ -0,0 +1,29 @@
+import threading
+
+import pytest
+
+from queue_events import QueueListener, notify
+
+@pytest.fixture
+def listener():
+    changes = threading.Event()
+    listener = QueueListener(changes.set, port=0, safety_interval=5)
+    listener.changes = changes
+    assert listener.start()
+    yield listener
+    listener.stop()
+
+def test_notify_wakes_the_listener(listener):
+    notify(listener.port)
+    assert listener.changes.wait(2)
+
+def test_port_in_use_is_refused(listener):
+    assert not QueueListener(lambda: None, port=listener.port).start()
+
+def test_stopped_listener_shuts_down_without_a_callback(listener):
+    listener.stop()
+    listener._thread.join(2)
+    assert not listener._thread.is_alive()
+    assert not listener.changes.is_set()
+    notify(listener.port)
+    listener.stop()
@@ -0,0 +1,99 @@
+import json
+
+from queue_journal import QueueJournal
+
+def make_journal(tmp_path, **kwargs):
+    return QueueJournal(str(tmp_path / 'queue.journal'), legacy_path=None, durable=False, notify=False, **kwargs)
+
+def records(journal):
+    with open(journal.path) as f:
+        return [json.loads(line) for line in f]
+
+def test_replay_restores_queue(tmp_path):
+    journal = make_journal(tmp_path)
+    a, b, c = ({'id': name, 'url': name, 'status': 'Queued'} for name in 'abc')
+    journal.append_many([a, b, c])
+    journal.update('a', status='Completed')
+    journal.move('c', before='a')
+    journal.remove('b')
+
+    replayed = make_journal(tmp_path).items()
+    assert [item['id'] for item in replayed] == ['c', 'a']
+    assert replayed[1]['status'] == 'Completed'
+
+def test_remove_many_and_clear(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.append_many([{'id': name} for name in 'abc'])
+    journal.remove_many(['a', 'c'])
+    assert [item['id'] for item in make_journal(tmp_path).items()] == ['b']
+    journal.clear()
+    assert make_journal(tmp_path).items() == []
+
+def test_refresh_picks_up_other_writers_and_keeps_dicts(tmp_path):
+    reader = make_journal(tmp_path)
+    writer = make_journal(tmp_path)
+    writer.append({'id': 'a', 'status': 'Queued'})
+    changes = reader.refresh()
+    assert [(op, item['id']) for op, item in changes] == [('add', 'a')]
+    held = reader.get('a')
+
+    writer.update('a', status='Downloading')
+    assert [op for op, _ in reader.refresh()] == ['update']
+    assert held['status'] == 'Downloading'
+    # Own records are already applied
+    assert writer.refresh() == []
+
+def test_torn_final_line_is_ignored(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.append({'id': 'a'})
+    with open(journal.path, 'a') as f:
+        f.write('{"op": "add", "item": {"id": "b"')
+    assert [item['id'] for item in make_journal(tmp_path).items()] == ['a']
+
+def test_compaction_writes_snapshot_without_transient_fields(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.append({'id': 'a', 'status': 'Queued'})
+    for percent in range(5):
+        journal.update('a', progress=percent, transfer={'speed': 1})
+    journal.compact()
+
+    lines = records(journal)
+    assert lines[0]['op'] == 'snapshot'
+    assert len(lines) == 2
+    assert 'progress' not in lines[1]['item'] and 'transfer' not in lines[1]['item']
+    assert make_journal(tmp_path).items()[0]['status'] == 'Queued'
+
+def test_compaction_by_another_process_replays_in_place(tmp_path):
+    reader = make_journal(tmp_path)
+    writer = make_journal(tmp_path)
+    writer.append_many([{'id': 'a'}, {'id': 'b'}])
+    reader.refresh()
+    held = reader.get('a')
+
+    writer.remove('b')
+    writer.update('a', status='Completed')
+    writer.compact()
+    changes = reader.refresh()
+    assert ('remove', 'b') in [(op, item['id']) for op, item in changes]
+    assert reader.get('a') is held
+    assert held['status'] == 'Completed'
+
+def test_compacts_automatically_past_threshold(tmp_path):
+    journal = make_journal(tmp_path, compact_threshold=10)
+    journal.append({'id': 'a'})
+    for index in range(20):
+        journal.update('a', n=index)
+    lines = records(journal)
+    assert lines[0]['op'] == 'snapshot'
+    assert len(lines) < 21
+    assert make_journal(tmp_path).items()[0]['n'] == 19
+
+def test_legacy_queue_is_migrated_once(tmp_path):
+    legacy = tmp_path / 'download_queue.json'
+    legacy.write_text(json.dumps([{'url': 'u1'}, {'id': 'x', 'url': 'u2'}]))
+    journal = QueueJournal(str(tmp_path / 'queue.journal'), legacy_path=str(legacy), durable=False, notify=False)
+    items = journal.items()
+    assert [item['url'] for item in items] == ['u1', 'u2']
+    assert items[0]['id'] and items[1]['id'] == 'x'
+    assert not legacy.exists()
+    assert (tmp_path / 'download_queue.json.migrated').exists()
@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from queue_policy import DEFAULT_POLICY, POLICIES, parse_deadline, parse_priority, policy_key, scheduling_fields
+
+ITEMS = [
+    {'id': 'big', 'estimated_bytes': 900, 'priority': 1},
+    {'id': 'unknown', 'deadline': 200.0},
+    {'id': 'small', 'estimated_bytes': 10, 'deadline': 300.0},
+    {'id': 'medium', 'estimated_bytes': 50, 'priority': 5, 'deadline': 200.0},
+]
+
+def order(policy):
+    return [item['id'] for item in sorted(ITEMS, key=policy_key(policy))]
+
+def test_fifo_keeps_queue_order():
+    assert order('fifo') == ['big', 'unknown', 'small', 'medium']
+
+def test_default_keeps_queue_order():
+    assert order(DEFAULT_POLICY) == order('fifo')
+
+def test_shortest_puts_unknown_sizes_last():
+    assert order('shortest') == ['small', 'medium', 'big', 'unknown']
+
+def test_priority_highest_first_and_stable():
+    assert order('priority') == ['medium', 'big', 'unknown', 'small']
+
+def test_deadline_then_shortest():
+    assert order('deadline') == ['medium', 'unknown', 'small', 'big']
+
+def test_unknown_policy():
+    with pytest.raises(ValueError, match='choose from'):
+        policy_key('random')
+    assert set(POLICIES) == {'fifo', 'shortest', 'priority', 'deadline'}
+
+@pytest.mark.parametrize('value, expected', [(None, 0), ('', 0), (3, 3), ('-2', -2)])
+def test_parse_priority(value, expected):
+    assert parse_priority(value) == expected
+
+@pytest.mark.parametrize('value', ['high', '1.5', [1]])
+def test_parse_priority_rejects_garbage(value):
+    with pytest.raises(ValueError):
+        parse_priority(value)
+
+def test_parse_deadline():
+    utc = datetime(2024, 5, 1, 18, 0, tzinfo=timezone.utc).timestamp()
+    assert parse_deadline('2024-05-01T18:00:00Z') == utc
+    assert parse_deadline('2024-05-01T20:00:00+02:00') == utc
+    assert parse_deadline('2024-05-01T18:00') == datetime(2024, 5, 1, 18, 0).timestamp()
+    assert parse_deadline(1714586400) == 1714586400.0
+    assert parse_deadline(None) is None and parse_deadline('') is None
+    with pytest.raises(ValueError, match='ISO 8601'):
+        parse_deadline('tomorrow')
+
+def test_scheduling_fields_only_includes_given_fields():
+    assert scheduling_fields({'url': 'x'}) == {}
+    assert scheduling_fields({'priority': '2', 'deadline': None}) == {'priority': 2, 'deadline': None}
+    with pytest.raises(ValueError):
+        scheduling_fields({'priority': 'high'})
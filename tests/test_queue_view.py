@@ -0,0 +1,111 @@
+import pytest
+
+from conftest import FakeRoot
+from queue_view import QueueView
+
+class FakeTree:
+    """The parts of ttk.Treeview QueueView uses, recording every change"""
+
+    def __init__(self):
+        self.rows = []
+        self.values = {}
+        self.calls = []
+
+    def get_children(self):
+        return tuple(self.rows)
+
+    def exists(self, iid):
+        return iid in self.values
+
+    def insert(self, parent, index, iid, values):
+        self.calls.append(('insert', iid))
+        self.rows.insert(index, iid)
+        self.values[iid] = values
+
+    def item(self, iid, values):
+        self.calls.append(('item', iid))
+        self.values[iid] = values
+
+    def delete(self, *iids):
+        self.calls.append(('delete',) + iids)
+        for iid in iids:
+            self.rows.remove(iid)
+            del self.values[iid]
+
+    def move(self, iid, parent, index):
+        self.calls.append(('move', iid))
+        self.rows.remove(iid)
+        self.rows.insert(index, iid)
+
+def make_item(item_id, **fields):
+    return dict({'id': item_id, 'title': item_id, 'status': 'Queued', 'quality': 'best', 'format': 'mp4'}, **fields)
+
+@pytest.fixture
+def view():
+    view = QueueView(FakeRoot(), FakeTree(), lambda: view.items, row=lambda item: (item['status'], item['title']))
+    view.items = []
+    return view
+
+def flush(view):
+    view.tree.calls.clear()
+    view.root.run()
+    return view.tree.calls
+
+def test_new_items_are_inserted_in_order(view):
+    view.items = [make_item('a'), make_item('b')]
+    view.refresh()
+    assert flush(view) == [('insert', 'a'), ('insert', 'b')]
+    assert view.tree.rows == ['a', 'b']
+    assert view.tree.values['a'] == ('Queued', 'a')
+
+def test_changed_item_updates_only_its_row(view):
+    view.items = [make_item('a'), make_item('b')]
+    view.refresh()
+    flush(view)
+
+    view.items[1]['status'] = 'Downloading'
+    view.refresh(view.items[1])
+    view.refresh(view.items[1])
+    assert flush(view) == [('item', 'b')]
+    assert view.tree.values['b'] == ('Downloading', 'b')
+
+def test_refreshes_are_batched_into_one_pass(view):
+    view.items = [make_item('a')]
+    view.refresh()
+    view.refresh(view.items[0])
+    assert len(view.root.pending) == 1
+    # A row inserted in this pass already has its latest values
+    assert flush(view) == [('insert', 'a')]
+
+def test_removed_items_are_deleted(view):
+    view.items = [make_item('a'), make_item('b'), make_item('c')]
+    view.refresh()
+    flush(view)
+
+    view.items = [view.items[1]]
+    view.refresh()
+    assert flush(view) == [('delete', 'a', 'c')]
+    assert view.tree.rows == ['b']
+
+def test_reordered_items_are_moved(view):
+    a, b, c = view.items = [make_item('a'), make_item('b'), make_item('c')]
+    view.refresh()
+    flush(view)
+
+    view.items = [c, a, b]
+    view.refresh()
+    calls = flush(view)
+    assert view.tree.rows == ['c', 'a', 'b']
+    assert all(call[0] == 'move' for call in calls)
+
+def test_unchanged_queue_touches_nothing(view):
+    view.items = [make_item('a')]
+    view.refresh()
+    flush(view)
+    view.refresh()
+    assert flush(view) == []
+
+def test_refresh_of_a_removed_item_is_ignored(view):
+    item = make_item('a')
+    view.refresh(item)
+    assert flush(view) == []
@@ -0,0 +1,79 @@
+import pytest
+
+import rate_controller
+from rate_controller import SIGNAL_WINDOW, RateController, is_throttle_signal
+
+@pytest.fixture
+def clock(clock, monkeypatch):
+    monkeypatch.setattr(rate_controller, 'time', clock)
+    return clock
+
+@pytest.mark.parametrize('line, expected', [
+    ('ERROR: unable to download video data: HTTP Error 403: Forbidden', True),
+    ('ERROR: HTTP Error 429: Too Many Requests', True),
+    ('[download]  42.0% of 10.00MiB at 1.00MiB/s', False),
+    ('ERROR: HTTP Error 404: Not Found', False),
+])
+def test_is_throttle_signal(line, expected):
+    assert is_throttle_signal(line) is expected
+
+def test_unthrottled_controller_never_sleeps(clock):
+    controller = RateController()
+    controller.wait()
+    controller.wait()
+    assert clock.slept == []
+    assert controller.sleep_args() == []
+    assert not controller.state()['throttled']
+
+def test_backoff_doubles_from_the_minimum_up_to_the_cap(clock):
+    controller = RateController(max_delay=5)
+    delays = []
+    for _ in range(5):
+        controller.on_throttle()
+        delays.append(controller.delay)
+        clock.now += SIGNAL_WINDOW
+    assert delays == [1.0, 2.0, 4.0, 5.0, 5.0]
+    assert controller.state()['throttle_events'] == 5
+
+def test_signals_within_the_window_count_once(clock):
+    controller = RateController()
+    controller.on_throttle()
+    clock.now += SIGNAL_WINDOW / 2
+    controller.on_throttle()
+    assert controller.delay == 1.0 and controller.throttle_events == 1
+
+def test_success_recovers_step_by_step(clock):
+    controller = RateController(recovery_step=0.5)
+    controller.on_throttle()
+    controller.on_success()
+    assert controller.delay == 0.5
+    controller.on_success()
+    controller.on_success()
+    assert controller.delay == 0.0 and controller.successes == 3
+
+def test_wait_spaces_job_starts_by_the_delay(clock):
+    controller = RateController()
+    controller.on_throttle()
+    controller.wait()
+    controller.wait()
+    assert clock.slept == [1.0, 1.0]
+
+def test_sleep_args_follow_the_delay(clock):
+    controller = RateController(max_delay=3)
+    controller.on_throttle()
+    assert controller.sleep_args() == ['--sleep-requests', '1.0', '--sleep-interval', '1.0',
+                                       '--max-sleep-interval', '2.0']
+    controller.delay = 2.0
+    assert controller.sleep_args()[-1] == '3.0'
+
+def test_on_change_is_notified_and_errors_are_ignored(clock):
+    controller = RateController()
+    states = []
+    controller.on_change = states.append
+    controller.on_throttle()
+    controller.on_success()
+    assert [s['delay'] for s in states] == [1.0, 0.5]
+
+    controller.on_change = lambda state: 1 / 0
+    controller.on_success()
+    assert controller.delay == 0.0
@@ -0,0 +1,95 @@
+import pytest
+
+from conftest import FakeYtDlp, progress_line
+from download_core import build_download_args
+from resume_state import ResumeTracker, pinned_format
+from ytdlp_engine import ProgressEvent, YtDlpEngine
+
+SELECTOR = 'bv*[height<=1080]+ba/b[height<=1080]'
+
+class FakeJournal:
+    def __init__(self):
+        self.updates = []
+
+    def update(self, item_id, **fields):
+        self.updates.append((item_id, fields))
+
+def run_cli(fake_cli, lines, item, journal=None):
+    fake_cli.lines = lines
+    tracker = ResumeTracker(item, journal)
+    output = []
+    code = YtDlpEngine('subprocess').run(['--format', SELECTOR], 'https://youtu.be/x',
+                                         on_line=output.append, on_progress=tracker.update)
+    tracker.flush()
+    return code, output
+
+def test_merged_download_pins_both_streams(fake_cli):
+    item = {'id': 'a'}
+    code, output = run_cli(fake_cli, [
+        '[info] x: Downloading 1 format(s): 137+140',
+        progress_line('137', 500, 1000, 'v.f137.mp4'),
+        progress_line('140', 50, 100, 'v.f140.m4a'),
+    ], item)
+    assert code == 0
+    assert output == ['[info] x: Downloading 1 format(s): 137+140']
+    assert item['resume']['format_id'] == '137+140'
+    assert item['resume']['partial_files'] == ['v.f137.mp4.part', 'v.f140.m4a.part']
+    assert pinned_format(item, SELECTOR) == f'137+140/{SELECTOR}'
+
+def test_nothing_is_pinned_before_the_selection_is_known(fake_cli):
+    item = {'id': 'a'}
+    run_cli(fake_cli, [progress_line('140', 50, 100, 'v.f140.m4a')], item)
+    assert 'format_id' not in item['resume']
+    assert pinned_format(item, SELECTOR) == SELECTOR
+
+def test_per_stream_hook_events_name_only_their_stream():
+    # The in-process hook gets each stream's info dict, without requested_formats
+    event = ProgressEvent.from_dict({'status': 'downloading', 'downloaded_bytes': 1,
+                                     'info_dict': {'format_id': '140'}})
+    assert (event.format_id, event.selection) == ('140', None)
+    item = {'id': 'a', 'resume': {'format_id': '137+140'}}
+    ResumeTracker(item).update(event)
+    assert item['resume']['format_id'] == '137+140'
+
+def test_top_level_info_gives_the_selection():
+    info = {'format_id': '137+140', 'requested_formats': [{'format_id': '137'}, {'format_id': '140'}]}
+    event = ProgressEvent.from_dict({'status': 'downloading', 'info_dict': info})
+    assert event.selection == '137+140'
+
+def test_tracker_saves_to_the_journal_and_clears():
+    journal = FakeJournal()
+    item = {'id': 'a'}
+    tracker = ResumeTracker(item, journal, interval=3600)
+    tracker.update(ProgressEvent(downloaded_bytes=1, selection='22', tmpfilename='v.part'))
+    tracker.update(ProgressEvent(downloaded_bytes=2, selection='22', tmpfilename='v.part'))
+    assert len(journal.updates) == 1
+    tracker.flush()
+    assert journal.updates[-1] == ('a', {'resume': dict(item['resume'])})
+    assert item['resume']['downloaded_bytes'] == 2
+
+    tracker.clear()
+    assert 'resume' not in item
+    assert journal.updates[-1] == ('a', {'resume': None})
+
+@pytest.mark.parametrize('resume, expected', [
+    (None, SELECTOR),
+    ({'tmpfilename': 'v.part'}, SELECTOR),
+    ({'format_id': '22'}, f'22/{SELECTOR}'),
+])
+def test_pinned_format(resume, expected):
+    assert pinned_format({'resume': resume}, SELECTOR) == expected
+
+@pytest.mark.parametrize('resume, selected', [
+    (None, ['137', '140']),
+    ({'format_id': '136+140'}, ['136', '140']),
+    # A pinned format no longer offered falls back to the normal selection
+    ({'format_id': '999+140'}, ['137', '140']),
+])
+def test_pin_reaches_the_in_process_format_selector(fake_ytdlp, resume, selected):
+    engine = YtDlpEngine('inprocess')
+    item = {'id': 'a', 'url': 'https://youtu.be/x', 'quality': '1080', 'format': 'mp4', 'resume': resume}
+    # Selects with a pooled instance another run built first, as in a failover
+    engine.run(build_download_args(dict(item, resume=None), 'out'), item['url'])
+    assert engine.run(build_download_args(item, 'out'), item['url']) == 0
+    ydl, = FakeYtDlp.instances
+    assert ydl.downloads[-1][1] == selected
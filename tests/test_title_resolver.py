@@ -0,0 +1,90 @@
+import pytest
+
+import title_resolver
+from title_resolver import TitleResolver, resolve_item, resolved_fields
+
+URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+class Deferred:
+    """Stands in for the resolver's thread pool; run() resolves what was submitted"""
+
+    def __init__(self, **kwargs):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        self.calls.append((fn, args))
+
+    def run(self):
+        calls, self.calls = self.calls, []
+        for fn, args in calls:
+            fn(*args)
+
+@pytest.fixture
+def lookups(monkeypatch):
+    """Video info by URL; URLs left out fail to resolve"""
+    lookups = {}
+
+    def get_video_info(url):
+        if url == 'error':
+            raise RuntimeError('network down')
+        return lookups.get(url)
+    monkeypatch.setattr(title_resolver, 'get_video_info', get_video_info)
+    monkeypatch.setattr(title_resolver, 'ThreadPoolExecutor', Deferred)
+    return lookups
+
+def test_item_moves_from_pending_to_resolved(lookups):
+    lookups[URL] = {'id': 'dQw4w9WgXcQ', 'title': 'Song: "Live"', 'duration': 212, 'formats': []}
+    resolved = []
+    resolver = TitleResolver(on_resolved=resolved.append)
+    item = {'url': URL, 'title': URL}
+
+    item_id = resolver.submit(item)
+    assert item['id'] == item_id
+    assert item['title_status'] == resolver.state(item_id) == 'pending'
+    assert resolved == []
+
+    resolver._pool.run()
+    assert resolver.state(item_id) == 'resolved'
+    assert resolved == [item]
+    assert resolved_fields(item) == {'title': 'Song Live', 'title_status': 'resolved',
+                                     'video_id': 'dQw4w9WgXcQ', 'duration': 212, 'estimated_bytes': None}
+
+@pytest.mark.parametrize('url', ['missing', 'error'])
+def test_failed_lookup_marks_the_item_failed(lookups, url):
+    resolved = []
+    resolver = TitleResolver(on_resolved=resolved.append)
+    item = {'id': 'a', 'url': url, 'title': url}
+    resolver.submit(item)
+    resolver._pool.run()
+    assert (item['title'], item['title_status']) == ('Unknown Title', 'failed')
+    assert resolver.state('a') == 'failed'
+    assert resolved == [item]
+
+def test_one_failing_lookup_fails_only_its_item(lookups):
+    lookups.update({url: {'id': url, 'title': f'Title {url}', 'duration': 60, 'formats': []}
+                    for url in ('good', 'other')})
+    resolver = TitleResolver()
+    items = [{'url': url, 'title': url} for url in ('good', 'error', 'other')]
+    for item in items:
+        resolver.submit(item)
+    resolver._pool.run()
+    assert [item['title_status'] for item in items] == ['resolved', 'failed', 'resolved']
+    assert items[0]['title'] == 'Title good' and items[0]['video_id'] == 'good'
+    assert items[1]['title'] == 'Unknown Title'
+
+def test_callback_errors_do_not_escape(lookups):
+    def on_resolved(item):
+        raise RuntimeError('listener gone')
+    resolver = TitleResolver(on_resolved=on_resolved)
+    resolver.submit({'id': 'a', 'url': 'missing'})
+    resolver._pool.run()
+    assert resolver.state('a') == 'failed'
+
+def test_unknown_id_has_no_state(lookups):
+    assert TitleResolver().state('nope') is None
+
+def test_info_without_a_title_does_not_resolve(lookups):
+    lookups[URL] = {'id': 'dQw4w9WgXcQ'}
+    item = {'url': URL, 'title': URL}
+    assert resolve_item(item) is False
+    assert item['title'] == URL
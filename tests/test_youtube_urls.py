@@ -0,0 +1,73 @@
+import pytest
+
+from youtube_urls import CHANNEL, PLAYLIST, VIDEO, canonical_key, is_youtube_url, parse_url, video_id
+
+VIDEO_ID = 'dQw4w9WgXcQ'
+
+@pytest.mark.parametrize('url', [
+    f'https://www.youtube.com/watch?v={VIDEO_ID}',
+    f'http://youtube.com/watch?v={VIDEO_ID}',
+    f'youtube.com/watch?v={VIDEO_ID}',
+    f'https://youtu.be/{VIDEO_ID}?t=42',
+    f'https://m.youtube.com/watch?feature=share&v={VIDEO_ID}&t=10s',
+    f'https://music.youtube.com/watch?v={VIDEO_ID}',
+    f'https://www.youtube.com/shorts/{VIDEO_ID}',
+    f'https://www.youtube.com/live/{VIDEO_ID}',
+    f'https://www.youtube-nocookie.com/embed/{VIDEO_ID}?rel=0',
+    f'https://youtu.be/{VIDEO_ID}/',
+    f'https://youtu.be/{VIDEO_ID}/?si=abc',
+    f'https://www.youtube.com/shorts/{VIDEO_ID}/',
+])
+def test_video_urls(url):
+    parsed = parse_url(url)
+    assert parsed.kind == VIDEO
+    assert parsed.video_id == VIDEO_ID
+    assert parsed.canonical_url() == f'https://www.youtube.com/watch?v={VIDEO_ID}'
+
+def test_watch_url_in_playlist_keeps_both_ids():
+    parsed = parse_url(f'https://www.youtube.com/watch?v={VIDEO_ID}&list=PLabc123')
+    assert (parsed.kind, parsed.video_id, parsed.playlist_id) == (VIDEO, VIDEO_ID, 'PLabc123')
+
+def test_playlist_url():
+    parsed = parse_url('https://www.youtube.com/playlist?list=PLFgquLnL59alCl_2TQvOiD5Vgm1hCaGSI')
+    assert parsed.kind == PLAYLIST
+    assert parsed.key == 'PLFgquLnL59alCl_2TQvOiD5Vgm1hCaGSI'
+
+@pytest.mark.parametrize('url', [
+    'https://www.youtube.com/embed/videoseries?list=PLFgquLnL59alCl_2TQvOiD5Vgm1hCaGSI',
+    'https://www.youtube-nocookie.com/embed/videoseries?si=x&list=PLFgquLnL59alCl_2TQvOiD5Vgm1hCaGSI',
+])
+def test_embedded_playlist(url):
+    parsed = parse_url(url)
+    assert (parsed.kind, parsed.video_id, parsed.playlist_id) == (PLAYLIST, None, 'PLFgquLnL59alCl_2TQvOiD5Vgm1hCaGSI')
+    assert parsed.canonical_url() == 'https://www.youtube.com/playlist?list=PLFgquLnL59alCl_2TQvOiD5Vgm1hCaGSI'
+
+@pytest.mark.parametrize('url, channel, tab', [
+    ('https://www.youtube.com/@LinusTechTips', '@LinusTechTips', None),
+    ('https://www.youtube.com/@LinusTechTips/videos', '@LinusTechTips', '/videos'),
+    ('https://www.youtube.com/channel/UC123', 'channel/UC123', None),
+])
+def test_channel_urls(url, channel, tab):
+    parsed = parse_url(url)
+    assert (parsed.kind, parsed.channel, parsed.tab) == (CHANNEL, channel, tab)
+
+@pytest.mark.parametrize('url', [
+    f'https://example.com/watch?v={VIDEO_ID}',
+    f'https://notyoutube.com/watch?v={VIDEO_ID}',
+    'https://www.youtube.com.evil.com/watch?v=dQw4w9WgXcQ',
+    '',
+])
+def test_non_youtube_urls(url):
+    assert parse_url(url) is None
+    assert not is_youtube_url(url)
+
+def test_youtube_page_without_video_is_not_downloadable():
+    assert parse_url('https://www.youtube.com/').kind is None
+    assert not is_youtube_url('https://www.youtube.com/feed/trending')
+
+def test_short_video_id_is_rejected():
+    assert video_id('https://www.youtube.com/watch?v=tooshort') is None
+
+def test_canonical_key():
+    assert canonical_key(f'https://youtu.be/{VIDEO_ID}') == canonical_key(f'https://www.youtube.com/watch?v={VIDEO_ID}')
+    assert canonical_key('  https://example.com/x  ') == 'https://example.com/x'
@@ -0,0 +1,122 @@
+import json
+import os
+
+import pytest
+
+from conftest import FakeYtDlp
+from ytdlp_engine import (MAX_IDLE_INSTANCES, PROGRESS_ARGS, PROGRESS_PREFIX, EngineJob,
+                          YtDlpEngine, _stable_args, parse_progress_line, parse_selection_line)
+
+def test_progress_template_names_only_the_stream():
+    assert PROGRESS_ARGS[-1] == f'download:{PROGRESS_PREFIX}%(progress)j\t%(info.format_id)s'
+
+def test_parse_progress_line():
+    progress = {'status': 'downloading', 'downloaded_bytes': 10, 'total_bytes_estimate': 100,
+                'fragment_index': 2, 'fragment_count': 20, 'tmpfilename': 'v.f137.mp4.part'}
+    event = parse_progress_line(f"{PROGRESS_PREFIX}{json.dumps(progress)}\t137")
+    assert (event.downloaded_bytes, event.total_bytes, event.format_id) == (10, 100, '137')
+    assert event.selection is None
+    assert event.percent == 10.0
+
+def test_parse_progress_line_ignores_other_output():
+    assert parse_progress_line('[download] Destination: v.mp4') is None
+    assert parse_progress_line(f'{PROGRESS_PREFIX}not json\t137') is None
+    assert parse_progress_line(f'{PROGRESS_PREFIX}{{"downloaded_bytes": 1}}\tNA').format_id is None
+
+def test_parse_selection_line():
+    assert parse_selection_line('[info] dQw4w9WgXcQ: Downloading 1 format(s): 137+140') == '137+140'
+    assert parse_selection_line('[info] dQw4w9WgXcQ: Downloading 1 format(s): 22\n') == '22'
+    assert parse_selection_line('[info] dQw4w9WgXcQ: Downloading subtitles: en') is None
+    assert parse_selection_line('[download] 137+140') is None
+
+def test_run_from_info_skips_extraction(fake_cli):
+    info = {'id': 'x', 'requested_formats': [{'format_id': '137'}, {'format_id': '140'}]}
+    assert YtDlpEngine('subprocess').run(['--format', '137'], 'https://youtu.be/x', info=info) == 0
+    command = fake_cli.commands[0]
+    assert 'https://youtu.be/x' not in command
+    info_file = command[command.index('--load-info-json') + 1]
+    assert not os.path.exists(info_file)
+
+def test_run_without_info_passes_the_url(fake_cli):
+    YtDlpEngine('subprocess').run(['--format', '22'], 'https://youtu.be/x')
+    assert fake_cli.commands[0][-1] == 'https://youtu.be/x'
+    assert '--load-info-json' not in fake_cli.commands[0]
+
+@pytest.fixture
+def engine(fake_ytdlp):
+    return YtDlpEngine('inprocess')
+
+def idle_count(engine):
+    return sum(len(idle) for idle in engine._idle.values())
+
+def test_stable_args_drop_per_run_options():
+    args = ['--no-playlist', '-f', '140', '--limit-rate', '1M', '-N', '4', '--extractor-args', 'youtube:x']
+    assert _stable_args(args) == ['--no-playlist', '--extractor-args', 'youtube:x']
+
+def test_instance_is_reused_with_each_runs_format_and_params(engine):
+    lines, events = [], []
+    assert engine.run(['--no-playlist', '-f', '137+140', '-r', '1M'], 'u1',
+                      on_line=lines.append, on_progress=events.append) == 0
+    assert engine.run(['--no-playlist', '-f', 'bv*[height<=720]+ba/b[height<=720]'], 'u2') == 0
+    assert engine.run(['--no-playlist'], 'u3') == 0
+
+    ydl, = FakeYtDlp.instances
+    (_, first, first_params), (_, second, second_params), (_, third, _) = ydl.downloads
+    assert (first, second, third) == (['137', '140'], ['136', '140'], ['313', '140'])
+    assert (first_params['ratelimit'], second_params['ratelimit']) == ('1M', None)
+    assert first_params['no_playlist'] and second_params['no_playlist']
+    assert lines == ['[info] u1: Downloading 1 format(s): 137+140']
+    assert [(e.format_id, e.status, e.selection) for e in events] == [
+        ('137', 'downloading', '137+140'), ('137', 'finished', '137+140'),
+        ('140', 'downloading', '137+140'), ('140', 'finished', '137+140')]
+
+def test_extraction_selects_with_the_given_format(engine):
+    assert engine.extract_info('u', ['-f', '136+140'])['format_id'] == '136+140'
+    assert engine.extract_info('u', ['-f', 'bv*[height<=1080]+ba/b[height<=1080]'])['format_id'] == '137+140'
+    assert len(FakeYtDlp.instances) == 1
+
+def test_unparsable_format_falls_back_to_the_cli(engine, fake_cli):
+    lines = []
+    assert engine.run(['-f', 'bv*[height<=720'], 'u', on_line=lines.append) == 0
+    assert lines[0].startswith('⚠️ In-process engine unavailable')
+    assert fake_cli.commands[0][:3] == ['yt-dlp', '-f', 'bv*[height<=720']
+    assert idle_count(engine) == 1
+
+def test_released_instance_forgets_the_callbacks(engine):
+    events = []
+    engine.run(['-f', '140'], 'u1', on_progress=events.append)
+    pooled, = engine._idle[()]
+    assert (pooled.on_line, pooled.on_progress, pooled.job, pooled.throttle) == (None, None, None, None)
+    engine.run(['-f', '140'], 'u2')
+    assert len(events) == 2
+
+def test_different_stable_args_get_their_own_instance(engine):
+    engine.run(['--no-playlist', '-f', '140'], 'u1')
+    engine.run(['--yes-playlist', '-f', '140'], 'u2')
+    assert len(FakeYtDlp.instances) == 2
+    assert set(engine._idle) == {('--no-playlist',), ('--yes-playlist',)}
+
+def test_concurrent_runs_use_separate_instances(engine):
+    first = engine._acquire(['-f', '140'])
+    second = engine._acquire(['-f', '136'])
+    assert first[1] is not second[1]
+    engine._release(*first)
+    engine._release(*second)
+    assert idle_count(engine) == 2
+    engine.run(['-f', '140'], 'u')
+    assert len(FakeYtDlp.instances) == 2
+
+def test_least_recently_used_idle_instances_are_evicted(engine):
+    acquired = [engine._acquire([f'--flag-{n}']) for n in range(MAX_IDLE_INSTANCES + 2)]
+    for key, pooled in acquired:
+        engine._release(key, pooled)
+    assert idle_count(engine) == MAX_IDLE_INSTANCES
+    assert [pooled.ydl.closed for key, pooled in acquired] == [True, True] + [False] * MAX_IDLE_INSTANCES
+    assert list(engine._idle) == [key for key, pooled in acquired[2:]]
+
+def test_cancelled_instance_is_not_reused(engine):
+    job = EngineJob()
+    job.cancel()
+    assert engine.run(['-f', '140'], 'u', job=job) == -1
+    assert FakeYtDlp.instances[0].closed
+    assert idle_count(engine) == 0
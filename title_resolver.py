@@ -0,0 +1,80 @@
+"""
+Background Title Resolver
+Resolves queue item titles on a worker pool so enqueueing never waits on yt-dlp
+"""
+
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from metadata_cache import clean_title, expected_size, get_video_info
+
+DEFAULT_RESOLVER_WORKERS = 4
+
+# Item fields filled in by resolution
+RESOLVED_FIELDS = ('title', 'title_status', 'video_id', 'duration', 'estimated_bytes')
+
+def resolved_fields(item):
+    """Return the resolution results of ``item`` as a dict"""
+    return {field: item.get(field) for field in RESOLVED_FIELDS}
+
+def new_item_id():
+    """Return a new queue item / job ID"""
+    return uuid.uuid4().hex[:12]
+
+def resolve_item(item):
+    """Fill in ``item``'s title, video ID, duration and expected size; False if the lookup failed"""
+    try:
+        info = get_video_info(item['url'])
+    except Exception:
+        return False
+    if not info or not info.get('title'):
+        return False
+    item['title'] = clean_title(info['title'])
+    item['video_id'] = info.get('id')
+    item['duration'] = info.get('duration')
+    item['estimated_bytes'] = expected_size(info, item.get('quality', 'best'), item.get('format', 'mp4'),
+                                            item.get('audio_bitrate'))
+    return True
+
+class TitleResolver:
+    """Fill in ``title`` (and the expected size) for queue items in the background.
+
+    Items are marked ``title_status: 'pending'`` on submit and move to
+    ``'resolved'`` or ``'failed'``; ``on_resolved(item)`` is then called from
+    the worker thread.
+    """
+
+    def __init__(self, on_resolved=None, max_workers=DEFAULT_RESOLVER_WORKERS):
+        self.on_resolved = on_resolved
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='title-resolver')
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def submit(self, item):
+        """Queue ``item`` for title resolution and return its ID"""
+        item.setdefault('id', new_item_id())
+        item['title_status'] = 'pending'
+        with self._lock:
+            self._states[item['id']] = 'pending'
+        self._pool.submit(self._resolve, item)
+        return item['id']
+
+    def state(self, item_id):
+        """Return 'pending', 'resolved', 'failed', or None for unknown IDs"""
+        with self._lock:
+            return self._states.get(item_id)
+
+    def _resolve(self, item):
+        if resolve_item(item):
+            item['title_status'] = 'resolved'
+        else:
+            item['title'] = "Unknown Title"
+            item['title_status'] = 'failed'
+        with self._lock:
+            self._states[item['id']] = item['title_status']
+        if self.on_resolved:
+            try:
+                self.on_resolved(item)
+            except Exception:
+                pass
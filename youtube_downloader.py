@@ -2,19 +2,27 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import threading
 import os
-import subprocess
 import sys
 from pathlib import Path
+from download_core import INSTALL_HINT, DownloadRunner, check_ytdlp, download_item, run_standalone, ytdlp_available
+from download_archive import DownloadArchive, describe as describe_archived
+from log_pipeline import LogPipeline
+from youtube_urls import is_youtube_url
+from ytdlp_engine import get_engine
 
 class YouTubeDownloader:
     def __init__(self, root):
         self.root = root
+        self.log_pipeline = LogPipeline(self.root)
         self.root.title("YouTube 4K Video Downloader")
         self.root.geometry("800x600")
         self.root.configure(bg='#2b2b2b')
         
         # Set download path first
         self.download_path = str(Path.home() / "Downloads")
+        self.engine = get_engine()
+        self.runner = DownloadRunner(self.engine, log=self.log_message)
+        self.download_archive = DownloadArchive()
         
         # Style configuration
         style = ttk.Style()
@@ -58,12 +66,12 @@ class YouTubeDownloader:
         self.quality_var = tk.StringVar(value="best")
         quality_options = [
             ("Best Quality (4K/8K)", "best"),
-            ("4K (2160p)", "2160p"),
-            ("2K (1440p)", "1440p"),
-            ("1080p", "1080p"),
-            ("720p", "720p"),
-            ("480p", "480p"),
-            ("360p", "360p")
+            ("4K (2160p)", "2160"),
+            ("2K (1440p)", "1440"),
+            ("1080p", "1080"),
+            ("720p", "720"),
+            ("480p", "480"),
+            ("360p", "360")
         ]
         
         for i, (text, value) in enumerate(quality_options):
@@ -127,6 +135,7 @@ class YouTubeDownloader:
         self.log_text.configure(yscrollcommand=log_scrollbar.set)
         
         self.log_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.log_pipeline.attach(self.log_text)
         log_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
     def browse_folder(self):
@@ -136,9 +145,7 @@ class YouTubeDownloader:
             self.download_path = folder
     
     def log_message(self, message):
-        self.log_text.insert(tk.END, f"{message}\n")
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        self.log_pipeline.write(message)
     
     def start_download(self):
         url = self.url_var.get().strip()
@@ -146,7 +153,7 @@ class YouTubeDownloader:
             messagebox.showerror("Error", "Please enter a YouTube URL")
             return
         
-        if not url.startswith(('https://www.youtube.com/', 'https://youtu.be/', 'https://youtube.com/')):
+        if not is_youtube_url(url):
             messagebox.showerror("Error", "Please enter a valid YouTube URL")
             return
         
@@ -179,89 +186,41 @@ class YouTubeDownloader:
             self.log_message("")
             
             # Check if yt-dlp is available
-            try:
-                result = subprocess.run(['yt-dlp', '--version'], capture_output=True, text=True, timeout=10)
-                if result.returncode != 0:
-                    raise FileNotFoundError("yt-dlp not found")
-                self.log_message(f"✅ yt-dlp version: {result.stdout.strip()}")
-            except Exception as e:
-                self.log_message(f"❌ yt-dlp check failed: {str(e)}")
-                self.log_message("💡 Try running: python -m pip install yt-dlp")
-                raise
-            
-            # Build yt-dlp command
-            cmd = ['yt-dlp']
-            
-            # Format selection
-            if quality == 'best':
-                cmd.extend(['--format', 'best'])
-            else:
-                cmd.extend(['--format', f'best[height<={quality}]'])
-            
-            # Output template
-            cmd.extend(['--output', f'{download_path}/%(title)s.%(ext)s'])
-            
-            # Additional options
-            cmd.extend([
-                '--no-playlist',
-                '--extract-flat', 'false',
-                '--verbose'  # Add verbose output for better logging
-            ])
-            
-            if format_type != 'best':
-                cmd.extend(['--merge-output-format', format_type])
-            
-            cmd.append(url)
+            check_ytdlp(self.log_message, self.engine)
             
-            self.log_message("🔧 Command: " + ' '.join(cmd))
-            self.log_message("")
             self.log_message("📥 Starting download...")
             self.log_message("-" * 30)
             
-            # Execute download
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                cwd=download_path,
-                bufsize=1,
-                shell=False
-            )
-            
-            # Read output in real-time
             output_lines = []
+            
+            def on_line(line):
+                output_lines.append(line)
+                if '[download]' not in line and ('ERROR' in line.upper() or 'FAILED' in line.upper()):
+                    self.log_message(f"⚠️  WARNING: {line}")
+            
+            def on_progress(event):
+                if event.percent is not None:
+                    self.progress_var.set(event.percent)
+                self.status_var.set(f"Downloading... {event.describe()}")
+            
+            item = download_item(url, quality, format_type)
+            # Execute download, streaming output and progress as it arrives; strategy
+            # failover, transfer tuning, pacing and bandwidth limits are shared by every front end
             try:
-                for line in process.stdout:
-                    line = line.strip()
-                    if line:
-                        output_lines.append(line)
-                        self.log_message(line)
-                        
-                        # Update progress if we can parse it
-                        if '[download]' in line and '%' in line:
-                            try:
-                                # Extract percentage from lines like "[download] 45.2% of 123.45MiB at 1.23MiB/s ETA 00:12"
-                                parts = line.split('%')[0].split()
-                                if parts:
-                                    percent = float(parts[-1])
-                                    self.progress_var.set(percent)
-                                    self.status_var.set(f"Downloading... {percent:.1f}%")
-                            except:
-                                pass
-                        elif 'ERROR' in line.upper() or 'FAILED' in line.upper():
-                            self.log_message(f"⚠️  WARNING: {line}")
-                
-                # Wait for process to complete
-                return_code = process.wait()
-                
+                success = run_standalone(self.runner, item, download_path, self.download_archive,
+                                         on_progress=on_progress, on_line=on_line,
+                                         confirm=self.confirm_download_again)
             except Exception as e:
                 self.log_message(f"❌ Error reading process output: {str(e)}")
-                return_code = -1
+                success = False
             
             self.log_message("-" * 30)
             
-            if return_code == 0:
+            if item.get('archived'):
+                self.status_var.set("⏭️ Already downloaded")
+                return
+            
+            if success:
                 self.status_var.set("✅ Download completed successfully!")
                 self.progress_var.set(100)
                 self.log_message("🎉 SUCCESS: Video downloaded successfully!")
@@ -270,7 +229,6 @@ class YouTubeDownloader:
             else:
                 self.status_var.set("❌ Download failed!")
                 self.log_message("💥 FAILED: Download did not complete successfully")
-                self.log_message(f"🔍 Return code: {return_code}")
                 
                 # Show last few lines of output for debugging
                 if output_lines:
@@ -279,12 +237,12 @@ class YouTubeDownloader:
                         self.log_message(f"   {line}")
                 
                 messagebox.showerror("Download Failed", 
-                    f"Download failed with return code {return_code}.\n"
-                    f"Check the log for details.\n"
-                    f"Common issues:\n"
-                    f"• Invalid URL\n"
-                    f"• Video is private/restricted\n"
-                    f"• Network connection issues")
+                    "Download failed with every client.\n"
+                    "Check the log for details.\n"
+                    "Common issues:\n"
+                    "• Invalid URL\n"
+                    "• Video is private/restricted\n"
+                    "• Network connection issues")
                 
         except FileNotFoundError as e:
             self.log_message(f"❌ yt-dlp not found: {str(e)}")
@@ -293,10 +251,6 @@ class YouTubeDownloader:
             messagebox.showerror("yt-dlp Not Found", 
                 "yt-dlp is not installed or not in PATH.\n"
                 "Please run: python -m pip install yt-dlp")
-        except subprocess.TimeoutExpired:
-            self.log_message("⏰ Download timed out")
-            self.status_var.set("⏰ Download timed out!")
-            messagebox.showerror("Timeout", "Download timed out. Please try again.")
         except Exception as e:
             self.log_message(f"💥 Unexpected error: {str(e)}")
             self.status_var.set("💥 Download failed!")
@@ -304,13 +258,17 @@ class YouTubeDownloader:
         finally:
             self.download_btn.config(state='normal')
 
+    def confirm_download_again(self, item, archived):
+        """Ask whether to download a video the download archive already has"""
+        return messagebox.askyesno("Already Downloaded",
+                                   f"{item['title'] or item['url']} was already {describe_archived(archived)} "
+                                   f"in this format and quality.\n\nDownload it again?")
+
 def main():
     # Check if yt-dlp is installed
-    try:
-        subprocess.run(['yt-dlp', '--version'], capture_output=True, check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError):
+    if not ytdlp_available():
         print("yt-dlp is not installed. Please install it first:")
-        print("pip install yt-dlp")
+        print(INSTALL_HINT)
         return
     
     root = tk.Tk()
@@ -1,18 +1,21 @@
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import messagebox, filedialog
-import threading
 import os
-import subprocess
 import sys
-import json
-from pathlib import Path
-from datetime import datetime
-import time
-import re
 import requests
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from bulk_import import parse_urls, read_url_file
+from download_core import INSTALL_HINT, ytdlp_available
+from ytdlp_engine import format_bytes
+from history_store import HISTORY_PAGE_SIZE
+from download_archive import describe as describe_archived
+from download_daemon import DownloadDaemon, load_config, save_config
+from daemon_client import DAEMON_ERRORS, DaemonClient, daemon_running
+from queue_view import QueueView
+from log_pipeline import LogPipeline
+from queue_policy import POLICY_LABELS
+from playlist_expander import is_collection_url
+from youtube_urls import is_youtube_url
 
 # Set appearance mode and color theme
 ctk.set_appearance_mode("dark")
@@ -21,59 +24,53 @@ ctk.set_default_color_theme("blue")
 class YouTubeDownloaderModern:
     def __init__(self, root):
         self.root = root
+        self.log_pipeline = LogPipeline(self.root)
         self.root.title("🎬 YouTube 4K Video Downloader")
         self.root.geometry("1800x1000")
         self.root.minsize(1600, 900)
         
         # Set download path
-        self.download_path = str(Path.home() / "Downloads")
-        self.history_file = "download_history.json"
         self.config_file = "config.json"
-        self.download_history = self.load_history()
         self.config = self.load_config()
-        
-        self.download_process = None
-        self.is_downloading = False
-        self.download_queue = []
-        self.current_download = None
-        self.queue_thread = None
-        self.queue_file = "download_queue.json"
+        self.download_path = self.config['default_path']
+        self.was_downloading = False
+        
+        # Attach to a running download daemon, or run the queue in this process
+        callbacks = dict(log=self.log_message, on_item=self.on_item_changed, on_queue=self.update_queue_display,
+                         on_status=self.on_queue_status, on_history=self.on_history_changed)
+        self.remote = daemon_running()
+        if self.remote:
+            self.daemon = DaemonClient(token=self.config.get('api_token'), **callbacks)
+        else:
+            self.daemon = DownloadDaemon(self.config, self.config_file, **callbacks)
         
         self.setup_ui()
         self.setup_history_window()
+        self.daemon.open()
+        self.update_queue_display()
         
-        # Start Flask API server in background (after UI is initialized)
-        self.start_api_server()
-        
-        # Periodically sync queue from file (for external additions)
-        self.sync_queue_from_file()
-        
+        if self.remote:
+            settings = self.daemon.settings()
+            self.config.update(settings)
+            self.download_path = settings['default_path']
+            self.path_var.set(self.download_path)
+            self.auto_download_var.set(bool(settings['auto_download']))
+            self.policy_var.set(POLICY_LABELS[settings['queue_policy']])
+            self.log_message(f"🔌 Attached to the download daemon at {self.daemon.api_url}; "
+                             f"downloads keep running when this window is closed")
+        else:
+            # Serve the API for the browser extension and other windows (after UI is initialized)
+            self.daemon.serve(background=True)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+    
     def load_config(self):
         """Load configuration from file"""
-        default_config = {
-            'auto_download': False,
-            'default_quality': 'best',
-            'default_format': 'mp4',
-            'default_path': str(Path.home() / "Downloads"),
-            'audio_bitrate': '192k'
-        }
-        try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r') as f:
-                    config = json.load(f)
-                    return {**default_config, **config}
-        except:
-            pass
-        return default_config
+        return load_config(self.config_file)
     
     def save_config(self):
         """Save configuration to file"""
-        try:
-            with open(self.config_file, 'w') as f:
-                json.dump(self.config, f, indent=2)
-        except:
-            pass
-        
+        save_config(self.config, self.config_file)
+    
     def setup_ui(self):
         """Setup the modern UI"""
         # Main container
@@ -212,7 +209,7 @@ class YouTubeDownloaderModern:
         path_frame = ctk.CTkFrame(parent, fg_color="transparent")
         path_frame.pack(fill="x", padx=20, pady=(0, 20))
         
-        self.path_var = tk.StringVar(value=self.config.get('default_path', self.download_path))
+        self.path_var = tk.StringVar(value=self.download_path)
         self.path_entry = ctk.CTkEntry(path_frame, textvariable=self.path_var, 
                                        height=40, font=ctk.CTkFont(size=12))
         self.path_entry.pack(side="left", fill="x", expand=True, padx=(0, 10))
@@ -236,6 +233,22 @@ class YouTubeDownloaderModern:
                                              fg_color="#3b82f6", hover_color="#2563eb")
         self.download_now_btn.pack(fill="x", pady=(0, 10))
         
+        # Bulk import
+        bulk_frame = ctk.CTkFrame(button_frame, fg_color="transparent")
+        bulk_frame.pack(fill="x", pady=(0, 10))
+        
+        import_btn = ctk.CTkButton(bulk_frame, text="📄 Import File", 
+                                   command=self.import_url_file,
+                                   height=36, font=ctk.CTkFont(size=12),
+                                   fg_color="#6b7280", hover_color="#4b5563")
+        import_btn.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        
+        paste_btn = ctk.CTkButton(bulk_frame, text="📋 Paste URLs", 
+                                  command=self.show_paste_dialog,
+                                  height=36, font=ctk.CTkFont(size=12),
+                                  fg_color="#6b7280", hover_color="#4b5563")
+        paste_btn.pack(side="left", fill="x", expand=True, padx=(5, 0))
+        
         # Auto-download checkbox
         self.auto_download_var = tk.BooleanVar(value=self.config.get('auto_download', False))
         self.auto_download_checkbox = ctk.CTkCheckBox(button_frame, 
@@ -253,6 +266,9 @@ class YouTubeDownloaderModern:
         self.progress_label = ctk.CTkLabel(parent, text="", font=ctk.CTkFont(size=11))
         self.progress_label.pack(anchor="w", padx=20)
         
+        self.rate_label = ctk.CTkLabel(parent, text=self.daemon.describe_rate(), font=ctk.CTkFont(size=11))
+        self.rate_label.pack(anchor="w", padx=20)
+        
     def toggle_audio_quality(self, *args):
         """Show/hide audio quality selector"""
         format_val = self.format_var.get()
@@ -276,18 +292,21 @@ class YouTubeDownloaderModern:
         queue_frame.pack(fill="both", expand=True, padx=20, pady=(0, 20))
         
         # Treeview
-        columns = ('Status', 'Title', 'Quality', 'Format')
+        columns = ('Status', 'Title', 'Quality', 'Format', 'Progress')
         self.queue_tree = tk.ttk.Treeview(queue_frame, columns=columns, show='headings', height=15)
         
         self.queue_tree.heading('Status', text='📊 Status')
         self.queue_tree.heading('Title', text='📺 Title')
         self.queue_tree.heading('Quality', text='🎯 Quality')
         self.queue_tree.heading('Format', text='📁 Format')
+        self.queue_tree.heading('Progress', text='⏬ Progress')
         
         self.queue_tree.column('Status', width=100)
         self.queue_tree.column('Title', width=250)
         self.queue_tree.column('Quality', width=80)
         self.queue_tree.column('Format', width=100)
+        self.queue_tree.column('Progress', width=80)
+        self.queue_view = QueueView(self.root, self.queue_tree, lambda: self.daemon.queue)
         
         scrollbar = tk.ttk.Scrollbar(queue_frame, orient="vertical", command=self.queue_tree.yview)
         self.queue_tree.configure(yscrollcommand=scrollbar.set)
@@ -295,10 +314,33 @@ class YouTubeDownloaderModern:
         self.queue_tree.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         
+        # Drag rows to reorder; right-click for job control and priority
+        self.drag_state = {'item': None}
+        self.queue_tree.bind('<ButtonPress-1>', self.on_queue_drag_start)
+        self.queue_tree.bind('<B1-Motion>', self.on_queue_drag_motion)
+        self.queue_tree.bind('<ButtonRelease-1>', self.on_queue_drag_end)
+        self.queue_menu = tk.Menu(self.root, tearoff=0)
+        self.queue_menu.add_command(label="⏸️ Pause", command=lambda: self.control_selected('pause'))
+        self.queue_menu.add_command(label="▶️ Resume", command=lambda: self.control_selected('resume'))
+        self.queue_menu.add_command(label="⏹️ Cancel", command=lambda: self.control_selected('cancel'))
+        self.queue_menu.add_separator()
+        self.queue_menu.add_command(label="⬆️ Raise priority", command=lambda: self.change_priority(1))
+        self.queue_menu.add_command(label="⬇️ Lower priority", command=lambda: self.change_priority(-1))
+        self.queue_menu.add_command(label="↩️ Reset priority", command=lambda: self.change_priority(None))
+        self.queue_tree.bind('<Button-3>', self.show_queue_menu)
+        
         # Queue controls
         controls_frame = ctk.CTkFrame(parent, fg_color="transparent")
         controls_frame.pack(fill="x", padx=20, pady=(0, 20))
         
+        policy_frame = ctk.CTkFrame(parent, fg_color="transparent")
+        policy_frame.pack(fill="x", padx=20, pady=(0, 20))
+        ctk.CTkLabel(policy_frame, text="🔀 Download order:", font=ctk.CTkFont(size=12)).pack(side="left", padx=(0, 10))
+        self.policy_var = tk.StringVar(value=POLICY_LABELS[self.config['queue_policy']])
+        ctk.CTkComboBox(policy_frame, values=list(POLICY_LABELS.values()), variable=self.policy_var,
+                        command=self.set_queue_policy, state="readonly",
+                        font=ctk.CTkFont(size=12)).pack(side="left")
+        
         self.start_queue_btn = ctk.CTkButton(controls_frame, text="▶️ Start Queue", 
                                              command=self.start_queue,
                                              font=ctk.CTkFont(size=12))
@@ -308,8 +350,79 @@ class YouTubeDownloaderModern:
                                  command=self.clear_queue,
                                  font=ctk.CTkFont(size=12),
                                  fg_color="#ef4444", hover_color="#dc2626")
-        clear_btn.pack(side="left")
+        clear_btn.pack(side="left", padx=(0, 10))
         
+        for text, action in (("⏸️ Pause", 'pause'), ("▶️ Resume", 'resume'), ("⏹️ Cancel", 'cancel')):
+            ctk.CTkButton(controls_frame, text=text, width=90,
+                          command=lambda action=action: self.control_selected(action),
+                          font=ctk.CTkFont(size=12)).pack(side="left", padx=(0, 10))
+        
+    def set_queue_policy(self, label):
+        """Switch the order in which queued items are started"""
+        name = next(key for key, text in POLICY_LABELS.items() if text == label)
+        self.config['queue_policy'] = name
+        try:
+            self.daemon.update_settings(queue_policy=name)
+        except DAEMON_ERRORS as e:
+            self.show_daemon_error("change the download order", e)
+    
+    def on_queue_drag_start(self, event):
+        self.drag_state['item'] = self.queue_tree.identify_row(event.y) or None
+    
+    def on_queue_drag_motion(self, event):
+        row = self.drag_state['item']
+        target = self.queue_tree.identify_row(event.y)
+        if row and target and target != row:
+            self.queue_tree.move(row, '', self.queue_tree.index(target))
+    
+    def on_queue_drag_end(self, event):
+        """Store the order the rows were dragged into"""
+        row, self.drag_state['item'] = self.drag_state['item'], None
+        if not row:
+            return
+        rows = self.queue_tree.get_children()
+        if [item['id'] for item in self.daemon.queue] == list(rows):
+            return
+        index = rows.index(row)
+        try:
+            self.daemon.move(row, rows[index + 1] if index + 1 < len(rows) else None)
+        except DAEMON_ERRORS as e:
+            # Put the rows back in the queue's order
+            self.queue_view.refresh()
+            self.show_daemon_error("move the item", e)
+            return
+        if self.config['queue_policy'] != 'fifo':
+            self.log_message(f"🔀 Moved; the {POLICY_LABELS[self.config['queue_policy']].lower()} order "
+                             f"still comes first, queue order only breaks ties")
+    
+    def show_queue_menu(self, event):
+        row = self.queue_tree.identify_row(event.y)
+        if row:
+            if row not in self.queue_tree.selection():
+                self.queue_tree.selection_set(row)
+            self.queue_menu.tk_popup(event.x_root, event.y_root)
+    
+    def control_selected(self, action):
+        """Pause, resume or cancel the selected queue items"""
+        selected = set(self.queue_tree.selection())
+        if not selected:
+            messagebox.showinfo("Queue", "Select one or more queue items first")
+            return
+        try:
+            for item in [item for item in self.daemon.queue if item['id'] in selected]:
+                self.daemon.control(item['id'], action)
+        except DAEMON_ERRORS as e:
+            self.show_daemon_error(f"{action} the download", e)
+    
+    def change_priority(self, step):
+        """Raise or lower the selected items' priority by ``step``; None resets it"""
+        selected = set(self.queue_tree.selection())
+        try:
+            for item in [item for item in self.daemon.queue if item['id'] in selected]:
+                self.daemon.update_item(item['id'], priority=0 if step is None else (item.get('priority') or 0) + step)
+        except DAEMON_ERRORS as e:
+            self.show_daemon_error("change the priority", e)
+    
     def create_history_panel(self, parent):
         """Create history and log panel"""
         title = ctk.CTkLabel(parent, text="📚 History & Logs", 
@@ -350,6 +463,7 @@ class YouTubeDownloaderModern:
         
         self.log_text = ctk.CTkTextbox(log_frame, height=150, font=ctk.CTkFont(size=11))
         self.log_text.pack(fill="both", expand=True)
+        self.log_pipeline.attach(self.log_text)
         
     def setup_history_window(self):
         """Setup history window"""
@@ -362,7 +476,11 @@ class YouTubeDownloaderModern:
             self.url_status_label.configure(text="")
             return
         
-        if url.startswith(('https://www.youtube.com/', 'https://youtu.be/', 'https://youtube.com/')):
+        if is_youtube_url(url):
+            if is_collection_url(url):
+                self.url_status_label.configure(text="📃 Playlist / channel: every video will be queued",
+                                                text_color="#22c55e")
+                return
             self.url_status_label.configure(text="✅ Valid YouTube URL", text_color="#22c55e")
         else:
             self.url_status_label.configure(text="❌ Invalid URL format", text_color="#ef4444")
@@ -372,329 +490,176 @@ class YouTubeDownloaderModern:
         folder = filedialog.askdirectory(initialdir=self.download_path)
         if folder:
             self.path_var.set(folder)
+            self.sync_download_path()
+    
+    def sync_download_path(self):
+        """Send the download folder in the path field to the daemon; False if it was refused"""
+        folder = self.path_var.get().strip()
+        if folder and folder != self.download_path:
+            try:
+                self.daemon.update_settings(default_path=folder)
+            except DAEMON_ERRORS as e:
+                # An attached daemon only accepts folders inside its download root
+                messagebox.showerror("Download Folder", str(e))
+                self.path_var.set(self.download_path)
+                return False
             self.download_path = folder
             self.config['default_path'] = folder
-            self.save_config()
+        return True
     
     def toggle_auto_download(self):
         """Toggle auto-download setting"""
         self.config['auto_download'] = self.auto_download_var.get()
-        self.save_config()
+        try:
+            self.daemon.update_settings(auto_download=self.config['auto_download'])
+        except DAEMON_ERRORS as e:
+            self.show_daemon_error("change the auto-download setting", e)
+    
+    def show_daemon_error(self, action, error):
+        """Report a daemon call that failed, e.g. because an attached daemon stopped"""
+        messagebox.showerror("Download Daemon", f"Could not {action}:\n{error}")
     
     def log_message(self, message):
         """Add message to log"""
-        if hasattr(self, 'log_text') and self.log_text:
-            self.log_text.insert("end", f"{message}\n")
-            self.log_text.see("end")
-            self.root.update_idletasks()
+        self.log_pipeline.write(message)
     
     def update_status(self, message, color="#22c55e"):
         """Update status indicator"""
         self.status_label.configure(text=f"● {message}", text_color=color)
     
-    def get_video_title(self, url):
-        """Get video title from URL"""
-        try:
-            cmd = ['yt-dlp', '--get-title', '--no-playlist', url]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            if result.returncode == 0:
-                title = result.stdout.strip()
-                title = re.sub(r'[^\w\s\-\.]', '', title)[:50]
-                return title if title else "Unknown Title"
-        except:
-            pass
-        return "Unknown Title"
-    
-    def add_to_queue(self):
-        """Add video to download queue"""
+    def add_to_queue(self, start=False):
+        """Add a video, or every video of a playlist / channel, to the download queue"""
         url = self.url_var.get().strip()
         if not url:
             messagebox.showerror("Error", "Please enter a YouTube URL")
             return
         
-        if not url.startswith(('https://www.youtube.com/', 'https://youtu.be/', 'https://youtube.com/')):
+        if not is_youtube_url(url):
             messagebox.showerror("Error", "Please enter a valid YouTube URL")
             return
         
-        # Get video title
-        self.log_message(f"🔍 Getting video information...")
-        title = self.get_video_title(url)
+        if not self.sync_download_path():
+            return
         
         # Get format
         format_val = self.format_var.get()
         format_type = format_val.split(' ')[0].lower()
+        audio_bitrate = self.audio_quality_var.get() if 'audio' in format_val.lower() else None
         
-        # Add to queue
-        queue_item = {
-            'url': url,
-            'title': title,
-            'quality': self.quality_var.get(),
-            'format': format_type,
-            'audio_bitrate': self.audio_quality_var.get() if 'audio' in format_val.lower() else None,
-            'status': 'Queued',
-            'added_time': datetime.now().strftime("%H:%M:%S")
-        }
-        
-        self.download_queue.append(queue_item)
-        self.save_queue_to_file()
-        self.update_queue_display()
+        try:
+            result = self.daemon.add(url, self.quality_var.get(), format_type, audio_bitrate, start=start)
+            if result['status'] == 'archived':
+                archived = result['archived']
+                if not messagebox.askyesno("Already Downloaded",
+                                           f"{archived['title'] or url} was already {describe_archived(archived)} "
+                                           f"in this format and quality.\n\nDownload it again?"):
+                    self.log_message(f"⏭️ Already downloaded, not queued: {archived['title'] or url}")
+                    return
+                result = self.daemon.add(url, self.quality_var.get(), format_type, audio_bitrate,
+                                         force=True, start=start)
+        except DAEMON_ERRORS as e:
+            self.show_daemon_error("add the video to the queue", e)
+            return
+        if result['status'] == 'duplicate':
+            self.log_message(f"⏭️ Already in the queue: {result['item']['title'] or url}")
         self.url_var.set("")
+    
+    def enqueue_batch_from_ui(self, urls):
+        """Enqueue ``urls`` with the quality and format currently selected"""
+        if not self.sync_download_path():
+            return
+        format_val = self.format_var.get()
+        format_type = format_val.split(' ')[0].lower()
+        try:
+            items, rejected, duplicates, archived = self.daemon.enqueue_batch(
+                urls, self.quality_var.get(), format_type, self.audio_quality_var.get())
+        except DAEMON_ERRORS as e:
+            self.show_daemon_error("import the URLs", e)
+            return
+        messagebox.showinfo("Bulk Import", 
+                            f"Added {len(items)} video(s) to the queue.\n"
+                            f"Skipped {len(rejected)} invalid and {len(duplicates)} duplicate URL(s), "
+                            f"and {len(archived)} already downloaded.")
+    
+    def import_url_file(self):
+        """Import URLs from a text or CSV file"""
+        path = filedialog.askopenfilename(filetypes=[("URL lists", "*.txt *.csv"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            urls = read_url_file(path)
+        except (OSError, UnicodeDecodeError) as e:
+            messagebox.showerror("Error", f"Could not read file:\n{e}")
+            return
+        self.enqueue_batch_from_ui(urls)
+    
+    def show_paste_dialog(self):
+        """Show a dialog for pasting many URLs at once"""
+        dialog = ctk.CTkToplevel(self.root)
+        dialog.title("📋 Paste URLs")
+        dialog.geometry("600x400")
+        
+        ctk.CTkLabel(dialog, text="One URL per line (commas and spaces also work)", 
+                     font=ctk.CTkFont(size=12)).pack(anchor="w", padx=20, pady=(20, 10))
+        
+        textbox = ctk.CTkTextbox(dialog, font=ctk.CTkFont(size=11))
+        textbox.pack(fill="both", expand=True, padx=20, pady=(0, 10))
         
-        self.log_message(f"✅ Added to queue: {title}")
+        def add():
+            urls = parse_urls(textbox.get("1.0", "end"))
+            dialog.destroy()
+            self.enqueue_batch_from_ui(urls)
         
-        # Auto-download if enabled
-        if self.auto_download_var.get() and not self.is_downloading:
-            self.start_queue()
+        ctk.CTkButton(dialog, text="🚀 Add All to Queue", command=add,
+                      font=ctk.CTkFont(size=12)).pack(pady=(0, 20))
     
     def update_queue_display(self):
-        """Update queue display"""
-        for item in self.queue_tree.get_children():
-            self.queue_tree.delete(item)
-        
-        for item in self.download_queue:
-            status_icon = "⏳" if item['status'] == 'Queued' else "🔄" if item['status'] == 'Downloading' else "✅" if item['status'] == 'Completed' else "❌"
-            self.queue_tree.insert('', 'end', values=(
-                f"{status_icon} {item['status']}",
-                item['title'][:40] + "..." if len(item['title']) > 40 else item['title'],
-                item['quality'],
-                item['format']
-            ))
+        """Schedule a refresh of the queue panel's rows (safe from any thread)"""
+        self.queue_view.refresh()
+    
+    def on_item_changed(self, item):
+        """Called from any thread when one queue item changes; refreshes its row and the overall bar"""
+        self.queue_view.refresh(item)
+        if item.get('status') != 'Downloading':
+            return
+        count, overall, speed = self.daemon.overall_progress()
+        
+        def update():
+            self.progress_var.set(overall / 100)
+            self.progress_label.configure(text=f"Downloading... {count} active, {overall:.1f}% overall "
+                                               f"at {format_bytes(speed)}/s")
+        self.root.after(0, update)
+    
+    def on_queue_status(self, downloading):
+        """Called from any thread when the queue starts or stops, or request pacing changes"""
+        def update():
+            self.rate_label.configure(text=self.daemon.describe_rate())
+            if downloading != self.was_downloading:
+                self.was_downloading = downloading
+                if downloading:
+                    self.update_status("Processing queue...", "#f59e0b")
+                else:
+                    self.update_status("Queue completed!", "#22c55e")
+        self.root.after(0, update)
+    
+    def on_history_changed(self):
+        self.root.after(0, self.update_history_display)
     
     def start_queue(self):
         """Start processing queue"""
-        if not self.download_queue:
+        if not self.daemon.queue:
             messagebox.showwarning("Empty Queue", "No videos in the download queue")
             return
         
-        if self.is_downloading:
+        if self.daemon.is_downloading:
             messagebox.showwarning("Already Downloading", "A download is already in progress")
             return
         
-        self.queue_thread = threading.Thread(target=self.process_queue, daemon=True)
-        self.queue_thread.start()
-    
-    def process_queue(self):
-        """Process download queue"""
-        self.is_downloading = True
-        self.update_status("Processing queue...", "#f59e0b")
-        
-        for i, item in enumerate(self.download_queue):
-            if item['status'] == 'Queued':
-                self.current_download = item
-                item['status'] = 'Downloading'
-                self.update_queue_display()
-                
-                self.log_message(f"📥 Starting download {i+1}/{len(self.download_queue)}: {item['title']}")
-                
-                success = self.download_single_video(item)
-                
-                if success:
-                    item['status'] = 'Completed'
-                    self.log_message(f"✅ Completed: {item['title']}")
-                else:
-                    item['status'] = 'Failed'
-                    self.log_message(f"❌ Failed: {item['title']}")
-                
-                self.update_queue_display()
-                self.add_to_history(item['url'], item['title'], item['quality'], 
-                                  item['format'], "Success" if success else "Failed")
-        
-        self.is_downloading = False
-        self.current_download = None
-        self.update_status("Queue completed!", "#22c55e")
-        self.log_message("🎉 All downloads completed!")
-    
-    def download_single_video(self, item):
-        """Download a single video"""
-        try:
-            url = item['url']
-            quality = item['quality']
-            format_type = item['format']
-            download_path = self.path_var.get()
-            
-            os.makedirs(download_path, exist_ok=True)
-            
-            cmd = ['yt-dlp']
-            
-            # Audio extraction
-            if format_type in ['mp3', 'm4a', 'wav', 'opus']:
-                cmd.extend(['-x', '--audio-format', format_type])
-                if item.get('audio_bitrate'):
-                    cmd.extend(['--audio-quality', item['audio_bitrate']])
-            else:
-                # Video format
-                if quality == 'best':
-                    cmd.extend(['--format', 'best'])
-                else:
-                    cmd.extend(['--format', f'best[height<={quality}]'])
-                
-                if format_type != 'best':
-                    cmd.extend(['--merge-output-format', format_type])
-            
-            cmd.extend(['--output', f'{download_path}/%(title)s.%(ext)s'])
-            cmd.extend([
-                '--no-playlist',
-                '--retries', '20',                    # More retries
-                '--fragment-retries', '20',           # More fragment retries
-                '--socket-timeout', '60',             # Longer timeout
-                '--http-chunk-size', '10485760',      # Larger chunks
-                '--concurrent-fragments', '1',        # Sequential fragments (more stable)
-                '--buffer-size', '65536',             # Buffer size
-                '--user-agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                '--referer', 'https://www.youtube.com/',
-                '--add-header', 'Accept:text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                '--add-header', 'Accept-Language:en-us,en;q=0.5',
-                '--add-header', 'Accept-Encoding:gzip, deflate',
-                '--add-header', 'Connection:keep-alive',
-                '--extractor-args', 'youtube:player_client=android',  # Use Android client (more stable)
-                '--no-check-certificate',            # Skip cert check if needed
-                '--prefer-insecure',                  # Prefer HTTP if HTTPS fails
-                '--sleep-requests', '2',              # Sleep between requests
-                '--sleep-interval', '5',              # Sleep interval
-                '--max-sleep-interval', '10'          # Max sleep
-            ])
-            cmd.append(url)
-            
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                cwd=download_path,
-                bufsize=1,
-                shell=False
-            )
-            
-            error_count = 0
-            max_errors = 10
-            last_progress = 0
-            stall_count = 0
-            
-            for line in process.stdout:
-                line = line.strip()
-                if line:
-                    self.log_message(line)
-                    
-                    # Handle 403 errors
-                    if 'HTTP Error 403' in line or 'Forbidden' in line:
-                        error_count += 1
-                        self.log_message(f"⚠️ 403 Error detected (attempt {error_count}/{max_errors})")
-                        if error_count >= max_errors:
-                            self.log_message("❌ Too many 403 errors. Trying alternative method...")
-                            # Try with different client
-                            return self.download_with_alternative_method(item)
-                    
-                    # Track progress
-                    if '[download]' in line and '%' in line:
-                        try:
-                            parts = line.split('%')[0].split()
-                            if parts:
-                                percent = float(parts[-1])
-                                self.progress_var.set(percent)
-                                self.progress_label.configure(text=f"Downloading... {percent:.1f}%")
-                                
-                                # Check for stalled download
-                                if percent == last_progress:
-                                    stall_count += 1
-                                    if stall_count > 20:
-                                        self.log_message("⚠️ Download appears stalled, retrying...")
-                                        process.terminate()
-                                        return self.download_with_alternative_method(item)
-                                else:
-                                    stall_count = 0
-                                    last_progress = percent
-                        except:
-                            pass
-            
-            return_code = process.wait()
-            
-            # If failed, try alternative method
-            if return_code != 0:
-                self.log_message("❌ Download failed, trying alternative method...")
-                return self.download_with_alternative_method(item)
-            
-            return True
-            
-        except Exception as e:
-            self.log_message(f"❌ Error: {str(e)}")
-            # Try alternative method as fallback
-            return self.download_with_alternative_method(item)
-    
-    def download_with_alternative_method(self, item):
-        """Try downloading with alternative method (different client/extractor)"""
-        try:
-            self.log_message("🔄 Trying alternative download method...")
-            url = item['url']
-            quality = item['quality']
-            format_type = item['format']
-            download_path = self.path_var.get()
-            
-            cmd = ['yt-dlp']
-            
-            # Audio extraction
-            if format_type in ['mp3', 'm4a', 'wav', 'opus']:
-                cmd.extend(['-x', '--audio-format', format_type])
-                if item.get('audio_bitrate'):
-                    cmd.extend(['--audio-quality', item['audio_bitrate']])
-            else:
-                # Video format - try with different client
-                if quality == 'best':
-                    cmd.extend(['--format', 'best'])
-                else:
-                    cmd.extend(['--format', f'best[height<={quality}]'])
-                
-                if format_type != 'best':
-                    cmd.extend(['--merge-output-format', format_type])
-            
-            cmd.extend(['--output', f'{download_path}/%(title)s.%(ext)s'])
-            
-            # Alternative options - use web client instead of android
-            cmd.extend([
-                '--no-playlist',
-                '--extractor-args', 'youtube:player_client=web',  # Try web client
-                '--user-agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                '--referer', 'https://www.youtube.com/',
-                '--retries', '15',
-                '--fragment-retries', '15',
-                '--socket-timeout', '45',
-                '--sleep-requests', '3',
-                '--sleep-interval', '8'
-            ])
-            
-            cmd.append(url)
-            
-            self.log_message("🔧 Alternative command: " + ' '.join(cmd[:10]) + "...")
-            
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                cwd=download_path,
-                bufsize=1,
-                shell=False
-            )
-            
-            for line in process.stdout:
-                line = line.strip()
-                if line:
-                    self.log_message(line)
-                    if '[download]' in line and '%' in line:
-                        try:
-                            parts = line.split('%')[0].split()
-                            if parts:
-                                percent = float(parts[-1])
-                                self.progress_var.set(percent)
-                                self.progress_label.configure(text=f"Downloading (alt)... {percent:.1f}%")
-                        except:
-                            pass
-            
-            return_code = process.wait()
-            return return_code == 0
-            
-        except Exception as e:
-            self.log_message(f"❌ Alternative method also failed: {str(e)}")
-            return False
+        if self.sync_download_path():
+            try:
+                self.daemon.start()
+            except DAEMON_ERRORS as e:
+                self.show_daemon_error("start the queue", e)
     
     def download_now(self):
         """Download video immediately"""
@@ -703,46 +668,40 @@ class YouTubeDownloaderModern:
             messagebox.showerror("Error", "Please enter a YouTube URL")
             return
         
-        if not url.startswith(('https://www.youtube.com/', 'https://youtu.be/', 'https://youtube.com/')):
+        if not is_youtube_url(url):
             messagebox.showerror("Error", "Please enter a valid YouTube URL")
             return
         
         # Add to queue and start immediately
-        self.add_to_queue()
-        if not self.is_downloading:
-            self.start_queue()
+        self.add_to_queue(start=True)
     
     def clear_queue(self):
-        """Clear download queue"""
-        if self.download_queue and not self.is_downloading:
-            self.download_queue.clear()
-            self.update_queue_display()
-            self.log_message("🗑️ Queue cleared")
-        elif self.is_downloading:
-            messagebox.showwarning("Cannot Clear", "Cannot clear queue while downloading")
-    
-    def add_to_history(self, url, title, quality, format_type, status):
-        """Add download to history"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        history_entry = {
-            'timestamp': timestamp,
-            'url': url,
-            'title': title,
-            'quality': quality,
-            'format': format_type,
-            'status': status,
-            'size': 'Unknown'
-        }
-        self.download_history.append(history_entry)
-        self.save_history()
-        self.update_history_display()
+        """Remove completed, failed, cancelled and skipped items from the queue"""
+        try:
+            cleared = self.daemon.clear()
+        except DAEMON_ERRORS as e:
+            self.show_daemon_error("clear the queue", e)
+            return
+        if not cleared:
+            messagebox.showinfo("Clear Queue", "No finished items to clear")
+    
+    def on_close(self):
+        """Close the window; an embedded queue stops its downloads first, keeping partial files"""
+        if not self.remote and self.daemon.is_downloading:
+            if not messagebox.askyesno("Downloads Running",
+                                       "Downloads are still running. Stop them and quit?\n\n"
+                                       "They continue from where they stopped next time. Run "
+                                       "download_daemon.py to keep downloading without this window."):
+                return
+        self.daemon.shutdown()
+        self.root.destroy()
     
     def update_history_display(self):
         """Update history display"""
         for item in self.history_tree.get_children():
             self.history_tree.delete(item)
         
-        for entry in self.download_history[-20:]:
+        for entry in reversed(self.daemon.history_page(0, 20)):
             status_icon = "✅" if entry['status'] == "Success" else "❌"
             self.history_tree.insert('', 'end', values=(
                 entry['timestamp'],
@@ -775,158 +734,38 @@ class YouTubeDownloaderModern:
                 history_tree.heading(col, text=col)
                 history_tree.column(col, width=120)
             
-            for entry in reversed(self.download_history):
-                status_icon = "✅" if entry['status'] == "Success" else "❌"
-                history_tree.insert('', 'end', values=(
-                    entry['timestamp'],
-                    entry['url'][:50] + "..." if len(entry['url']) > 50 else entry['url'],
-                    entry['title'],
-                    entry['quality'],
-                    entry['format'],
-                    f"{status_icon} {entry['status']}"
-                ))
+            # Newest first, fetched a page at a time as the list is scrolled
+            page = {'offset': 0, 'done': False}
+            
+            def load_page():
+                entries = self.daemon.history_page(page['offset'], HISTORY_PAGE_SIZE)
+                for entry in entries:
+                    status_icon = "✅" if entry['status'] == "Success" else "❌"
+                    history_tree.insert('', 'end', values=(
+                        entry['timestamp'],
+                        entry['url'][:50] + "..." if len(entry['url']) > 50 else entry['url'],
+                        entry['title'],
+                        entry['quality'],
+                        entry['format'],
+                        f"{status_icon} {entry['status']}"
+                    ))
+                page['offset'] += len(entries)
+                page['done'] = len(entries) < HISTORY_PAGE_SIZE
+            
+            def on_scroll(first, last):
+                if float(last) >= 1.0 and not page['done']:
+                    load_page()
+            
+            history_tree.configure(yscrollcommand=on_scroll)
+            load_page()
             
             history_tree.pack(fill="both", expand=True)
     
-    def load_history(self):
-        """Load download history"""
-        try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r') as f:
-                    return json.load(f)
-        except:
-            pass
-        return []
-    
-    def save_history(self):
-        """Save download history"""
-        try:
-            with open(self.history_file, 'w') as f:
-                json.dump(self.download_history, f, indent=2)
-        except:
-            pass
-    
-    def start_api_server(self):
-        """Start Flask API server in background thread"""
-        self.api_app = Flask(__name__)
-        CORS(self.api_app)
-        
-        @self.api_app.route('/api/health', methods=['GET'])
-        def health_check():
-            return jsonify({'status': 'ok', 'message': 'API server is running'})
-        
-        @self.api_app.route('/api/add-to-queue', methods=['POST'])
-        def add_to_queue_api():
-            try:
-                data = request.json
-                url = data.get('url', '').strip()
-                
-                if not url:
-                    return jsonify({'status': 'error', 'message': 'URL is required'}), 400
-                
-                if not url.startswith(('https://www.youtube.com/', 'https://youtu.be/', 'https://youtube.com/')):
-                    return jsonify({'status': 'error', 'message': 'Invalid YouTube URL'}), 400
-                
-                # Get video title
-                title = self.get_video_title(url)
-                
-                # Get format
-                format_val = data.get('format', self.config.get('default_format', 'mp4'))
-                format_type = format_val.split(' ')[0].lower() if ' ' in format_val else format_val
-                
-                # Create queue item
-                queue_item = {
-                    'url': url,
-                    'title': title,
-                    'quality': data.get('quality', self.config.get('default_quality', 'best')),
-                    'format': format_type,
-                    'audio_bitrate': data.get('audio_bitrate', self.config.get('audio_bitrate', '192k')) if 'audio' in format_type else None,
-                    'status': 'Queued',
-                    'added_time': datetime.now().strftime("%H:%M:%S"),
-                    'source': 'browser_extension'
-                }
-                
-                # Add to queue
-                self.download_queue.append(queue_item)
-                self.save_queue_to_file()
-                
-                # Update UI on main thread
-                self.root.after(0, self.update_queue_display)
-                self.root.after(0, lambda: self.log_message(f"✅ Added from browser: {title}"))
-                
-                # Auto-download if enabled
-                if self.auto_download_var.get() and not self.is_downloading:
-                    self.root.after(0, self.start_queue)
-                
-                return jsonify({
-                    'status': 'success',
-                    'message': f'Video added to queue: {title}',
-                    'queue_item': queue_item
-                })
-            except Exception as e:
-                return jsonify({'status': 'error', 'message': str(e)}), 500
-        
-        @self.api_app.route('/api/get-queue', methods=['GET'])
-        def get_queue_api():
-            return jsonify({'status': 'success', 'queue': self.download_queue})
-        
-        # Start Flask server in background thread
-        def run_server():
-            self.api_app.run(host='localhost', port=5000, debug=False, use_reloader=False)
-        
-        server_thread = threading.Thread(target=run_server, daemon=True)
-        server_thread.start()
-        self.log_message("🌐 API server started on http://localhost:5000")
-    
-    def sync_queue_from_file(self):
-        """Periodically sync queue from JSON file (for external additions)"""
-        def sync():
-            try:
-                if os.path.exists(self.queue_file):
-                    with open(self.queue_file, 'r') as f:
-                        file_queue = json.load(f)
-                    
-                    # Add new items from file that aren't in memory queue
-                    file_urls = {item.get('url') for item in file_queue}
-                    memory_urls = {item.get('url') for item in self.download_queue}
-                    
-                    new_items = [item for item in file_queue if item.get('url') not in memory_urls]
-                    if new_items:
-                        self.download_queue.extend(new_items)
-                        self.update_queue_display()
-                        self.log_message(f"📥 Synced {len(new_items)} item(s) from file")
-                    
-                    # Clear the file after syncing
-                    if new_items:
-                        with open(self.queue_file, 'w') as f:
-                            json.dump([], f)
-            except:
-                pass
-        
-        # Sync every 2 seconds
-        def periodic_sync():
-            while True:
-                time.sleep(2)
-                sync()
-        
-        sync_thread = threading.Thread(target=periodic_sync, daemon=True)
-        sync_thread.start()
-    
-    def save_queue_to_file(self):
-        """Save queue to file"""
-        try:
-            with open(self.queue_file, 'w') as f:
-                json.dump(self.download_queue, f, indent=2)
-        except:
-            pass
-
 def main():
     # Check if yt-dlp is installed
-    try:
-        subprocess.run(['yt-dlp', '--version'], capture_output=True, check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError):
+    if not ytdlp_available():
         print("yt-dlp is not installed. Please install it first:")
-        print("pip install yt-dlp")
+        print(INSTALL_HINT)
         return
     
     root = ctk.CTk()
@@ -1,33 +1,43 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import threading
 import os
-import subprocess
 import sys
-import json
-from pathlib import Path
-from datetime import datetime
 import webbrowser
 import time
-import re
+from download_core import INSTALL_HINT, ytdlp_available
+from download_daemon import DownloadDaemon, load_config
+from daemon_client import DAEMON_ERRORS, DaemonClient, daemon_running
+from ytdlp_engine import format_bytes
+from history_store import HISTORY_PAGE_SIZE
+from download_archive import describe as describe_archived
+from queue_view import QueueView
+from queue_policy import POLICY_LABELS
+from log_pipeline import LogPipeline
+from youtube_urls import is_youtube_url
 
 class YouTubeDownloaderQueue:
     def __init__(self, root):
         self.root = root
+        self.log_pipeline = LogPipeline(self.root)
         self.root.title("🎬 YouTube 4K Video Downloader - Queue Edition")
         self.root.geometry("1800x1200")
         self.root.configure(bg='#0a0a0a')
         self.root.minsize(1600, 1000)
         
         # Set download path FIRST
-        self.download_path = str(Path.home() / "Downloads")
-        self.history_file = "download_history.json"
-        self.download_history = self.load_history()
-        self.download_process = None
-        self.is_downloading = False
-        self.download_queue = []
-        self.current_download = None
-        self.queue_thread = None
+        self.config_file = "config.json"
+        self.config = load_config(self.config_file)
+        self.download_path = self.config['default_path']
+        self.was_downloading = False
+        
+        # Attach to a running download daemon, or run the queue in this process
+        callbacks = dict(log=self.log_message, on_item=self.on_item_changed, on_queue=self.update_queue_display,
+                         on_status=self.on_queue_status, on_history=self.on_history_changed)
+        self.remote = daemon_running()
+        if self.remote:
+            self.daemon = DaemonClient(token=self.config.get('api_token'), **callbacks)
+        else:
+            self.daemon = DownloadDaemon(self.config, self.config_file, **callbacks)
         
         # Shadcn-inspired color scheme
         self.colors = {
@@ -57,6 +67,21 @@ class YouTubeDownloaderQueue:
         self.setup_styles()
         self.setup_ui()
         self.setup_history_window()
+        self.daemon.open()
+        self.update_queue_display()
+        
+        if self.remote:
+            settings = self.daemon.settings()
+            self.config.update(settings)
+            self.download_path = settings['default_path']
+            self.path_var.set(self.download_path)
+            self.policy_var.set(POLICY_LABELS[settings['queue_policy']])
+            self.log_message(f"🔌 Attached to the download daemon at {self.daemon.api_url}; "
+                             f"downloads keep running when this window is closed")
+        else:
+            # Serve the API for the browser extension and other windows
+            self.daemon.serve(background=True)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
     def setup_styles(self):
         """Setup shadcn-inspired styling"""
@@ -374,7 +399,7 @@ class YouTubeDownloaderQueue:
                  style='ShadcnSubheading.TLabel').pack(anchor=tk.W, pady=(0, 16))
         
         # Queue treeview
-        columns = ('Status', 'Title', 'Quality', 'Format')
+        columns = ('Status', 'Title', 'Quality', 'Format', 'Progress')
         self.queue_tree = ttk.Treeview(queue_frame, columns=columns, show='headings', height=12)
         
         # Configure columns
@@ -382,11 +407,14 @@ class YouTubeDownloaderQueue:
         self.queue_tree.heading('Title', text='📺 Title')
         self.queue_tree.heading('Quality', text='🎯 Quality')
         self.queue_tree.heading('Format', text='📁 Format')
+        self.queue_tree.heading('Progress', text='⏬ Progress')
         
         self.queue_tree.column('Status', width=100)
         self.queue_tree.column('Title', width=250)
         self.queue_tree.column('Quality', width=80)
         self.queue_tree.column('Format', width=80)
+        self.queue_tree.column('Progress', width=80)
+        self.queue_view = QueueView(self.root, self.queue_tree, lambda: self.daemon.queue)
         
         # Scrollbar
         queue_scrollbar = ttk.Scrollbar(queue_frame, orient=tk.VERTICAL, command=self.queue_tree.yview)
@@ -395,6 +423,35 @@ class YouTubeDownloaderQueue:
         self.queue_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         queue_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
+        # Drag rows to reorder; right-click for job control and priority
+        self.drag_state = {'item': None}
+        self.queue_tree.bind('<ButtonPress-1>', self.on_queue_drag_start)
+        self.queue_tree.bind('<B1-Motion>', self.on_queue_drag_motion)
+        self.queue_tree.bind('<ButtonRelease-1>', self.on_queue_drag_end)
+        self.queue_menu = tk.Menu(self.root, tearoff=0)
+        self.queue_menu.add_command(label="⏸️ Pause", command=lambda: self.control_selected('pause'))
+        self.queue_menu.add_command(label="▶️ Resume", command=lambda: self.control_selected('resume'))
+        self.queue_menu.add_command(label="⏹️ Cancel", command=lambda: self.control_selected('cancel'))
+        self.queue_menu.add_separator()
+        self.queue_menu.add_command(label="⬆️ Raise priority", command=lambda: self.change_priority(1))
+        self.queue_menu.add_command(label="⬇️ Lower priority", command=lambda: self.change_priority(-1))
+        self.queue_menu.add_command(label="↩️ Reset priority", command=lambda: self.change_priority(None))
+        self.queue_tree.bind('<Button-3>', self.show_queue_menu)
+        
+        # Download order
+        policy_row = tk.Frame(parent, bg=self.colors['card'])
+        policy_row.pack(fill=tk.X, pady=(0, 16))
+        
+        ttk.Label(policy_row, text="🔀 Download Order", 
+                 style='ShadcnSubheading.TLabel').pack(side=tk.LEFT)
+        
+        self.policy_var = tk.StringVar(value=POLICY_LABELS[self.config['queue_policy']])
+        policy_combo = ttk.Combobox(policy_row, textvariable=self.policy_var, 
+                                   values=list(POLICY_LABELS.values()), 
+                                   style='ShadcnSelect.TCombobox', state="readonly")
+        policy_combo.bind('<<ComboboxSelected>>', lambda event: self.set_queue_policy(self.policy_var.get()))
+        policy_combo.pack(side=tk.RIGHT)
+        
         # Queue controls
         controls_frame = tk.Frame(parent, bg=self.colors['card'])
         controls_frame.pack(fill=tk.X)
@@ -403,7 +460,13 @@ class YouTubeDownloaderQueue:
                   command=self.clear_queue, style='ShadcnOutline.TButton').pack(side=tk.LEFT, padx=(0, 12))
         
         ttk.Button(controls_frame, text="⏸️ Pause Queue", 
-                  command=self.pause_queue, style='ShadcnOutline.TButton').pack(side=tk.LEFT)
+                  command=self.pause_queue, style='ShadcnOutline.TButton').pack(side=tk.LEFT, padx=(0, 12))
+        
+        ttk.Button(controls_frame, text="▶️ Resume Queue", 
+                  command=self.resume_queue, style='ShadcnOutline.TButton').pack(side=tk.LEFT, padx=(0, 12))
+        
+        ttk.Button(controls_frame, text="⏹️ Cancel Selected", 
+                  command=self.cancel_selected, style='ShadcnOutline.TButton').pack(side=tk.LEFT)
         
     def create_shadcn_history_panel(self, parent):
         """Create the shadcn-inspired history panel"""
@@ -468,6 +531,7 @@ class YouTubeDownloaderQueue:
         self.log_text.configure(yscrollcommand=log_scrollbar.set)
         
         self.log_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.log_pipeline.attach(self.log_text, read_only=True)
         log_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
     def setup_history_window(self):
@@ -481,7 +545,7 @@ class YouTubeDownloaderQueue:
             self.url_status_label.config(text="")
             return
         
-        if url.startswith(('https://www.youtube.com/', 'https://youtu.be/', 'https://youtube.com/')):
+        if is_youtube_url(url):
             self.url_status_label.config(text="✅ Valid YouTube URL", 
                                        foreground=self.colors['primary'])
         else:
@@ -493,15 +557,29 @@ class YouTubeDownloaderQueue:
         folder = filedialog.askdirectory(initialdir=self.download_path)
         if folder:
             self.path_var.set(folder)
+            self.sync_download_path()
+    
+    def sync_download_path(self):
+        """Send the download folder in the path field to the daemon; False if it was refused"""
+        folder = self.path_var.get().strip()
+        if folder and folder != self.download_path:
+            try:
+                self.daemon.update_settings(default_path=folder)
+            except DAEMON_ERRORS as e:
+                # An attached daemon only accepts folders inside its download root
+                messagebox.showerror("Download Folder", str(e))
+                self.path_var.set(self.download_path)
+                return False
             self.download_path = folder
+        return True
+    
+    def show_daemon_error(self, action, error):
+        """Report a daemon call that failed, e.g. because an attached daemon stopped"""
+        messagebox.showerror("Download Daemon", f"Could not {action}:\n{error}")
     
     def log_message(self, message):
         """Add message to log with modern styling"""
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, f"{message}\n")
-        self.log_text.see(tk.END)
-        self.log_text.config(state=tk.DISABLED)
-        self.root.update_idletasks()
+        self.log_pipeline.write(message)
     
     def update_status(self, message, color=None):
         """Update status indicator with modern styling"""
@@ -509,21 +587,6 @@ class YouTubeDownloaderQueue:
         if color:
             self.status_indicator.config(fg=color)
     
-    def get_video_title(self, url):
-        """Get video title from URL using yt-dlp"""
-        try:
-            cmd = ['yt-dlp', '--get-title', '--no-playlist', url]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            if result.returncode == 0:
-                title = result.stdout.strip()
-                # Clean up title for display
-                title = re.sub(r'[^\w\s\-\.]', '', title)[:50]  # Remove special chars and limit length
-                return title if title else "Unknown Title"
-            else:
-                return "Unknown Title"
-        except:
-            return "Unknown Title"
-    
     def add_to_queue(self):
         """Add video to download queue"""
         url = self.url_var.get().strip()
@@ -531,210 +594,199 @@ class YouTubeDownloaderQueue:
             messagebox.showerror("Error", "Please enter a YouTube URL")
             return
         
-        if not url.startswith(('https://www.youtube.com/', 'https://youtu.be/', 'https://youtube.com/')):
+        if not is_youtube_url(url):
             messagebox.showerror("Error", "Please enter a valid YouTube URL")
             return
         
-        # Get video title
-        self.log_message(f"🔍 Getting video information for: {url}")
-        title = self.get_video_title(url)
-        
-        # Add to queue
-        queue_item = {
-            'url': url,
-            'title': title,
-            'quality': self.quality_var.get(),
-            'format': self.format_var.get(),
-            'status': 'Queued',
-            'added_time': datetime.now().strftime("%H:%M:%S")
-        }
-        
-        self.download_queue.append(queue_item)
-        self.update_queue_display()
+        # Add to queue; the title is resolved in the background
+        if not self.sync_download_path():
+            return
+        quality, format_type = self.quality_var.get(), self.format_var.get()
+        try:
+            result = self.daemon.add(url, quality, format_type)
+            if result['status'] == 'archived':
+                archived = result['archived']
+                if not messagebox.askyesno("Already Downloaded",
+                                           f"{archived['title'] or url} was already {describe_archived(archived)} "
+                                           f"in this format and quality.\n\nDownload it again?"):
+                    return
+                result = self.daemon.add(url, quality, format_type, force=True)
+        except DAEMON_ERRORS as e:
+            self.show_daemon_error("add the video to the queue", e)
+            return
         
         # Clear URL field
         self.url_var.set("")
         
-        self.log_message(f"✅ Added to queue: {title}")
-        messagebox.showinfo("Added to Queue", f"Video added to download queue:\n{title}")
+        if result['status'] == 'duplicate':
+            messagebox.showinfo("Already in Queue", f"This video is already in the download queue:\n{url}")
+        elif result['status'] == 'expanding':
+            messagebox.showinfo("Added to Queue", f"Every video of this playlist / channel will be queued:\n{url}")
+        else:
+            messagebox.showinfo("Added to Queue", f"Video added to download queue:\n{url}")
     
     def update_queue_display(self):
-        """Update the queue display"""
-        # Clear existing items
-        for item in self.queue_tree.get_children():
-            self.queue_tree.delete(item)
-        
-        # Add queue items
-        for i, item in enumerate(self.download_queue):
-            status_icon = "⏳" if item['status'] == 'Queued' else "🔄" if item['status'] == 'Downloading' else "✅" if item['status'] == 'Completed' else "❌"
-            self.queue_tree.insert('', 'end', values=(
-                f"{status_icon} {item['status']}",
-                item['title'][:40] + "..." if len(item['title']) > 40 else item['title'],
-                item['quality'],
-                item['format']
-            ))
+        """Schedule a refresh of the queue panel's rows (safe from any thread)"""
+        self.queue_view.refresh()
+    
+    def on_item_changed(self, item):
+        """Called from any thread when one queue item changes; refreshes its row and the overall bar"""
+        self.queue_view.refresh(item)
+        if item.get('status') != 'Downloading':
+            return
+        count, overall, speed = self.daemon.overall_progress()
+        
+        def update():
+            self.progress_var.set(overall)
+            self.update_status(f"Downloading {count} video(s)... {overall:.1f}% at {format_bytes(speed)}/s",
+                               self.colors['warning'])
+        self.root.after(0, update)
+    
+    def on_queue_status(self, downloading):
+        """Called from any thread when the queue starts or stops"""
+        def update():
+            if downloading != self.was_downloading:
+                self.was_downloading = downloading
+                if downloading:
+                    self.update_status("Processing queue...", self.colors['warning'])
+                else:
+                    self.update_status("Queue completed!", self.colors['primary'])
+        self.root.after(0, update)
+    
+    def on_history_changed(self):
+        self.root.after(0, self.update_history_display)
     
     def start_queue(self):
         """Start processing the download queue"""
-        if not self.download_queue:
+        if not self.daemon.queue:
             messagebox.showwarning("Empty Queue", "No videos in the download queue")
             return
         
-        if self.is_downloading:
+        if self.daemon.is_downloading:
             messagebox.showwarning("Already Downloading", "A download is already in progress")
             return
         
-        # Start queue processing in a separate thread
-        self.queue_thread = threading.Thread(target=self.process_queue, daemon=True)
-        self.queue_thread.start()
-    
-    def process_queue(self):
-        """Process the download queue"""
-        self.is_downloading = True
-        self.update_status("Processing queue...", self.colors['warning'])
-        
-        for i, item in enumerate(self.download_queue):
-            if item['status'] == 'Queued':
-                self.current_download = item
-                item['status'] = 'Downloading'
-                self.update_queue_display()
-                
-                self.log_message(f"📥 Starting download {i+1}/{len(self.download_queue)}: {item['title']}")
-                
-                # Download the video
-                success = self.download_single_video(item)
-                
-                if success:
-                    item['status'] = 'Completed'
-                    self.log_message(f"✅ Completed: {item['title']}")
-                else:
-                    item['status'] = 'Failed'
-                    self.log_message(f"❌ Failed: {item['title']}")
-                
-                self.update_queue_display()
-                
-                # Add to history
-                self.add_to_history(item['url'], item['title'], item['quality'], item['format'], 
-                                  "Success" if success else "Failed")
-        
-        self.is_downloading = False
-        self.current_download = None
-        self.update_status("Queue completed!", self.colors['primary'])
-        self.log_message("🎉 All downloads completed!")
-    
-    def download_single_video(self, item):
-        """Download a single video from the queue"""
-        try:
-            url = item['url']
-            quality = item['quality']
-            format_type = item['format']
-            download_path = self.path_var.get()
-            
-            # Ensure download path exists
-            os.makedirs(download_path, exist_ok=True)
-            
-            # Build yt-dlp command with VPN-friendly options
-            cmd = ['yt-dlp']
-            
-            # Format selection
-            if quality == 'best':
-                cmd.extend(['--format', 'best'])
-            else:
-                cmd.extend(['--format', f'best[height<={quality}]'])
-            
-            # Output template
-            cmd.extend(['--output', f'{download_path}/%(title)s.%(ext)s'])
-            
-            # VPN-friendly options
-            cmd.extend([
-                '--no-playlist',
-                '--verbose',
-                '--retries', '10',
-                '--fragment-retries', '10',
-                '--socket-timeout', '30',
-                '--http-chunk-size', '10485760',
-                '--concurrent-fragments', '4',
-                '--buffer-size', '65536',
-                '--user-agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            ])
-            
-            if format_type != 'best':
-                cmd.extend(['--merge-output-format', format_type])
-            
-            cmd.append(url)
-            
-            # Execute download
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                cwd=download_path,
-                bufsize=1,
-                shell=False
-            )
-            
-            # Read output in real-time
-            for line in process.stdout:
-                line = line.strip()
-                if line:
-                    self.log_message(line)
-                    
-                    # Update progress if we can parse it
-                    if '[download]' in line and '%' in line:
-                        try:
-                            parts = line.split('%')[0].split()
-                            if parts:
-                                percent = float(parts[-1])
-                                self.progress_var.set(percent)
-                                self.update_status(f"Downloading... {percent:.1f}%", self.colors['warning'])
-                        except:
-                            pass
-            
-            # Wait for process to complete
-            return_code = process.wait()
-            
-            return return_code == 0
-            
-        except Exception as e:
-            self.log_message(f"❌ Error downloading {item['title']}: {str(e)}")
-            return False
+        if self.sync_download_path():
+            try:
+                self.daemon.start()
+            except DAEMON_ERRORS as e:
+                self.show_daemon_error("start the queue", e)
     
     def clear_queue(self):
-        """Clear the download queue"""
-        if self.download_queue and not self.is_downloading:
-            self.download_queue.clear()
-            self.update_queue_display()
-            self.log_message("🗑️ Queue cleared")
-        elif self.is_downloading:
-            messagebox.showwarning("Cannot Clear", "Cannot clear queue while downloading")
+        """Remove completed, failed, cancelled and skipped items from the queue"""
+        try:
+            cleared = self.daemon.clear()
+        except DAEMON_ERRORS as e:
+            self.show_daemon_error("clear the queue", e)
+            return
+        if not cleared:
+            messagebox.showinfo("Clear Queue", "No finished items to clear")
     
     def pause_queue(self):
-        """Pause the download queue"""
-        if self.is_downloading:
-            self.is_downloading = False
-            self.update_status("Queue paused", self.colors['warning'])
-            self.log_message("⏸️ Queue paused")
-        else:
+        """Pause the download queue, stopping running downloads but keeping their partial files"""
+        if not self.daemon.is_downloading:
             messagebox.showinfo("Queue Status", "Queue is not currently running")
+            return
+        try:
+            for item in list(self.daemon.queue):
+                if item['status'] in ('Queued', 'Downloading'):
+                    self.daemon.control(item['id'], 'pause')
+        except DAEMON_ERRORS as e:
+            self.show_daemon_error("pause the queue", e)
+            return
+        self.update_status("Queue paused", self.colors['warning'])
+        self.log_message("⏸️ Queue paused")
     
-    def add_to_history(self, url, title, quality, format_type, status):
-        """Add download to history with proper title"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        history_entry = {
-            'timestamp': timestamp,
-            'url': url,
-            'title': title,
-            'quality': quality,
-            'format': format_type,
-            'status': status,
-            'size': 'Unknown'
-        }
-        
-        self.download_history.append(history_entry)
-        self.save_history()
-        self.update_history_display()
+    def resume_queue(self):
+        """Re-queue paused items and continue their partial downloads"""
+        paused = [item for item in self.daemon.queue if item['status'] == 'Paused']
+        try:
+            resumed = [item for item in paused if self.daemon.control(item['id'], 'resume')]
+        except DAEMON_ERRORS as e:
+            self.show_daemon_error("resume the queue", e)
+            return
+        if not resumed:
+            messagebox.showinfo("Queue Status", "No paused downloads to resume")
+            return
+        self.log_message(f"▶️ Resuming {len(resumed)} download(s)")
+    
+    def cancel_selected(self):
+        """Cancel the selected items, deleting their partial files"""
+        self.control_selected('cancel')
+    
+    def control_selected(self, action):
+        """Pause, resume or cancel the selected queue items"""
+        selected = set(self.queue_tree.selection())
+        try:
+            for item in [item for item in self.daemon.queue if item['id'] in selected]:
+                self.daemon.control(item['id'], action)
+        except DAEMON_ERRORS as e:
+            self.show_daemon_error(f"{action} the download", e)
+    
+    def change_priority(self, step):
+        """Raise or lower the selected items' priority by ``step``; None resets it"""
+        selected = set(self.queue_tree.selection())
+        try:
+            for item in [item for item in self.daemon.queue if item['id'] in selected]:
+                self.daemon.update_item(item['id'], priority=0 if step is None else (item.get('priority') or 0) + step)
+        except DAEMON_ERRORS as e:
+            self.show_daemon_error("change the priority", e)
+    
+    def set_queue_policy(self, label):
+        """Switch the order in which queued items are started"""
+        name = next(key for key, text in POLICY_LABELS.items() if text == label)
+        self.config['queue_policy'] = name
+        try:
+            self.daemon.update_settings(queue_policy=name)
+        except DAEMON_ERRORS as e:
+            self.show_daemon_error("change the download order", e)
+    
+    def on_queue_drag_start(self, event):
+        self.drag_state['item'] = self.queue_tree.identify_row(event.y) or None
+    
+    def on_queue_drag_motion(self, event):
+        row = self.drag_state['item']
+        target = self.queue_tree.identify_row(event.y)
+        if row and target and target != row:
+            self.queue_tree.move(row, '', self.queue_tree.index(target))
+    
+    def on_queue_drag_end(self, event):
+        """Store the order the rows were dragged into"""
+        row, self.drag_state['item'] = self.drag_state['item'], None
+        if not row:
+            return
+        rows = self.queue_tree.get_children()
+        if [item['id'] for item in self.daemon.queue] == list(rows):
+            return
+        index = rows.index(row)
+        try:
+            self.daemon.move(row, rows[index + 1] if index + 1 < len(rows) else None)
+        except DAEMON_ERRORS as e:
+            # Put the rows back in the queue's order
+            self.queue_view.refresh()
+            self.show_daemon_error("move the item", e)
+            return
+        if self.config['queue_policy'] != 'fifo':
+            self.log_message(f"🔀 Moved; the {POLICY_LABELS[self.config['queue_policy']].lower()} order "
+                             f"still comes first, queue order only breaks ties")
+    
+    def show_queue_menu(self, event):
+        row = self.queue_tree.identify_row(event.y)
+        if row:
+            if row not in self.queue_tree.selection():
+                self.queue_tree.selection_set(row)
+            self.queue_menu.tk_popup(event.x_root, event.y_root)
+    
+    def on_close(self):
+        """Close the window; an embedded queue stops its downloads first, keeping partial files"""
+        if not self.remote and self.daemon.is_downloading:
+            if not messagebox.askyesno("Downloads Running",
+                                       "Downloads are still running. Stop them and quit?\n\n"
+                                       "They continue from where they stopped next time. Run "
+                                       "download_daemon.py to keep downloading without this window."):
+                return
+        self.daemon.shutdown()
+        self.root.destroy()
     
     def update_history_display(self):
         """Update the history display"""
@@ -743,7 +795,7 @@ class YouTubeDownloaderQueue:
             self.history_tree.delete(item)
         
         # Add recent entries (last 20)
-        for entry in self.download_history[-20:]:
+        for entry in reversed(self.daemon.history_page(0, 20)):
             status_icon = "✅" if entry['status'] == "Success" else "❌"
             self.history_tree.insert('', 'end', values=(
                 entry['timestamp'],
@@ -757,15 +809,7 @@ class YouTubeDownloaderQueue:
         """Open download location for selected item"""
         selection = self.history_tree.selection()
         if selection:
-            item = self.history_tree.item(selection[0])
-            timestamp = item['values'][0]
-            
-            # Find the corresponding history entry
-            for entry in self.download_history:
-                if entry['timestamp'] == timestamp:
-                    # Open file explorer to download folder
-                    os.startfile(self.download_path)
-                    break
+            os.startfile(self.download_path)
     
     def show_history(self):
         """Show detailed history window"""
@@ -787,54 +831,49 @@ class YouTubeDownloaderQueue:
                 history_tree.heading(col, text=col)
                 history_tree.column(col, width=120)
             
-            # Add all history entries
-            for entry in reversed(self.download_history):  # Show newest first
-                status_icon = "✅" if entry['status'] == "Success" else "❌"
-                history_tree.insert('', 'end', values=(
-                    entry['timestamp'],
-                    entry['url'][:50] + "..." if len(entry['url']) > 50 else entry['url'],
-                    entry['title'],
-                    entry['quality'],
-                    entry['format'],
-                    f"{status_icon} {entry['status']}"
-                ))
+            # Newest first, fetched a page at a time as the list is scrolled
+            page = {'offset': 0, 'done': False}
+            
+            def load_page():
+                entries = self.daemon.history_page(page['offset'], HISTORY_PAGE_SIZE)
+                for entry in entries:
+                    status_icon = "✅" if entry['status'] == "Success" else "❌"
+                    history_tree.insert('', 'end', values=(
+                        entry['timestamp'],
+                        entry['url'][:50] + "..." if len(entry['url']) > 50 else entry['url'],
+                        entry['title'],
+                        entry['quality'],
+                        entry['format'],
+                        f"{status_icon} {entry['status']}"
+                    ))
+                page['offset'] += len(entries)
+                page['done'] = len(entries) < HISTORY_PAGE_SIZE
+            
+            def on_scroll(first, last):
+                if scrollbar is not None:
+                    scrollbar.set(first, last)
+                if float(last) >= 1.0 and not page['done']:
+                    load_page()
+            
+            scrollbar = None
+            history_tree.configure(yscrollcommand=on_scroll)
+            load_page()
             
             history_tree.pack(fill=tk.BOTH, expand=True)
             
             # Scrollbar
             scrollbar = ttk.Scrollbar(history_frame, orient=tk.VERTICAL, command=history_tree.yview)
-            history_tree.configure(yscrollcommand=scrollbar.set)
             scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
     
     def show_settings(self):
         """Show settings window"""
         messagebox.showinfo("Settings", "Settings panel coming soon!\n\nFeatures to be added:\n• Default download quality\n• Auto-download folder\n• VPN optimization settings\n• Queue management preferences")
     
-    def load_history(self):
-        """Load download history from file"""
-        try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r') as f:
-                    return json.load(f)
-        except:
-            pass
-        return []
-    
-    def save_history(self):
-        """Save download history to file"""
-        try:
-            with open(self.history_file, 'w') as f:
-                json.dump(self.download_history, f, indent=2)
-        except:
-            pass
-
 def main():
     # Check if yt-dlp is installed
-    try:
-        subprocess.run(['yt-dlp', '--version'], capture_output=True, check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError):
+    if not ytdlp_available():
         print("yt-dlp is not installed. Please install it first:")
-        print("pip install yt-dlp")
+        print(INSTALL_HINT)
         return
     
     root = tk.Tk()
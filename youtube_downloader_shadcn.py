@@ -2,17 +2,23 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import threading
 import os
-import subprocess
 import sys
-import json
 from pathlib import Path
-from datetime import datetime
 import webbrowser
 import time
+from download_core import (INSTALL_HINT, DownloadRunner, check_ytdlp, download_item, run_standalone,
+                           history_entry, ytdlp_available)
+from ytdlp_engine import get_engine
+from history_store import HistoryStore, HISTORY_PAGE_SIZE
+from download_archive import DownloadArchive, describe as describe_archived
+from log_pipeline import LogPipeline
+from rate_controller import is_throttle_signal
+from youtube_urls import is_youtube_url
 
 class YouTubeDownloaderShadcn:
     def __init__(self, root):
         self.root = root
+        self.log_pipeline = LogPipeline(self.root)
         self.root.title("🎬 YouTube 4K Video Downloader")
         self.root.geometry("1600x1000")
         self.root.configure(bg='#0a0a0a')
@@ -21,9 +27,11 @@ class YouTubeDownloaderShadcn:
         # Set download path FIRST
         self.download_path = str(Path.home() / "Downloads")
         self.history_file = "download_history.json"
-        self.download_history = self.load_history()
-        self.download_process = None
+        self.history_store = HistoryStore(legacy_path=self.history_file)
         self.is_downloading = False
+        self.engine = get_engine()
+        self.runner = DownloadRunner(self.engine, log=self.log_message)
+        self.download_archive = DownloadArchive()
         
         # Shadcn-inspired color scheme
         self.colors = {
@@ -413,6 +421,7 @@ class YouTubeDownloaderShadcn:
         self.log_text.configure(yscrollcommand=log_scrollbar.set)
         
         self.log_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.log_pipeline.attach(self.log_text, read_only=True)
         log_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
     def setup_history_window(self):
@@ -426,7 +435,7 @@ class YouTubeDownloaderShadcn:
             self.url_status_label.config(text="")
             return
         
-        if url.startswith(('https://www.youtube.com/', 'https://youtu.be/', 'https://youtube.com/')):
+        if is_youtube_url(url):
             self.url_status_label.config(text="✅ Valid YouTube URL", 
                                        foreground=self.colors['primary'])
         else:
@@ -442,11 +451,7 @@ class YouTubeDownloaderShadcn:
     
     def log_message(self, message):
         """Add message to log with modern styling"""
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, f"{message}\n")
-        self.log_text.see(tk.END)
-        self.log_text.config(state=tk.DISABLED)
-        self.root.update_idletasks()
+        self.log_pipeline.write(message)
     
     def update_status(self, message, color=None):
         """Update status indicator with modern styling"""
@@ -461,7 +466,7 @@ class YouTubeDownloaderShadcn:
             messagebox.showerror("Error", "Please enter a YouTube URL")
             return
         
-        if not url.startswith(('https://www.youtube.com/', 'https://youtu.be/', 'https://youtube.com/')):
+        if not is_youtube_url(url):
             messagebox.showerror("Error", "Please enter a valid YouTube URL")
             return
         
@@ -497,151 +502,84 @@ class YouTubeDownloaderShadcn:
             self.log_message("")
             
             # Check if yt-dlp is available
-            try:
-                result = subprocess.run(['yt-dlp', '--version'], capture_output=True, text=True, timeout=10)
-                if result.returncode != 0:
-                    raise FileNotFoundError("yt-dlp not found")
-                self.log_message(f"✅ yt-dlp version: {result.stdout.strip()}")
-            except Exception as e:
-                self.log_message(f"❌ yt-dlp check failed: {str(e)}")
-                self.log_message("💡 Try running: python -m pip install yt-dlp")
-                raise
-            
-            # Build yt-dlp command with VPN-friendly options
-            cmd = ['yt-dlp']
-            
-            # Format selection
-            if quality == 'best':
-                cmd.extend(['--format', 'best'])
-            else:
-                cmd.extend(['--format', f'best[height<={quality}]'])
-            
-            # Output template
-            cmd.extend(['--output', f'{download_path}/%(title)s.%(ext)s'])
-            
-            # VPN-friendly options
-            cmd.extend([
-                '--no-playlist',
-                '--verbose',
-                '--retries', '10',                    # More retries for VPN issues
-                '--fragment-retries', '10',           # Retry fragments
-                '--socket-timeout', '30',             # Longer timeout
-                '--http-chunk-size', '10485760',      # Larger chunks
-                '--concurrent-fragments', '4',        # Parallel downloads
-                '--buffer-size', '65536',             # Larger buffer
-                '--user-agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'  # Better user agent
-            ])
+            check_ytdlp(self.log_message, self.engine)
             
-            if format_type != 'best':
-                cmd.extend(['--merge-output-format', format_type])
-            
-            cmd.append(url)
-            
-            self.log_message("🔧 Command: " + ' '.join(cmd))
-            self.log_message("")
             self.log_message("📥 Starting download with VPN optimization...")
             self.log_message("🛡️ Using retry logic for VPN stability...")
             self.log_message("-" * 60)
             
+            item = download_item(url, quality, format_type)
             # Execute download with process management
             self.is_downloading = True
-            self.download_process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                cwd=download_path,
-                bufsize=1,
-                shell=False
-            )
             
-            # Read output in real-time with VPN error handling
+            # Stream output in real-time with VPN error handling
             output_lines = []
             error_count = 0
-            max_errors = 5
             
-            try:
-                for line in self.download_process.stdout:
-                    if not self.is_downloading:  # Check if download was cancelled
-                        break
-                        
-                    line = line.strip()
-                    if line:
-                        output_lines.append(line)
-                        self.log_message(line)
-                        
-                        # Handle VPN-related errors
-                        if 'HTTP Error 403' in line or 'Forbidden' in line:
-                            error_count += 1
-                            self.log_message(f"🛡️ VPN Error detected (attempt {error_count}/{max_errors})")
-                            if error_count >= max_errors:
-                                self.log_message("❌ Too many VPN errors. Consider switching VPN servers.")
-                                break
-                        
-                        # Update progress if we can parse it
-                        if '[download]' in line and '%' in line:
-                            try:
-                                parts = line.split('%')[0].split()
-                                if parts:
-                                    percent = float(parts[-1])
-                                    self.progress_var.set(percent)
-                                    self.update_status(f"Downloading... {percent:.1f}%", self.colors['warning'])
-                            except:
-                                pass
-                        elif 'ERROR' in line.upper() or 'FAILED' in line.upper():
-                            self.log_message(f"⚠️  WARNING: {line}")
-                
-                # Wait for process to complete
-                if self.is_downloading:
-                    return_code = self.download_process.wait()
-                else:
-                    return_code = -1  # Cancelled
+            def on_line(line):
+                nonlocal error_count
+                output_lines.append(line)
                 
+                # Handle VPN-related errors
+                if is_throttle_signal(line):
+                    error_count += 1
+                elif '[download]' not in line and ('ERROR' in line.upper() or 'FAILED' in line.upper()):
+                    self.log_message(f"⚠️  WARNING: {line}")
+            
+            def on_progress(event):
+                if event.percent is not None:
+                    self.progress_var.set(event.percent)
+                self.update_status(f"Downloading... {event.describe()}", self.colors['warning'])
+            
+            # Strategy failover, transfer tuning, pacing and bandwidth limits (shared by every front end)
+            try:
+                success = run_standalone(self.runner, item, download_path, self.download_archive,
+                                         on_progress=on_progress, on_line=on_line,
+                                         confirm=self.confirm_download_again)
             except Exception as e:
                 self.log_message(f"❌ Error reading process output: {str(e)}")
-                return_code = -1
+                success = False
             
             self.log_message("-" * 60)
             
-            if return_code == 0 and self.is_downloading:
+            if item.get('archived'):
+                self.update_status("⏭️ Already downloaded", self.colors['warning'])
+                return
+            
+            if success:
                 self.update_status("✅ Download completed!", self.colors['primary'])
                 self.progress_var.set(100)
                 self.log_message("🎉 SUCCESS: Video downloaded successfully!")
                 self.log_message(f"📁 Saved to: {download_path}")
                 
                 # Add to history
-                self.add_to_history(url, quality, format_type, "Success")
+                self.add_to_history(item, "Success")
                 
                 messagebox.showinfo("Success", f"Video downloaded successfully!\nSaved to: {download_path}")
             else:
-                if not self.is_downloading:
-                    self.update_status("❌ Download cancelled", self.colors['destructive'])
-                    self.log_message("🛑 Download was cancelled by user")
+                self.update_status("❌ Download failed!", self.colors['destructive'])
+                self.log_message("💥 FAILED: Download did not complete successfully")
+                
+                # Add to history
+                self.add_to_history(item, "Failed")
+                
+                if output_lines:
+                    self.log_message("📋 Last few lines of output:")
+                    for line in output_lines[-5:]:
+                        self.log_message(f"   {line}")
+                
+                # VPN-specific error message
+                if error_count > 0:
+                    messagebox.showerror("Download Failed", 
+                        f"Download failed due to VPN issues.\n"
+                        f"Try:\n"
+                        f"• Switching VPN servers\n"
+                        f"• Disabling VPN temporarily\n"
+                        f"• Using a different VPN provider")
                 else:
-                    self.update_status("❌ Download failed!", self.colors['destructive'])
-                    self.log_message("💥 FAILED: Download did not complete successfully")
-                    self.log_message(f"🔍 Return code: {return_code}")
-                    
-                    # Add to history
-                    self.add_to_history(url, quality, format_type, "Failed")
-                    
-                    if output_lines:
-                        self.log_message("📋 Last few lines of output:")
-                        for line in output_lines[-5:]:
-                            self.log_message(f"   {line}")
-                    
-                    # VPN-specific error message
-                    if error_count > 0:
-                        messagebox.showerror("Download Failed", 
-                            f"Download failed due to VPN issues.\n"
-                            f"Try:\n"
-                            f"• Switching VPN servers\n"
-                            f"• Disabling VPN temporarily\n"
-                            f"• Using a different VPN provider")
-                    else:
-                        messagebox.showerror("Download Failed", 
-                            f"Download failed with return code {return_code}.\n"
-                            f"Check the log for details.")
+                    messagebox.showerror("Download Failed", 
+                        "Download failed with every client.\n"
+                        "Check the log for details.")
                 
         except FileNotFoundError as e:
             self.log_message(f"❌ yt-dlp not found: {str(e)}")
@@ -656,29 +594,17 @@ class YouTubeDownloaderShadcn:
         finally:
             self.download_btn.config(state='normal')
             self.is_downloading = False
-            self.download_process = None
     
-    def add_to_history(self, url, quality, format_type, status):
+    def confirm_download_again(self, item, archived):
+        """Ask whether to download a video the download archive already has"""
+        return messagebox.askyesno("Already Downloaded",
+                                   f"{item['title'] or item['url']} was already {describe_archived(archived)} "
+                                   f"in this format and quality.\n\nDownload it again?")
+    
+    def add_to_history(self, item, status):
         """Add download to history"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        # Try to get video title from URL (simplified)
-        title = "Unknown Title"
-        if "watch?v=" in url:
-            title = f"Video {url.split('watch?v=')[1][:11]}"
-        
-        history_entry = {
-            'timestamp': timestamp,
-            'url': url,
-            'title': title,
-            'quality': quality,
-            'format': format_type,
-            'status': status,
-            'size': 'Unknown'
-        }
-        
-        self.download_history.append(history_entry)
-        self.save_history()
+        self.history_store.add(history_entry(item['url'], item['title'], item['quality'], item['format'],
+                                             status, item.get('actual_bytes')))
         self.update_history_display()
     
     def update_history_display(self):
@@ -688,7 +614,7 @@ class YouTubeDownloaderShadcn:
             self.history_tree.delete(item)
         
         # Add recent entries (last 20)
-        for entry in self.download_history[-20:]:
+        for entry in reversed(self.history_store.recent(20)):
             status_icon = "✅" if entry['status'] == "Success" else "❌"
             self.history_tree.insert('', 'end', values=(
                 entry['timestamp'],
@@ -706,11 +632,9 @@ class YouTubeDownloaderShadcn:
             timestamp = item['values'][0]
             
             # Find the corresponding history entry
-            for entry in self.download_history:
-                if entry['timestamp'] == timestamp:
-                    # Open file explorer to download folder
-                    os.startfile(self.download_path)
-                    break
+            if self.history_store.find(timestamp):
+                # Open file explorer to download folder
+                os.startfile(self.download_path)
     
     def show_history(self):
         """Show detailed history window"""
@@ -732,54 +656,49 @@ class YouTubeDownloaderShadcn:
                 history_tree.heading(col, text=col)
                 history_tree.column(col, width=120)
             
-            # Add all history entries
-            for entry in reversed(self.download_history):  # Show newest first
-                status_icon = "✅" if entry['status'] == "Success" else "❌"
-                history_tree.insert('', 'end', values=(
-                    entry['timestamp'],
-                    entry['url'][:50] + "..." if len(entry['url']) > 50 else entry['url'],
-                    entry['title'],
-                    entry['quality'],
-                    entry['format'],
-                    f"{status_icon} {entry['status']}"
-                ))
+            # Newest first, fetched a page at a time as the list is scrolled
+            page = {'offset': 0, 'done': False}
+            
+            def load_page():
+                entries = self.history_store.page(page['offset'], HISTORY_PAGE_SIZE)
+                for entry in entries:
+                    status_icon = "✅" if entry['status'] == "Success" else "❌"
+                    history_tree.insert('', 'end', values=(
+                        entry['timestamp'],
+                        entry['url'][:50] + "..." if len(entry['url']) > 50 else entry['url'],
+                        entry['title'],
+                        entry['quality'],
+                        entry['format'],
+                        f"{status_icon} {entry['status']}"
+                    ))
+                page['offset'] += len(entries)
+                page['done'] = len(entries) < HISTORY_PAGE_SIZE
+            
+            def on_scroll(first, last):
+                if scrollbar is not None:
+                    scrollbar.set(first, last)
+                if float(last) >= 1.0 and not page['done']:
+                    load_page()
+            
+            scrollbar = None
+            history_tree.configure(yscrollcommand=on_scroll)
+            load_page()
             
             history_tree.pack(fill=tk.BOTH, expand=True)
             
             # Scrollbar
             scrollbar = ttk.Scrollbar(history_frame, orient=tk.VERTICAL, command=history_tree.yview)
-            history_tree.configure(yscrollcommand=scrollbar.set)
             scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
     
     def show_settings(self):
         """Show settings window"""
         messagebox.showinfo("Settings", "Settings panel coming soon!\n\nFeatures to be added:\n• Default download quality\n• Auto-download folder\n• VPN optimization settings\n• Notification preferences")
     
-    def load_history(self):
-        """Load download history from file"""
-        try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r') as f:
-                    return json.load(f)
-        except:
-            pass
-        return []
-    
-    def save_history(self):
-        """Save download history to file"""
-        try:
-            with open(self.history_file, 'w') as f:
-                json.dump(self.download_history, f, indent=2)
-        except:
-            pass
-
 def main():
     # Check if yt-dlp is installed
-    try:
-        subprocess.run(['yt-dlp', '--version'], capture_output=True, check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError):
+    if not ytdlp_available():
         print("yt-dlp is not installed. Please install it first:")
-        print("pip install yt-dlp")
+        print(INSTALL_HINT)
         return
     
     root = tk.Tk()
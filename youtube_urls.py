@@ -0,0 +1,138 @@
+"""
+YouTube URL Parsing
+One precompiled parser for every YouTube URL shape, giving the canonical
+video / playlist ID used as the key for caches, de-duplication and history
+
+Recognized hosts: youtube.com with or without www., m., music. or gaming.,
+youtu.be and youtube-nocookie.com, with http, https or no scheme. Recognized
+shapes: /watch?v=ID, /shorts/ID, /embed/ID, /live/ID, /v/ID, /e/ID,
+youtu.be/ID (each with an optional trailing slash), /playlist?list=ID,
+/embed/videoseries?list=ID and channels (/@handle, /channel/ID, /c/name,
+/user/name, optionally followed by a tab such as /videos).
+
+Parsing is one regex match plus, for query strings, one more search per
+parameter, so bulk imports can classify well over 100,000 URLs a second:
+    python youtube_urls.py        # runs the benchmark
+"""
+
+import re
+import time
+
+VIDEO = 'video'
+PLAYLIST = 'playlist'
+CHANNEL = 'channel'
+
+_ID = r'[A-Za-z0-9_-]{11}'
+
+_URL = re.compile(r'''
+    \s*(?:https?:)?(?://)?
+    (?:
+        (?:www\.)?youtu\.be/(?P<short>''' + _ID + r''')/?
+      | (?:(?:www|m|music|gaming)\.)?youtube(?:-nocookie)?\.com
+        (?:
+            # /embed/videoseries?list=ID is a playlist, left to the catch-all path below
+            /(?:shorts|embed|live|v|e)/(?!videoseries(?:[/?#&\s]|$))(?P<path_id>''' + _ID + r''')/?
+          | /(?P<channel>@[^/?#\s]+|(?:channel|c|user)/[^/?#\s]+)(?P<tab>/[^/?#\s]+)?/?
+          | /[^?#\s]*
+        )?
+    )
+    (?=[?#&\s]|$)
+''', re.VERBOSE | re.IGNORECASE)
+_VIDEO_PARAM = re.compile(r'[?&]v=(' + _ID + r')(?=[&#]|$)')
+_LIST_PARAM = re.compile(r'[?&]list=([A-Za-z0-9_-]+)')
+
+class YouTubeURL:
+    """What a YouTube URL points at.
+
+    ``kind`` is VIDEO, PLAYLIST or CHANNEL (None for YouTube pages that are
+    none of these, such as the home page). A watch URL inside a playlist is
+    a VIDEO that also has a ``playlist_id``.
+    """
+
+    __slots__ = ('kind', 'video_id', 'playlist_id', 'channel', 'tab')
+
+    def __init__(self, kind=None, video_id=None, playlist_id=None, channel=None, tab=None):
+        self.kind = kind
+        self.video_id = video_id
+        self.playlist_id = playlist_id
+        self.channel = channel
+        self.tab = tab
+
+    @property
+    def key(self):
+        """The canonical ID caches and de-duplication use"""
+        return self.video_id or self.playlist_id or self.channel
+
+    def canonical_url(self):
+        """Shortest standard form of the URL, without tracking or timestamp parameters"""
+        if self.kind == VIDEO:
+            return f"https://www.youtube.com/watch?v={self.video_id}"
+        if self.kind == PLAYLIST:
+            return f"https://www.youtube.com/playlist?list={self.playlist_id}"
+        if self.kind == CHANNEL:
+            return f"https://www.youtube.com/{self.channel}{self.tab or ''}"
+        return None
+
+    def __repr__(self):
+        return f"YouTubeURL({self.kind!r}, {self.key!r})"
+
+def parse_url(url):
+    """Return a YouTubeURL for ``url``, or None if it isn't a YouTube URL"""
+    match = _URL.match(url)
+    if match is None:
+        return None
+    short, path_id, channel = match.group('short', 'path_id', 'channel')
+    if short or path_id:
+        query = url[match.end():]
+        playlist = _LIST_PARAM.search(query) if '?' in query else None
+        return YouTubeURL(VIDEO, short or path_id, playlist.group(1) if playlist else None)
+    if channel:
+        return YouTubeURL(CHANNEL, channel=channel, tab=match.group('tab'))
+    query = url[match.end():]
+    if '?' not in query:
+        return YouTubeURL()
+    video = _VIDEO_PARAM.search(query)
+    playlist = _LIST_PARAM.search(query)
+    if video:
+        return YouTubeURL(VIDEO, video.group(1), playlist.group(1) if playlist else None)
+    if playlist:
+        return YouTubeURL(PLAYLIST, playlist_id=playlist.group(1))
+    return YouTubeURL()
+
+def is_youtube_url(url):
+    """True for URLs of a YouTube video, playlist or channel"""
+    parsed = parse_url(url)
+    return parsed is not None and parsed.kind is not None
+
+def video_id(url):
+    """Return the video ID in ``url``, or None"""
+    parsed = parse_url(url)
+    return parsed.video_id if parsed else None
+
+def canonical_key(url):
+    """Return the canonical ID for ``url``, or the stripped URL for anything unrecognized"""
+    parsed = parse_url(url)
+    return (parsed.key if parsed else None) or url.strip()
+
+BENCHMARK_URLS = (
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+    'https://youtu.be/dQw4w9WgXcQ?t=42',
+    'https://m.youtube.com/watch?feature=share&v=dQw4w9WgXcQ&t=10s',
+    'https://music.youtube.com/watch?v=dQw4w9WgXcQ&list=RDAMVMdQw4w9WgXcQ',
+    'https://www.youtube.com/shorts/dQw4w9WgXcQ',
+    'https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ?rel=0',
+    'https://www.youtube.com/playlist?list=PLFgquLnL59alCl_2TQvOiD5Vgm1hCaGSI',
+    'https://www.youtube.com/@LinusTechTips/videos',
+    'https://example.com/watch?v=dQw4w9WgXcQ'
+)
+
+def benchmark(count=100000):
+    """Parse ``count`` URLs of mixed shapes; returns URLs per second"""
+    urls = (BENCHMARK_URLS * (count // len(BENCHMARK_URLS) + 1))[:count]
+    start = time.perf_counter()
+    for url in urls:
+        parse_url(url)
+    return count / (time.perf_counter() - start)
+
+if __name__ == "__main__":
+    print(f"{benchmark():,.0f} URLs/s")
@@ -0,0 +1,545 @@
+"""
+yt-dlp Download Engine
+Runs yt-dlp in-process with long-lived YoutubeDL instances, falling back to
+spawning the yt-dlp CLI when the yt_dlp module is not importable
+"""
+
+import json
+import os
+import re
+import signal
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+
+try:
+    import yt_dlp
+    from yt_dlp.utils import DownloadCancelled, DownloadError
+except ImportError:
+    yt_dlp = None
+    DownloadCancelled = DownloadError = None
+
+ENGINE_MODES = ('auto', 'inprocess', 'subprocess')
+
+# Options that change from one run to the next (format pin, transfer tuning,
+# pacing, speed limit) and the YoutubeDL params they set. They are applied to
+# a pooled instance per run instead of being part of its pool key: the
+# downloaders and format sorting read them afresh for every download, and
+# _acquire recompiles the --format selector.
+PER_RUN_OPTIONS = {
+    '-f': 'format', '--format': 'format',
+    '-S': 'format_sort', '--format-sort': 'format_sort',
+    '-r': 'ratelimit', '--limit-rate': 'ratelimit',
+    '-N': 'concurrent_fragment_downloads', '--concurrent-fragments': 'concurrent_fragment_downloads',
+    '--http-chunk-size': 'http_chunk_size',
+    '--buffer-size': 'buffersize',
+    '--sleep-requests': 'sleep_interval_requests',
+    '--sleep-interval': 'sleep_interval', '--min-sleep-interval': 'sleep_interval',
+    '--max-sleep-interval': 'max_sleep_interval'
+}
+
+# Idle YoutubeDL instances kept for reuse; the least recently used go first
+MAX_IDLE_INSTANCES = 4
+
+def _stable_args(args):
+    """``args`` without the PER_RUN_OPTIONS and their values"""
+    stable = []
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in PER_RUN_OPTIONS:
+            skip = True
+        else:
+            stable.append(arg)
+    return stable
+
+# The CLI prints each progress update as one line with this prefix: the progress
+# dict as JSON, then (tab-separated) the format being downloaded. The info dict
+# the template sees is the stream's own, so the whole selection of a merged
+# download comes from parse_selection_line, as in-process.
+PROGRESS_PREFIX = "[progress] "
+PROGRESS_ARGS = ['--newline', '--progress-template',
+                 f'download:{PROGRESS_PREFIX}%(progress)j\t%(info.format_id)s']
+
+# yt-dlp announces its format selection before downloading, e.g.
+# "[info] dQw4w9WgXcQ: Downloading 1 format(s): 137+140". Progress of a merged
+# download only names the stream being fetched ('137', then '140'), so this
+# line is where both engines learn the whole selection.
+_SELECTION_PATTERN = re.compile(r'^\[info\] .+: Downloading \d+ format\(s\): (\S+)$')
+
+def parse_selection_line(line):
+    """Return the selection announced by a yt-dlp output line (e.g. '137+140'), or None"""
+    match = _SELECTION_PATTERN.match(line.strip())
+    return match.group(1) if match else None
+
+def selected_format(info):
+    """Return the format selection yt-dlp made for a top-level ``info``, e.g. '137+140', or None"""
+    requested = info.get('requested_formats')
+    if requested:
+        return '+'.join(f['format_id'] for f in requested)
+    return None
+
+class ProgressEvent:
+    """One progress update for the file currently being downloaded.
+
+    ``format_id`` is the stream being fetched; ``selection`` the whole format
+    selection it belongs to ('137+140' for a merged download), once known.
+    """
+
+    FIELDS = ('status', 'downloaded_bytes', 'total_bytes', 'speed', 'eta',
+              'fragment_index', 'fragment_count', 'filename', 'tmpfilename', 'format_id', 'selection')
+
+    # Set when downloaded_bytes counts more than the named file (parallel streams)
+    counter = None
+
+    def __init__(self, status='downloading', downloaded_bytes=0, total_bytes=None, speed=None,
+                 eta=None, fragment_index=None, fragment_count=None, filename=None,
+                 tmpfilename=None, format_id=None, selection=None):
+        self.status = status
+        self.downloaded_bytes = downloaded_bytes or 0
+        self.total_bytes = total_bytes
+        self.speed = speed
+        self.eta = eta
+        self.fragment_index = fragment_index
+        self.fragment_count = fragment_count
+        self.filename = filename
+        self.tmpfilename = tmpfilename
+        self.format_id = format_id
+        self.selection = selection
+
+    @classmethod
+    def from_dict(cls, d, format_id=None):
+        """Build an event from a yt-dlp progress hook dict"""
+        info = d.get('info_dict') or {}
+        if format_id is None:
+            format_id = info.get('format_id')
+        return cls(
+            status=d.get('status', 'downloading'),
+            downloaded_bytes=d.get('downloaded_bytes'),
+            total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate'),
+            speed=d.get('speed'),
+            eta=d.get('eta'),
+            fragment_index=d.get('fragment_index'),
+            fragment_count=d.get('fragment_count'),
+            filename=d.get('filename'),
+            tmpfilename=d.get('tmpfilename'),
+            format_id=format_id,
+            selection=selected_format(info)
+        )
+
+    @property
+    def percent(self):
+        """Percentage done, or None while the total size is unknown"""
+        if self.status == 'finished':
+            return 100.0
+        if self.total_bytes:
+            return min(100.0, self.downloaded_bytes * 100.0 / self.total_bytes)
+        if self.fragment_count and self.fragment_index:
+            return min(100.0, self.fragment_index * 100.0 / self.fragment_count)
+        return None
+
+    @property
+    def counter_key(self):
+        """Identifies the running byte count ``downloaded_bytes`` belongs to"""
+        # Finished events name only the final file, so prefer it over the .part name
+        return self.counter or self.filename or self.tmpfilename
+
+    def to_dict(self):
+        d = {field: getattr(self, field) for field in self.FIELDS}
+        d['percent'] = self.percent
+        return d
+
+    def describe(self):
+        """Short human-readable summary, e.g. '42.0% of 120.5MiB at 3.2MiB/s, ETA 0:35'"""
+        parts = [f"{self.percent:.1f}%" if self.percent is not None else format_bytes(self.downloaded_bytes)]
+        if self.total_bytes:
+            parts.append(f"of {format_bytes(self.total_bytes)}")
+        if self.speed:
+            parts.append(f"at {format_bytes(self.speed)}/s")
+        text = ' '.join(parts)
+        if self.eta is not None:
+            text += f", ETA {int(self.eta) // 60}:{int(self.eta) % 60:02d}"
+        return text
+
+def format_bytes(size):
+    """Format a byte count the way yt-dlp does (KiB, MiB, ...)"""
+    size = float(size or 0)
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TiB"
+
+def parse_progress_line(line):
+    """Return a ProgressEvent for a progress line printed with PROGRESS_ARGS, or None"""
+    if not line.startswith(PROGRESS_PREFIX):
+        return None
+    fields = line[len(PROGRESS_PREFIX):].split('\t')
+    try:
+        progress = json.loads(fields[0])
+    except ValueError:
+        return None
+    format_id = fields[1] if len(fields) > 1 and fields[1] != 'NA' else None
+    if not isinstance(progress, dict):
+        return None
+    return ProgressEvent.from_dict(progress, format_id)
+
+def kill_process_tree(process):
+    """Stop ``process`` and whatever it started (e.g. ffmpeg for merges and HLS)"""
+    if process.poll() is not None:
+        return
+    try:
+        if os.name == 'nt':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)], capture_output=True)
+        else:
+            # The CLI is started in its own session, so its process group is the whole tree
+            os.killpg(process.pid, signal.SIGTERM)
+    except OSError:
+        process.terminate()
+
+def _write_info(info):
+    """Save an info dict for --load-info-json; returns the temporary file's path"""
+    fd, path = tempfile.mkstemp(prefix='yt-dlp-', suffix='.info.json')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(info, f)
+    return path
+
+class EngineJob:
+    """Handle for one engine run; lets callbacks or other threads cancel it.
+
+    ``files`` collects every file name the run reported progress for,
+    including ``.part`` files, so a cancelled job's leftovers can be removed.
+    """
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self.process = None
+        self.children = []
+        self.files = set()
+
+    def child(self):
+        """Return a job for a sub-run that is cancelled along with this one"""
+        job = EngineJob()
+        self.children.append(job)
+        if self.cancelled.is_set():
+            job.cancel()
+        return job
+
+    def cancel(self):
+        """Stop the running download as soon as possible"""
+        self.cancelled.set()
+        if self.process:
+            kill_process_tree(self.process)
+        for job in self.children:
+            job.cancel()
+
+    def all_files(self):
+        """Files reported by this run and its sub-runs"""
+        files = set(self.files)
+        for job in self.children:
+            files |= job.all_files()
+        return files
+
+class _EngineLogger:
+    """yt-dlp logger that forwards every message to the current run's on_line"""
+
+    def __init__(self, pooled):
+        self.pooled = pooled
+
+    def _emit(self, msg):
+        if self.pooled.on_line:
+            for line in str(msg).splitlines():
+                if line.strip():
+                    self.pooled.on_line(line.strip())
+
+    debug = info = warning = error = _emit
+
+class _PooledYDL:
+    """A YoutubeDL instance plus the callbacks of the run currently using it"""
+
+    def __init__(self, ydl_opts):
+        self.on_line = None
+        self.on_progress = None
+        self.job = None
+        self.throttle = None
+        self.transferred = {}
+        ydl_opts = dict(ydl_opts)
+        ydl_opts['logger'] = _EngineLogger(self)
+        # Progress arrives through the hook as events; don't also print it as text
+        ydl_opts['noprogress'] = True
+        ydl_opts['progress_hooks'] = list(ydl_opts.get('progress_hooks') or []) + [self._hook]
+        self.ydl = yt_dlp.YoutubeDL(ydl_opts)
+
+    def _hook(self, d):
+        if self.job and self.job.cancelled.is_set():
+            raise DownloadCancelled()
+        if self.throttle and d.get('status') == 'downloading':
+            # Sleeping here holds up the download thread, which is what limits its speed
+            key = d.get('tmpfilename') or d.get('filename')
+            downloaded = d.get('downloaded_bytes') or 0
+            previous = self.transferred.get(key, downloaded)
+            self.transferred[key] = downloaded
+            if downloaded > previous:
+                self.throttle(downloaded - previous)
+        if d.get('status') in ('downloading', 'finished') and self.on_progress:
+            self.on_progress(ProgressEvent.from_dict(d))
+
+class YtDlpEngine:
+    """Run yt-dlp downloads given the same argument lists the CLI takes.
+
+    In in-process mode YoutubeDL instances are pooled by their arguments
+    minus PER_RUN_OPTIONS, so extractors and the player JS cache are reused
+    across queue items; at most MAX_IDLE_INSTANCES are kept idle.
+    """
+
+    def __init__(self, mode='auto'):
+        if mode not in ENGINE_MODES:
+            mode = 'auto'
+        if mode == 'auto':
+            mode = 'inprocess' if yt_dlp is not None else 'subprocess'
+        elif mode == 'inprocess' and yt_dlp is None:
+            mode = 'subprocess'
+        self.mode = mode
+        self._idle = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def in_process(self):
+        return self.mode == 'inprocess'
+
+    def version(self):
+        """Return the yt-dlp version string; raises FileNotFoundError if missing"""
+        if self.in_process:
+            return yt_dlp.version.__version__
+        result = subprocess.run(['yt-dlp', '--version'], capture_output=True, text=True, timeout=10)
+        if result.returncode != 0:
+            raise FileNotFoundError("yt-dlp not found")
+        return result.stdout.strip()
+
+    def run(self, args, url, cwd=None, on_line=None, on_progress=None, job=None, throttle=None, info=None):
+        """Download ``url`` with yt-dlp CLI ``args`` (without the program name).
+
+        ``on_line`` receives every output line except progress updates, which
+        go to ``on_progress`` as ProgressEvent objects. In-process runs call
+        ``throttle(n)`` for every ``n`` bytes received and are slowed down
+        while it blocks (the CLI needs --limit-rate instead). With ``info``
+        (from ``extract_info``) yt-dlp downloads from it, as with
+        --load-info-json, instead of extracting ``url`` again.
+        Returns the process-style exit code; -1 when cancelled.
+        """
+        job = job or EngineJob()
+        selection = []
+
+        def on_output(line):
+            announced = parse_selection_line(line)
+            if announced:
+                selection.append(announced)
+            if on_line:
+                on_line(line)
+
+        def on_event(event):
+            job.files.update(name for name in (event.filename, event.tmpfilename) if name)
+            if event.selection is None and selection:
+                event.selection = selection[-1]
+            if on_progress:
+                on_progress(event)
+
+        info_file = _write_info(info) if info else None
+        try:
+            if self.in_process:
+                return self._run_inprocess(list(args), url, on_output, on_event, job, throttle, info_file)
+            return self._run_subprocess(list(args), url, cwd, on_output, on_event, job, info_file)
+        finally:
+            if info_file:
+                try:
+                    os.remove(info_file)
+                except OSError:
+                    pass
+
+    def iter_entries(self, url, start=1, job=None):
+        """Yield ``(index, entry)`` for a playlist or channel as its pages are fetched.
+
+        Uses flat extraction, so each entry is only the video's ``id``,
+        ``title``, ``duration`` and ``url``. ``start`` is the 1-based index to
+        begin at. Stops early once ``job`` is cancelled.
+        """
+        job = job or EngineJob()
+        if self.in_process:
+            key, pooled = self._acquire(['--flat-playlist', '--lazy-playlist', '--ignore-errors'])
+            try:
+                info = pooled.ydl.extract_info(url, download=False, process=False)
+                # Channel and tab URLs may redirect to the actual listing first
+                while info and info.get('_type') in ('url', 'url_transparent'):
+                    info = pooled.ydl.extract_info(info['url'], download=False, process=False)
+                for index, entry in enumerate((info or {}).get('entries') or [], 1):
+                    if job.cancelled.is_set():
+                        return
+                    if index >= start and entry:
+                        yield index, entry
+            finally:
+                self._release(key, pooled)
+            return
+
+        job.process = subprocess.Popen(
+            ['yt-dlp', '--flat-playlist', '--lazy-playlist', '--ignore-errors', '-I', f'{start}:',
+             '--print', '%(playlist_index)s\t%(id)s\t%(duration)s\t%(title)s', url],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+            bufsize=1,
+            start_new_session=os.name != 'nt'
+        )
+        try:
+            for line in job.process.stdout:
+                if job.cancelled.is_set():
+                    return
+                parts = line.rstrip('\n').split('\t', 3)
+                if len(parts) < 4 or not parts[0].isdigit():
+                    continue
+                index, video_id, duration, title = parts
+                yield int(index), {
+                    'id': video_id,
+                    'title': title if title != 'NA' else None,
+                    'duration': float(duration) if duration not in ('NA', '') else None,
+                    'url': video_id
+                }
+        finally:
+            kill_process_tree(job.process)
+            job.process.wait()
+
+    def extract_info(self, url, args=('--no-playlist',), timeout=30):
+        """Return yt-dlp's info dict for ``url`` without downloading, or None"""
+        args = list(args)
+        if self.in_process:
+            try:
+                key, pooled = self._acquire(args)
+            except (SystemExit, Exception):
+                return None
+            try:
+                info = pooled.ydl.sanitize_info(pooled.ydl.extract_info(url, download=False))
+            except Exception:
+                info = None
+            self._release(key, pooled)
+            return info
+        try:
+            result = subprocess.run(['yt-dlp', '--dump-single-json'] + args + [url],
+                                    capture_output=True, text=True, timeout=timeout)
+            if result.returncode == 0:
+                return json.loads(result.stdout)
+        except Exception:
+            pass
+        return None
+
+    def _acquire(self, args):
+        stable = _stable_args(args)
+        key = tuple(stable)
+        opts = yt_dlp.parse_options(args).ydl_opts
+        pooled = None
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                pooled = idle.pop()
+                if not idle:
+                    del self._idle[key]
+        if pooled is None:
+            pooled = _PooledYDL(yt_dlp.parse_options(stable).ydl_opts)
+        for param in set(PER_RUN_OPTIONS.values()):
+            pooled.ydl.params[param] = opts.get(param)
+        # YoutubeDL compiles --format once, in __init__, so a pooled instance
+        # needs this run's selection compiled again (None / '-' as yt-dlp keeps them)
+        selection = opts.get('format')
+        try:
+            pooled.ydl.format_selector = (selection if selection in (None, '-')
+                                          else pooled.ydl.build_format_selector(selection))
+        except Exception:
+            self._release(key, pooled)
+            raise
+        return key, pooled
+
+    def _release(self, key, pooled):
+        pooled.on_line = pooled.on_progress = pooled.job = pooled.throttle = None
+        pooled.transferred = {}
+        evicted = []
+        with self._lock:
+            self._idle.setdefault(key, []).append(pooled)
+            self._idle.move_to_end(key)
+            while sum(len(idle) for idle in self._idle.values()) > MAX_IDLE_INSTANCES:
+                oldest_key, oldest = next(iter(self._idle.items()))
+                evicted.append(oldest.pop(0))
+                if not oldest:
+                    del self._idle[oldest_key]
+        for instance in evicted:
+            instance.ydl.close()
+
+    def _run_inprocess(self, args, url, on_line, on_progress, job, throttle=None, info_file=None):
+        try:
+            key, pooled = self._acquire(args)
+        except (SystemExit, Exception) as e:
+            # Arguments yt_dlp cannot parse in-process still work on the CLI
+            if on_line:
+                on_line(f"⚠️ In-process engine unavailable ({e}), using yt-dlp CLI")
+            return self._run_subprocess(args, url, None, on_line, on_progress, job, info_file)
+
+        pooled.on_line, pooled.on_progress, pooled.job = on_line, on_progress, job
+        pooled.throttle = throttle
+        try:
+            if info_file:
+                return_code = pooled.ydl.download_with_info_file(info_file)
+            else:
+                return_code = pooled.ydl.download([url])
+        except DownloadCancelled:
+            # An interrupted instance may hold half-finished state; don't reuse it
+            pooled.ydl.close()
+            return -1
+        except DownloadError:
+            # Already reported through the logger
+            return_code = 1
+        except Exception as e:
+            if on_line:
+                on_line(f"ERROR: {e}")
+            return_code = 1
+        self._release(key, pooled)
+        return -1 if job.cancelled.is_set() else return_code
+
+    def _run_subprocess(self, args, url, cwd, on_line, on_progress, job, info_file=None):
+        target = ['--load-info-json', info_file] if info_file else [url]
+        job.process = subprocess.Popen(
+            ['yt-dlp'] + args + PROGRESS_ARGS + target,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+            cwd=cwd,
+            bufsize=1,
+            shell=False,
+            start_new_session=os.name != 'nt'
+        )
+        for line in job.process.stdout:
+            if job.cancelled.is_set():
+                break
+            line = line.strip()
+            if not line:
+                continue
+            event = parse_progress_line(line)
+            if event is not None:
+                if on_progress:
+                    on_progress(event)
+            elif on_line:
+                on_line(line)
+        if job.cancelled.is_set():
+            kill_process_tree(job.process)
+            job.process.wait()
+            return -1
+        return job.process.wait()
+
+_default_engine = None
+_default_lock = threading.Lock()
+
+def get_engine(mode='auto'):
+    """Return the process-wide engine; ``mode`` only applies on first use"""
+    global _default_engine
+    with _default_lock:
+        if _default_engine is None:
+            _default_engine = YtDlpEngine(mode)
+        return _default_engine